@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import sys
+import json
+import socket
+import argparse
+import socketapi
+
+# Sends a search to a running `Magento-Attribute-Searcher.py serve`, and writes out its results.
+# (only the standard library is imported, so that calling this is as quick as the search itself)
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Thin client for searching through a running `Magento-Attribute-Searcher.py serve`.')
+	parser.add_argument('-a', '--attribute', help="The `attribute_code` to search on.", required=True)
+	parser.add_argument('-c', '--comparison', help="The comparison to use when searching for the --value.\n(default: '%(default)s')", default='LIKE')
+	parser.add_argument('-f', '--format', help="The format of the output.\n(default: '%(default)s')", default='text')
+	parser.add_argument('-o', '--output', help="Where the output should be written.\n(default: '%(default)s')", default='stdout')
+	parser.add_argument('-s', '--scope', help="The table to search. Example options include 'category' and 'product'.\n(default: '%(default)s')", default='product')
+	parser.add_argument('-v', '--value', help="The term to match against. Repeat to match against any of several terms.\n(default: '' (literal empty string))", action='append')
+	parser.add_argument('--store', help="Search the effective values in the store view with this code. 'all' for every store view.")
+	parser.add_argument('--count', help="Only return how many rows (and distinct products) match.", action='store_true')
+	parser.add_argument('--group-by-value', help="Count the matches per distinct value (implies --count).", action='store_true')
+	parser.add_argument('--group-by-store', help="Count the matches per store (implies --count).", action='store_true')
+	parser.add_argument('--top', help="With --group-by-value/--group-by-store, only return this many of the largest groups.", type=int)
+	parser.add_argument('--labels', help="Search (and output) select/multiselect Attributes by option label instead of option ID.", action='store_true')
+	parser.add_argument('--no-flat', help="With --store, always search the EAV tables rather than the flat catalog tables.", action='store_true')
+	parser.add_argument('-i', '--instance', help="The named connection in \"db.yaml\" to search.\n(default: the first one)")
+	parser.add_argument('--socket', help="The Unix socket that the server listens on.\n(default: '%(default)s')", default=socketapi.defaultSocketPath)
+	parser.add_argument('--verbose', help="Print what the server had to say about the search (and how long it took).", action='store_true')
+	args = parser.parse_args()
+
+	values = args.value or ['']
+	aggregate = [group for group, wanted in [('value', args.group_by_value), ('store', args.group_by_store)] if wanted]
+
+	request = dict(
+		scope=args.scope, attribute=args.attribute, comparison=args.comparison, format=args.format, instance=args.instance,
+		store=args.store, labels=args.labels, flat=not args.no_flat, top=args.top,
+		aggregate=aggregate if aggregate or args.count else None
+	)
+
+	# A single term is still just a plain old value
+	if len(values) > 1:
+		request['values'] = values
+	else:
+		request['value'] = values[0]
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+	try:
+		sock.connect(args.socket)
+	except OSError as error:
+		print('Could not reach the server on "' + args.socket + '" (is `Magento-Attribute-Searcher.py serve` running?): ' + str(error), file=sys.stderr)
+		sys.exit(1)
+
+	socketapi.sendRequest(sock, request)
+
+	outputFile = sys.stdout.buffer if args.output == 'stdout' else open(args.output, 'wb')
+	status = None
+
+	try:
+		for kind, payload in socketapi.readFrames(sock.makefile('rb')):
+			if kind == 'data':
+				outputFile.write(payload)
+			else:
+				status = json.loads(payload.decode('utf-8'))
+	finally:
+		outputFile.flush()
+		if outputFile is not sys.stdout.buffer:
+			outputFile.close()
+		sock.close()
+
+	if not status['ok']:
+		print(status['error'], file=sys.stderr)
+		sys.exit(1)
+
+	if args.verbose:
+		print(status['messages'] + 'Took %.1f ms.' % (status['seconds'] * 1000,), file=sys.stderr)
@@ -1,18 +1,99 @@
 #!/usr/bin/env python3
 import sys
 import csv
+import array
+import json
 import yaml
 import os.path
 import pymysql
+import time
+import queue
+import socket
 import argparse
+import re
+import threading
+import contextlib
+import socketserver
+import concurrent.futures
 import prompts
-from io import StringIO # For CSV export to write to a variable
+import dbconfig
+import snapshot
+import trigrams
+import expressions
+import resultcache
+import output
+import profiling
+import attributecache
+import socketapi
+import matching
 
 class MagentoAttributeSearcher(object):
 	"""Provides the ability to set up and execute searches against Attribute values."""
 
-	def __init__(self, scope, attribute, comparison, value, outputFormat, outputLocation, automated):
-		"""Initialize properties, call for config import."""
+	# The `backend_type`s that are stored in their own `catalog_%s_entity_%s` value table
+	valueTableBackendTypes = ['varchar', 'int', 'text', 'decimal', 'datetime']
+
+	# Where the local copy of `eav_attribute` is kept (alongside "db.yaml")
+	attributeCachePath = 'attribute-cache.sqlite'
+
+	# Where search results are cached (also alongside "db.yaml"), and how big that cache may get
+	resultCachePath = 'result-cache.sqlite'
+	resultCacheMaxBytes = 268435456
+
+	# Lists of `values` longer than this are loaded into a temporary table to join against, rather than put in an `IN ()`
+	inListLimit = 1000
+
+	# Where the store views are listed (`store_id` 0 being the admin/default "store", whose values the others fall back to)
+	storeTable = 'core_store'
+
+	# The flat tables of each scope (the prefix of their name, followed by a `store_id`), and the indexer that maintains them
+	flatTables = {'product': ('catalog_product_flat_', 'catalog_product_flat'), 'category': ('catalog_category_flat_store_', 'catalog_category_flat')}
+
+	# The Attribute that enables the entities of each scope in a store view (whose flat table only holds the enabled ones)
+	statusAttributes = {'product': 'status'}
+
+	# Where the status of each indexer is kept ("pending" meaning that its index is up to date)
+	indexProcessTable = 'index_process'
+
+	# The columns of the search results that can be grouped on when aggregating, and how they are labelled in the output
+	aggregateGroupColumns = {'value': ('results.value', 'Value'), 'store': ('results.store_id', 'Store')}
+
+	# The `frontend_input`s of Attributes whose values are option IDs (a comma-separated list of them for "multiselect")
+	optionFrontendInputs = ['select', 'multiselect']
+
+	# The comparisons that labels can be searched with (the negated ones match the values having none of the matching options)
+	labelComparisons = {'=': False, '<=>': False, 'LIKE': False, '!=': True, '<>': True, 'NOT LIKE': True}
+
+	# The column type used for the temporary table of `values`, by `backend_type` (for `=` comparisons)
+	valuesTableColumnTypes = {'varchar': 'VARCHAR(255)', 'int': 'INT', 'text': 'TEXT', 'decimal': 'DECIMAL(12,4)', 'datetime': 'DATETIME'}
+
+	def __init__(self, scope, attribute, comparison, value, outputFormat, outputLocation, automated, stream=False, fetchSize=1000, connectionSource=None, values=None, instance=None, chunkSize=None, checkpointFile=None, pause=0, snapshotFile=None, trigramIndexFile=None, useResultCache=False, resultCacheTtl=3600, verbose=False, profileFile=None, explain=False, aggregate=None, top=None, store=None, labels=False, useFlat=True, watchInterval=None, fuzzyThreshold=0.8, matchProcesses=None):
+		"""
+		Initialize properties, call for config import.
+
+		If a `connectionSource` (another instance) is supplied, its DB connection is reused instead of importing the config.
+		If a list of `values` is supplied, then rows matching any one of them are searched for (instead of `value`).
+		If an `instance` is supplied, then the connection by that name is used from "db.yaml" (instead of the first one).
+		If a `chunkSize` is supplied, then the search walks the entities that many at a time (see `executeChunkedSearch()`).
+		If a `snapshotFile` is supplied, then the search runs against that snapshot instead of connecting to the DB at all.
+		If a `trigramIndexFile` is supplied, then `LIKE` searches use that index to narrow down the values to check.
+		If `useResultCache` is set, then results are served from (and stored in) the local result cache whenever possible.
+		If a `profileFile` is supplied, then a report of where the run's time went is written to it (see `profiling.py`),...
+		...including MySQL's plan for the search if `explain` is set.
+		If `aggregate` is supplied (a list of `aggregateGroupColumns` to group on, which may be empty), then only the number...
+		...of matching rows (and products) is returned, per group, for at most the `top` largest groups.
+		If a `store` (code, or "all") is supplied, then the effective value of each entity in that store view (or every...
+		...one) is searched instead, after falling back to the default value wherever the store view does not override it.
+		If `labels` is set, then the value(s) of a select/multiselect Attribute are searched for by their option labels,...
+		...and the option IDs found are output as labels (see `validateLabels()`).
+		If `useFlat` is set, then `store` searches are answered from the flat catalog tables whenever those are up to date...
+		...and have a column for the Attribute (see `findFlatRoute()`).
+		If a `watchInterval` is supplied, then the search keeps running, and reports the changes to its results every that...
+		...many seconds as JSONL events (see `executeWatch()`).
+		If the `comparison` is one of `matching.comparisons` ("REGEX", or "FUZZY" with a `fuzzyThreshold` from 0 to 1),...
+		...then the Attribute's values are streamed in and matched locally by `matchProcesses` worker processes instead...
+		...of by MySQL (see `matchResults()`).
+		"""
 
 		self.scope = scope
 		self.attribute = attribute
@@ -21,11 +102,78 @@ class MagentoAttributeSearcher(object):
 		self.outputFormat = outputFormat
 		self.outputLocation = outputLocation
 		self.automated = automated
+		self.stream = stream
+		self.fetchSize = fetchSize
+		self.values = values
+		self.extraColumns = ['Match'] if values and not labels else ['Store', 'Inherited'] if store else []
+		self.instance = instance
+		self.chunkSize = chunkSize
+		self.checkpointFile = checkpointFile
+		self.pause = pause
+
+		# When set, an `(after, upTo)` pair of `entity_id`s (and/or a list of `entity_id`s) that the search is limited to
+		self.entityRange = None
+		self.entityIds = None
+		self.valuesTableLoaded = False
+
+		# When set, a list of `value_id`s that the search is limited to
+		self.valueIds = None
+		self.verbose = verbose
+		self.aggregate = aggregate
+		self.top = top
+		self.store = store
+
+		# The `store_id` of `store` (or `None` for all of them), once it has been looked up
+		self.storeId = None
+		self.labels = labels
+
+		# Once loaded, the Attribute's option labels (`{option_id: {store_id: label}}`), and the options that the search matches
+		self.optionLabels = None
+		self.optionIds = None
+		self.optionNegated = False
+		self.multiselect = False
+		self.useFlat = useFlat
+
+		# Once decided, the `(store_id, code, table)` of each flat table searched (or an empty list when searching the EAV tables)
+		self.flatRoute = None
+		self.flatSkuColumn = False
+		self.watchInterval = watchInterval
+		self.fuzzyThreshold = fuzzyThreshold
+		self.matchProcesses = matchProcesses
+		self.aggregateColumns = [self.aggregateGroupColumns[group][1] for group in aggregate] + ['Rows', 'Products'] if aggregate is not None else None
+		self.profileFile = profileFile
+
+		self.initHelpers(
+			trigramIndex=trigrams.TrigramIndex(trigramIndexFile) if trigramIndexFile else None,
+			resultCache=resultcache.ResultCache(self.resultCachePath, resultCacheTtl, self.resultCacheMaxBytes) if useResultCache else None,
+			profiler=profiling.Profiler(dict(scope=scope, attribute=attribute, comparison=comparison, instance=instance or 'default'), explain) if profileFile else None
+		)
 
-		self.importDbConfig()
+		with self.profilePhase('connect'):
+			if snapshotFile:
+				self.openSnapshot(snapshotFile)
+			elif connectionSource:
+				self.shareConnection(connectionSource)
+			else:
+				self.importDbConfig()
 
 		self.validateProperties()
 
+	def initHelpers(self, attributeCache=None, trigramIndex=None, resultCache=None, profiler=None):
+		"""
+		Start out without a DB connection (or snapshot), using only the optional helpers that are given.
+
+		Every command sets these up through here before connecting, since `closeDb()`, `loadAttributeMetadata()`, and...
+		...the rest of the shared methods rely on all of them being there (if only as `None`).
+		"""
+
+		self.dbConn = None
+		self.snapshot = None
+		self.attributeCache = attributeCache
+		self.trigramIndex = trigramIndex
+		self.resultCache = resultCache
+		self.profiler = profiler
+
 	def importDbConfig(self):
 		"""
 		If available, import database connection credentials and call for the connection to be established.
@@ -33,10 +181,17 @@ class MagentoAttributeSearcher(object):
 		"""
 
 		if os.path.isfile('db.yaml'):
-			with open('db.yaml') as dbConfigFile:
-				dbConfig = yaml.safe_load(dbConfigFile)
+			dbConfigs = dbconfig.loadDbConfigs()
+
+			# Without a specific instance being asked for, the first one is as good as any
+			instance = self.instance or list(dbConfigs.keys())[0]
+			if instance not in dbConfigs:
+				print('Could not find a connection named "' + instance + '" in "db.yaml".')
+				sys.exit()
 
-			if not all(parameter in dbConfig for parameter in ['host','user','port','passwd','db']):
+			dbConfig = dbConfigs[instance]
+
+			if not all(parameter in dbConfig for parameter in dbconfig.requiredParameters):
 				print('Missing some information in "db.yaml".') # TODO make a list, iterate through it, and mark things missing to give more helpful error message (but maybe don't print the current setting that WAS found, for security reasons)
 
 				if self.automated:
@@ -92,54 +247,70 @@ class MagentoAttributeSearcher(object):
 		print('Connecting to DB...')
 		self.dbConn = pymysql.connect(host=host, port=port, user=user, passwd=passwd, db=db)
 		self.dbCursor = self.dbConn.cursor()
+		self.dbIdentity = '%s:%s/%s' % (host, port, db)
+
+	def shareConnection(self, connectionSource):
+		"""Reuse the DB connection (and Attribute metadata cache) of `connectionSource` rather than opening new ones."""
+
+		if not connectionSource.attributeCache:
+			connectionSource.attributeCache = attributecache.AttributeCache(self.attributeCachePath, connectionSource.dbIdentity)
+
+		self.dbConn = connectionSource.dbConn
+		self.dbCursor = connectionSource.dbCursor
+		self.dbIdentity = connectionSource.dbIdentity
+		self.attributeCache = connectionSource.attributeCache
+
+	def openSnapshot(self, snapshotFile):
+		"""Use the snapshot at `snapshotFile` (see the `snapshot` command) in place of a DB connection."""
+
+		if not os.path.isfile(snapshotFile):
+			print('Could not locate the snapshot "' + snapshotFile + '" (use the `snapshot` command to take one).')
+			sys.exit()
+
+		self.snapshot = snapshot.EavSnapshot(snapshotFile)
 
 	def closeDb(self):
 		"""Disconnect from the DB."""
 
+		if self.snapshot:
+			self.snapshot.close()
+
+		if self.trigramIndex:
+			self.trigramIndex.close()
+
+		if self.resultCache:
+			self.resultCache.close()
+
+		if not self.dbConn:
+			return
+
 		print('Closing connection to DB...')
 		self.dbConn.close()
 
+		if self.attributeCache:
+			self.attributeCache.close()
+
+	def loadAttributeMetadata(self):
+		"""Returns the local Attribute metadata cache, after making sure that it is current for this scope."""
+
+		with self.profilePhase('metadata'):
+			if not self.attributeCache:
+				self.attributeCache = attributecache.AttributeCache(self.attributeCachePath, self.dbIdentity)
+
+			self.attributeCache.refresh(self.dbCursor, 'catalog_' + self.scope)
+
+		return self.attributeCache
+
 	def listAttributes(self):
 		"""List all attributes of the current scope."""
 
 		if not self.scope:
 			self.promptScope()
 
-		self.dbCursor.execute("""SELECT * FROM (
-				SELECT
-					ea.attribute_id,
-					ea.attribute_code,
-					ea.is_required AS required
-				FROM catalog_%s_entity AS ce
-				LEFT JOIN eav_attribute AS ea
-					ON ce.entity_type_id = ea.entity_type_id
-				LEFT JOIN catalog_%s_entity_varchar AS ce_varchar
-					ON ce.entity_id = ce_varchar.entity_id
-					AND ea.attribute_id = ce_varchar.attribute_id
-					AND ea.backend_type = 'varchar'
-				LEFT JOIN catalog_%s_entity_int AS ce_int
-					ON ce.entity_id = ce_int.entity_id
-					AND ea.attribute_id = ce_int.attribute_id
-					AND ea.backend_type = 'int'
-				LEFT JOIN catalog_%s_entity_text AS ce_text
-					ON ce.entity_id = ce_text.entity_id
-					AND ea.attribute_id = ce_text.attribute_id
-					AND ea.backend_type = 'text'
-				LEFT JOIN catalog_%s_entity_decimal AS ce_decimal
-					ON ce.entity_id = ce_decimal.entity_id
-					AND ea.attribute_id = ce_decimal.attribute_id
-					AND ea.backend_type = 'decimal'
-				LEFT JOIN catalog_%s_entity_datetime AS ce_datetime
-					ON ce.entity_id = ce_datetime.entity_id
-					AND ea.attribute_id = ce_datetime.attribute_id
-					AND ea.backend_type = 'datetime'
-			) AS tab
-			GROUP BY attribute_id
-			ORDER BY attribute_code"""
-			% (self.scope, self.scope, self.scope, self.scope, self.scope, self.scope)
-		)
+		if self.snapshot:
+			return self.snapshot.listAttributes()
 
-		return self.dbCursor
+		return self.loadAttributeMetadata().listAttributes('catalog_' + self.scope)
 
 	def validateProperties(self):
 		"""Initiate requests for any information necessary for the query that has not already been supplied."""
@@ -153,7 +324,7 @@ class MagentoAttributeSearcher(object):
 
 		if not self.validateAttribute():
 			if self.automated:
-				print('Invalid value "' + self.scope + '" for Attribute.')
+				print('Invalid value "' + str(self.attribute) + '" for Attribute.')
 				sys.exit()
 
 			self.promptAttribute()
@@ -186,6 +357,211 @@ class MagentoAttributeSearcher(object):
 
 			self.promptOutputLocation()
 
+		if not self.validateAggregate():
+			sys.exit()
+
+		if not self.validateStore():
+			sys.exit()
+
+		if not self.validateLabels():
+			sys.exit()
+
+		if not self.validateWatch():
+			sys.exit()
+
+		if not self.validateChunkSize():
+			sys.exit()
+
+		if not self.validateExportFormat():
+			sys.exit()
+
+		if not self.validateMatching():
+			sys.exit()
+
+		if not self.validateEmpty():
+			sys.exit()
+
+	def validateAggregate(self):
+		"""`aggregate` (and `top`) validation check, explaining what is wrong when it fails."""
+
+		if self.aggregate is None:
+			if self.top:
+				print('Only the groups of --group-by-value/--group-by-store can be limited to the top ones.')
+				return False
+
+			return True
+
+		# Those search in pieces, whose counts would have to be added back up
+		if self.snapshot or self.chunkSize:
+			print('Counting is not supported together with --snapshot or --chunk-size.')
+			return False
+
+		if self.top and not self.aggregate:
+			print('Only the groups of --group-by-value/--group-by-store can be limited to the top ones.')
+			return False
+
+		return True
+
+	def validateStore(self):
+		"""`store` validation check (looking up its `store_id` along the way), explaining what is wrong when it fails."""
+
+		if not self.store:
+			return True
+
+		if self.snapshot or self.values:
+			print('Searching the values of a store view is not supported together with --snapshot or several values.')
+			return False
+
+		if self.store == 'all':
+			return True
+
+		self.dbCursor.execute('SELECT store_id FROM ' + self.storeTable + ' WHERE code = %s', (self.store,))
+		store = self.dbCursor.fetchone()
+
+		if store is None:
+			print('There is no store view with the code "' + self.store + '".')
+			return False
+
+		self.storeId = store[0]
+
+		return True
+
+	def validateWatch(self):
+		"""`watchInterval` validation check, explaining what is wrong when it fails."""
+
+		if not self.watchInterval:
+			return True
+
+		if self.snapshot or self.chunkSize or self.aggregate is not None:
+			print('Watching is not supported together with --snapshot, --chunk-size, or counting.')
+			return False
+
+		return True
+
+	def validateChunkSize(self):
+		"""`chunkSize` validation check, explaining what is wrong when it fails."""
+
+		# A chunked search appends to its output (and cuts it back when resuming), which only works for plain lines of text
+		if self.chunkSize and self.outputFormat not in output.lineFormats:
+			print('Searching with --chunk-size is only supported with the ' + ', '.join(output.lineFormats) + ' formats.')
+			return False
+
+		return True
+
+	def validateExportFormat(self):
+		"""Check that the chosen `outputFormat` can be written to `outputLocation`, explaining why not when it can't."""
+
+		# (everything else printed along the way goes to stdout too, and would end up in the middle of it)
+		if self.outputFormat not in output.lineFormats and self.outputLocation == 'stdout':
+			print('The "' + self.outputFormat + '" format is binary, so it can only be written to a file (see -o).')
+			return False
+
+		return True
+
+	def validateMatching(self):
+		"""Validation check of the comparisons that are made locally (see `matching.py`), explaining what is wrong when it fails."""
+
+		if self.comparison not in matching.comparisons:
+			return True
+
+		# Each of those would need the matching done somewhere other than on the rows streaming out of a single query
+		if self.values or self.snapshot or self.chunkSize or self.watchInterval or self.aggregate is not None:
+			print('Matching with --regex or --fuzzy is not supported together with several values, --snapshot, --chunk-size, --watch, or counting.')
+			return False
+
+		if self.value is None:
+			print('Matching with --regex or --fuzzy needs a --value to match against.')
+			return False
+
+		if self.comparison == 'REGEX':
+			try:
+				re.compile(self.value)
+			except re.error as error:
+				print('Invalid regular expression "' + self.value + '": ' + str(error))
+				return False
+
+		if self.comparison == 'FUZZY' and not 0 < self.fuzzyThreshold <= 1:
+			print('The --fuzzy threshold must be above 0, and at most 1 (an exact match).')
+			return False
+
+		return True
+
+	def validateEmpty(self):
+		"""Validation check of the "EMPTY" comparison (see `buildEmptySearchQuery()`), explaining what is wrong when it fails."""
+
+		if self.comparison != 'EMPTY':
+			return True
+
+		if self.values or self.store or self.snapshot:
+			print('Finding empty values with --empty is not supported together with several values, --store, or --snapshot.')
+			return False
+
+		return True
+
+	def validateLabels(self):
+		"""
+		`labels` validation check, explaining what is wrong when it fails.
+
+		# Notes
+		This is also where the Attribute's option labels are loaded (once, from the local Attribute cache), and where the...
+		...labels searched for are turned into the option IDs that they stand for, so that the query itself only ever...
+		...compares IDs. Labels match case-insensitively (like MySQL's default collations do), in any store view.
+		"""
+
+		if not self.labels:
+			return True
+
+		if self.snapshot:
+			print('Searching by option labels is not supported together with --snapshot.')
+			return False
+
+		attribute = self.lookupAttribute()
+		if attribute['frontend_input'] not in self.optionFrontendInputs:
+			print('The "' + self.attribute + '" Attribute is not a select/multiselect, so it has no option labels.')
+			return False
+
+		self.multiselect = attribute['frontend_input'] == 'multiselect'
+		self.optionLabels = self.loadOptionLabels(attribute['attribute_id'])
+
+		# Those compare against `NULL`, whatever the labels
+		if self.comparison in ['IS', 'IS NOT']:
+			return True
+
+		if self.comparison not in self.labelComparisons:
+			print('Option labels can only be searched for with ' + ', '.join(self.labelComparisons) + '.')
+			return False
+
+		self.optionNegated = self.labelComparisons[self.comparison]
+		self.optionIds = self.matchOptionLabels(self.values or [self.value])
+
+		if self.verbose:
+			print('The labels searched for match ' + str(len(self.optionIds)) + ' of the ' + str(len(self.optionLabels)) + ' options.')
+
+		return True
+
+	def loadOptionLabels(self, attributeId):
+		"""Returns the option labels of `attributeId` (as `{option_id: {store_id: label}}`), from the local Attribute cache."""
+
+		attributeCache = self.loadAttributeMetadata()
+
+		with self.profilePhase('metadata'):
+			attributeCache.refreshOptions(self.dbCursor, attributeId)
+
+			return attributeCache.getOptionLabels(attributeId)
+
+	def matchOptionLabels(self, terms):
+		"""Returns the (sorted) IDs of the options having a label, in any store view, that matches any of `terms`."""
+
+		if self.comparison in ['LIKE', 'NOT LIKE']:
+			# `%` and `_` are the only wildcards, and a backslash escapes the character after it
+			patterns = [re.compile(''.join(['.*' if part == '%' else '.' if part == '_' else re.escape(part[-1]) for part in re.findall(r'\\.|.', str(term), re.S)]), re.I | re.S) for term in terms]
+			matches = lambda label: any([pattern.fullmatch(label) for pattern in patterns])
+		else:
+			lowerTerms = set([str(term).lower() for term in terms])
+			matches = lambda label: label.lower() in lowerTerms
+
+		return sorted([optionId for optionId, labels in self.optionLabels.items() if any([label is not None and matches(label) for label in labels.values()])])
+
 	def validateScope(self):
 		"""`scope` validation check."""
 
@@ -210,13 +586,17 @@ class MagentoAttributeSearcher(object):
 		if not self.attribute:
 			return False
 
+		# Without a connection (or snapshot) there is nothing to check it against (yet)
+		if (self.dbConn or self.snapshot) and self.lookupAttribute() is None:
+			return False
+
 		return True
 
 	def promptAttribute(self):
 		"""Prompt for which Attribute to search on (with the option to list off the possibilities if its name is unknown)."""
 
 		# Query for Attributes
-		self.attribute = prompts.prompt('Press [Enter] to retrieve a list of all available Attributes --be patient--, or provide the `attribute_code` that you are interested in now')
+		self.attribute = prompts.prompt('Press [Enter] to retrieve a list of all available Attributes, or provide the `attribute_code` that you are interested in now')
 
 		if self.attribute == '':
 			attributes = self.listAttributes()
@@ -253,7 +633,11 @@ class MagentoAttributeSearcher(object):
 		"""`comparison` validation check."""
 
 		if (not self.comparison or
-				self.comparison not in ['=','<=>','!=','<>','<','<=','>=','>','LIKE','NOT LIKE','IS','IS NOT']):
+				self.comparison not in ['=','<=>','!=','<>','<','<=','>=','>','LIKE','NOT LIKE','IS','IS NOT','EMPTY'] + matching.comparisons):
+			return False
+
+		# A list of values is matched by joining against it, which only makes sense for these
+		if self.values and self.comparison not in ['=', 'LIKE']:
 			return False
 
 		return True
@@ -261,7 +645,7 @@ class MagentoAttributeSearcher(object):
 	def promptComparison(self):
 		"""Prompt for the comparison operator that they would like to use (among the list of supported ones)."""
 
-		self.comparison = prompts.prompt('Please type the comparison operator that you would like to use', 'LIKE', ['=','<=>','!=','<>','<','<=','>=','>','LIKE','NOT LIKE','IS','IS NOT'])
+		self.comparison = prompts.prompt('Please type the comparison operator that you would like to use', 'LIKE', ['=','<=>','!=','<>','<','<=','>=','>','LIKE','NOT LIKE','IS','IS NOT','EMPTY'] + matching.comparisons)
 
 		if not self.validateComparison():
 			print('Invalid selection.')
@@ -316,7 +700,12 @@ class MagentoAttributeSearcher(object):
 		"""`outputFormat` validation check."""
 
 		if (not self.outputFormat or
-				self.outputFormat not in ['csv', 'text']):
+				self.outputFormat not in output.outputFormats):
+			return False
+
+		missingPackage = output.findMissingPackage(self.outputFormat)
+		if missingPackage:
+			print('The "' + self.outputFormat + '" format needs the "' + missingPackage + '" package (pip install ' + missingPackage + ').')
 			return False
 
 		return True
@@ -324,7 +713,7 @@ class MagentoAttributeSearcher(object):
 	def promptOutputFormat(self):
 		"""Prompt for how the search results should be formatted."""
 
-		self.outputFormat = prompts.prompt('Please choose a supported output format', 'text', ['csv', 'text'])
+		self.outputFormat = prompts.prompt('Please choose a supported output format', 'text', output.outputFormats)
 		if not self.isOutputFormatValid():
 			print('Something wasn\'t quite right...')
 			self.promptOutputFormat
@@ -356,8 +745,7 @@ class MagentoAttributeSearcher(object):
 	def search(self):
 		"""Prompt for review and final authorization. then execute the query."""
 
-		humanReadableAttributeValue = 'NULL' if self.value == None else "''" if self.value == '' else self.value
-		searchMessage = 'Search for "' + self.attribute + ' ' + self.comparison + ' ' + humanReadableAttributeValue + '" (within the "' + self.scope + '" catalog entity)'
+		searchMessage = self.describeSearchMessage()
 
 		if self.automated:
 			print(searchMessage + '...')
@@ -370,133 +758,2110 @@ class MagentoAttributeSearcher(object):
 				print('Search successfully cancelled.')
 				sys.exit()
 
+		if self.snapshot:
+			self.executeSnapshotSearch()
+		elif self.watchInterval:
+			self.executeWatch()
+		elif self.chunkSize:
+			self.executeChunkedSearch()
+		else:
+			self.executeSearch()
 
-		# In an ideal world, I could do string interpolation for the table names (since those can't be parameters), and
-		# ...immediately follow that with the parameters for the values (since those *can* be parameters), but instead
-		# ...Python just keeps saying "TypeError: not enough arguments for format string"
-		# Here's an example of what I would like to do:
-		# "some_%s_table INNER JOIN some_%s_other_table WHERE column1 = %s AND column1 = %s" % (tbl1, tbl2), (val1, val2)
-		#
-		# But instead I have to do:
-		# sql1 = "some_%s_table INNER JOIN some_%s_other_table" % (tbl1, tbl2)
-		# query(sql1 + "WHERE column1 =  %s AND column2 = %s", (val1, val2))
-		interpolatedPortion = """SELECT
-				ce.sku,
-				ea.attribute_id,
-				ea.attribute_code,
-				CASE ea.backend_type
-					WHEN 'varchar' THEN ce_varchar.value
-					WHEN 'int' THEN ce_int.value
-					WHEN 'text' THEN ce_text.value
-					WHEN 'decimal' THEN ce_decimal.value
-					WHEN 'datetime' THEN ce_datetime.value
-					ELSE ea.backend_type
-				END AS value,
-				CASE ea.backend_type
-					WHEN 'varchar' THEN ce_varchar.store_id
-					WHEN 'int' THEN ce_int.store_id
-					WHEN 'text' THEN ce_text.store_id
-					WHEN 'decimal' THEN ce_decimal.store_id
-					WHEN 'datetime' THEN ce_datetime.store_id
-					ELSE ea.backend_type
-				END AS store_id,
-				ea.is_required AS required
-			FROM catalog_%s_entity AS ce
-			LEFT JOIN eav_attribute AS ea
-				ON ce.entity_type_id = ea.entity_type_id
-			LEFT JOIN catalog_%s_entity_varchar AS ce_varchar
-				ON ce.entity_id = ce_varchar.entity_id
-				AND ea.attribute_id = ce_varchar.attribute_id
-				AND ea.backend_type = 'varchar'
-			LEFT JOIN catalog_%s_entity_int AS ce_int
-				ON ce.entity_id = ce_int.entity_id
-				AND ea.attribute_id = ce_int.attribute_id
-				AND ea.backend_type = 'int'
-			LEFT JOIN catalog_%s_entity_text AS ce_text
-				ON ce.entity_id = ce_text.entity_id
-				AND ea.attribute_id = ce_text.attribute_id
-				AND ea.backend_type = 'text'
-			LEFT JOIN catalog_%s_entity_decimal AS ce_decimal
-				ON ce.entity_id = ce_decimal.entity_id
-				AND ea.attribute_id = ce_decimal.attribute_id
-				AND ea.backend_type = 'decimal'
-			LEFT JOIN catalog_%s_entity_datetime AS ce_datetime
-				ON ce.entity_id = ce_datetime.entity_id
-				AND ea.attribute_id = ce_datetime.attribute_id
-				AND ea.backend_type = 'datetime'
-			HAVING `value` %s """ % (self.scope, self.scope, self.scope, self.scope, self.scope, self.scope, self.comparison)
+		self.closeDb()
 
-		self.dbCursor.execute("""SELECT * FROM (
-				""" + interpolatedPortion + """%s
-					AND `attribute_code` = %s
-			) AS tab
-			WHERE tab.value != ''""",
-			(self.value, self.attribute)
-		)
+		if self.profiler:
+			self.profiler.writeReport(self.profileFile)
+			print('Wrote the profile of this search to "' + self.profileFile + '".')
+
+	def describeSearchMessage(self):
+		"""Returns what the search is about to do, in words (for the user to review before it goes ahead)."""
+
+		humanReadableAttributeValue = 'NULL' if self.value == None else "''" if self.value == '' else self.value
+		if self.values:
+			humanReadableAttributeValue = 'any of ' + str(len(self.values)) + ' values'
+		searchCondition = self.attribute + ' ' + self.comparison + ' ' + humanReadableAttributeValue if self.comparison != 'EMPTY' else self.attribute + ' is empty or missing'
+		searchMessage = 'Search for "' + searchCondition + '" (within the "' + self.scope + '" catalog entity)'
+		if self.store:
+			searchMessage += ' in every store view' if self.store == 'all' else ' in the "' + self.store + '" store view'
+		if self.aggregate is not None:
+			searchMessage = 'Count the matches of' + searchMessage[len('Search for'):] + (' by ' + ' and '.join(self.aggregate) if self.aggregate else '')
+
+		return searchMessage
+
+	def executeSearch(self):
+		"""Plan and execute the query (or find its results in the cache), then hand off its results for output."""
+
+		# Recording streamed results (or serving them back) would hold every row in memory at once, which streaming is...
+		# ...there to avoid (counts, being only a handful of rows, are the exception)
+		useResultCache = self.resultCache is not None and (not self.isStreamed() or self.aggregate is not None)
+
+		if useResultCache:
+			with self.profilePhase('cache'):
+				cacheKey = self.resultCache.makeKey(self.describeCachedSearch())
+				validator = self.fetchCatalogValidator()
+
+				cachedResults = self.resultCache.get(cacheKey, validator)
+
+			if self.verbose:
+				print('Result cache ' + ('hit' if cachedResults else 'miss') + ': ' + self.resultCache.describe())
+
+			if cachedResults:
+				self.dbCursor = self.profileCursor(cachedResults)
+				self.getResults()
+				return
+
+		candidates = self.findTrigramCandidates()
+		if candidates is not None:
+			self.executeCandidateSearch(candidates)
+			return
+
+		with self.profilePhase('plan'):
+			sql, parameters = self.planSearch()
+
+			if self.aggregate is not None:
+				sql, parameters = self.buildAggregateQuery(sql, parameters)
+
+		if self.profiler and self.profiler.explain:
+			self.profiler.captureExplain(self.dbConn, sql, parameters)
+
+		# An unbuffered cursor leaves the result set on the server until it is fetched, instead of loading it all up front
+		# (which is also how the values to be matched locally are fed to the worker processes as they arrive)
+		if self.stream or self.comparison in matching.comparisons:
+			self.dbCursor = self.dbConn.cursor(pymysql.cursors.SSCursor)
+
+		with self.profilePhase('execute'):
+			self.dbCursor.execute(sql, parameters)
+
+		self.dbCursor = self.profileCursor(self.dbCursor)
+
+		# No single search gets to take up more than a quarter of the cache
+		if useResultCache:
+			self.dbCursor = resultcache.RecordingCursor(self.dbCursor, self.resultCacheMaxBytes // 4)
 
 		self.getResults()
 
-		self.closeDb()
+		if useResultCache and self.dbCursor.getRecording() is not None:
+			self.resultCache.put(cacheKey, validator, self.dbCursor.getRecording())
 
-	def getResults(self):
-		"""Wrapper method for formatting and outputting results."""
+		self.dbCursor.close()
 
-		# Basically: self.output = self.formatResultsAs{{self.outputFormat}}
-		if self.outputFormat == 'text':
-			self.output = self.formatResultsAsText()
-		elif self.outputFormat == 'csv':
-			self.output = self.formatResultsAsCsv()
+	def describeCachedSearch(self):
+		"""Returns what identifies this search's results in the result cache."""
 
-		if self.outputLocation == 'stdout':
-			self.writeResultsToStdout()
-		else:
-			self.writeResultsToFile()
+		return dict(instance=self.dbIdentity, scope=self.scope, attribute=self.attribute, comparison=self.comparison, value=self.value, values=self.values, store=self.store, aggregate=self.aggregate, top=self.top, labels=self.labels, flat=self.useFlat, threshold=self.fuzzyThreshold)
 
-	def formatResultsAsText(self):
-		"""Format the results as plain text/ASCII-like."""
+	def fetchCatalogValidator(self):
+		"""Returns a cheap summary of the catalog entities (the latest `updated_at` and how many there are), for cache validation."""
 
-		output = ''
+		self.dbCursor.execute('SELECT MAX(updated_at), COUNT(*) FROM catalog_%s_entity' % (self.scope,))
 
-		for result in self.dbCursor:
-			output += '| SKU: %s | Value: %s |\n' % (result[0], result[3])
+		return ':'.join([str(part) for part in self.dbCursor.fetchone()])
 
-		return output
+	def findTrigramCandidates(self):
+		"""
+		Use the trigram index (if there is one, and it can help) to find the `value_id`s that could match the search.
 
-	def formatResultsAsCsv(self):
-		"""Format the results as a CSV."""
+		Returns `None` whenever the search has to go ahead without the index.
+		"""
 
-		output = StringIO()
-		csv_writer = csv.writer(output, delimiter=',')
-		csv_writer.writerow(['SKU','Value'])
+		# (the candidates are searched in batches, whose counts would have to be added back up, and written out line by line)
+		if not self.trigramIndex or self.comparison != 'LIKE' or self.values or self.aggregate is not None or self.store or self.outputFormat in output.columnarFormats:
+			return None
 
-		for result in self.dbCursor:
-			csv_writer.writerow([result[0], result[3]])
+		attribute = self.lookupAttribute()
+		if attribute is None or attribute['backend_type'] not in ['varchar', 'text']:
+			return None
 
-		return output
+		indexed = self.trigramIndex.getIndexedAttribute(attribute['attribute_id'], self.dbIdentity)
+		if not indexed:
+			print('The "' + self.attribute + '" Attribute has not been indexed (see the `index` command), so searching without the index...')
+			return None
 
-	def writeResultsToStdout(self):
-		"""print()'s the output."""
+		candidates = self.trigramIndex.findCandidates(attribute['attribute_id'], self.value)
+		if candidates is None:
+			return None
 
-		print(self.output)
+		# Whatever has been added or changed since the index was last updated has to be checked as well
+		unindexed = self.trigramIndex.findUnindexedValueIds(self.dbConn, indexed)
+		candidates = trigrams.mergePostings(candidates, unindexed)
 
-	def writeResultsToFile(self):
-		"""Places the output into a file at the location specified by the outputLocation property."""
+		print('The trigram index narrowed the search down to ' + str(len(candidates)) + ' candidate values' + (' (' + str(len(unindexed)) + ' of them changed since it was last updated).' if unindexed else '.'))
 
-		with open(self.outputLocation, 'w', newline='') as file:
-			file.write(self.output + "\n")
-			file.close()
+		return candidates
+
+	def executeCandidateSearch(self, candidates):
+		"""Execute the search on only the `candidates` (`value_id`s) found by the trigram index, in `IN ()`-sized batches."""
+
+		stream = output.openOutput(self.outputLocation, compression=output.compressedFormats.get(self.outputFormat))
+		stream.write(output.formatHeader(self.outputFormat, self.extraColumns))
+
+		for start in range(0, len(candidates), self.inListLimit):
+			self.valueIds = candidates[start:start + self.inListLimit].tolist()
+
+			with self.profilePhase('plan'):
+				sql, parameters = self.planSearch()
+
+			with self.profilePhase('execute'):
+				self.dbCursor.execute(sql, parameters)
+
+			self.writeRows(stream, self.profileCursor(self.dbCursor))
+
+		self.valueIds = None
+		output.closeOutput(stream)
+
+	def executeSnapshotSearch(self):
+		"""Execute the search against the snapshot, then hand off its results for output."""
+
+		if self.snapshot.getMeta('scope') != self.scope:
+			print('The snapshot is of the "' + str(self.snapshot.getMeta('scope')) + '" catalog entity, not "' + self.scope + '".')
+			sys.exit()
+
+		if self.lookupAttribute()['backend_type'] not in self.valueTableBackendTypes:
+			print('The values of the "' + self.attribute + '" Attribute are not part of the snapshot.')
+			sys.exit()
+
+		with self.profilePhase('execute'):
+			self.dbCursor = self.profileCursor(self.snapshot.search(self.attribute, self.comparison, self.value, self.values))
+
+		self.getResults()
+
+	def executeChunkedSearch(self):
+		"""
+		Execute the search one range of `chunkSize` entities at a time, streaming each range's results to the output.
+
+		Each range is found by keyset pagination on `entity_id` and committed on its own, so that no single long-running...
+		...query (or transaction) is held open on the server. After every range, the `checkpointFile` (if any) records how...
+		...far the search got, so that an interrupted search can pick up where it left off by simply being run again.
+		"""
+
+		checkpoint = self.loadCheckpoint()
+		lastEntityId = checkpoint['last_entity_id'] if checkpoint else 0
+
+		if checkpoint:
+			print('Resuming after entity ' + str(lastEntityId) + '...')
+
+		stream = output.openOutput(self.outputLocation, resumeAt=checkpoint['output_position'] if checkpoint else None)
+		if not checkpoint:
+			stream.write(output.formatHeader(self.outputFormat, self.extraColumns))
+
+		while True:
+			self.dbCursor.execute("""SELECT MAX(entity_id) FROM (
+					SELECT entity_id
+					FROM catalog_%s_entity
+					WHERE entity_id > %%s
+					ORDER BY entity_id
+					LIMIT %%s
+				) AS chunk""" % (self.scope,),
+				(lastEntityId, self.chunkSize)
+			)
+			upToEntityId = self.dbCursor.fetchone()[0]
+
+			if upToEntityId is None:
+				break
+
+			self.entityRange = (lastEntityId, upToEntityId)
+
+			with self.profilePhase('plan'):
+				sql, parameters = self.planSearch()
+
+			dbCursor = self.dbConn.cursor(pymysql.cursors.SSCursor) if self.stream else self.dbConn.cursor()
+
+			with self.profilePhase('execute'):
+				dbCursor.execute(sql, parameters)
+
+			self.writeRows(stream, self.profileCursor(dbCursor))
+			dbCursor.close()
+
+			# Ending the transaction lets go of the read view, instead of holding onto it for the whole search
+			self.dbConn.commit()
+			stream.flush()
+
+			lastEntityId = upToEntityId
+			self.saveCheckpoint(lastEntityId, None if stream is sys.stdout else stream.tell())
+
+			if self.pause:
+				time.sleep(self.pause)
+
+		self.entityRange = None
+		output.closeOutput(stream)
+
+		# All done, so there is nothing left to resume
+		if self.checkpointFile and os.path.isfile(self.checkpointFile):
+			os.remove(self.checkpointFile)
+
+	def executeWatch(self):
+		"""
+		Run the search once in full, then every `watchInterval` seconds for only the entities updated since, until interrupted.
+
+		Every change to the results is written out as a line of JSON: an "added", "removed", or "changed" event (the first...
+		...full search reporting each of its results as "added"). Keeping the current results in memory means that each...
+		...poll only has to search again the entities whose `updated_at` has reached the high-water mark of the previous...
+		...poll, so it costs as much as the churn rather than the catalog. Entities that have been deleted are noticed by...
+		...the entity count falling short of what it should be, and only then are the results checked for them.
+		"""
+
+		stream = output.openOutput(self.outputLocation)
+
+		# Read before searching, so that anything updated during the search is searched again by the next poll
+		highWaterMark, entityCount, created = self.fetchWatchState(None)
+		matches = {}
+		self.writeWatchEvents(stream, matches, self.fetchMatches(None), set())
+
+		try:
+			while True:
+				time.sleep(self.watchInterval)
+				started = time.perf_counter()
+
+				# Ending the transaction gets a new read view, without which nothing would ever seem to change
+				self.dbConn.commit()
+
+				previousMark = highWaterMark
+				highWaterMark, newEntityCount, created = self.fetchWatchState(previousMark)
+
+				removedSkus = set()
+				if newEntityCount < entityCount + created:
+					removedSkus = self.findDeletedSkus(set([key[0] for key in matches]))
+
+				entityCount = newEntityCount
+
+				self.dbCursor.execute('SELECT entity_id, sku FROM catalog_%s_entity WHERE updated_at >= %%s' % (self.scope,), (previousMark,))
+				updated = self.dbCursor.fetchall()
+
+				events = self.writeWatchEvents(stream, matches, self.fetchMatches([entityId for entityId, sku in updated]) if updated else {}, set([sku for entityId, sku in updated]) | removedSkus)
+
+				if self.verbose:
+					print('Polled %s updated entities in %.3fs: %s changes, %s matches.' % (len(updated), time.perf_counter() - started, events, len(matches)), file=sys.stderr)
+		except KeyboardInterrupt:
+			print('Stopped watching.', file=sys.stderr)
+		finally:
+			output.closeOutput(stream)
+
+	def fetchWatchState(self, since):
+		"""Returns the latest `updated_at` of the catalog entities, how many there are, and how many were created `since` then."""
+
+		self.dbCursor.execute('SELECT MAX(updated_at), COUNT(*), COUNT(CASE WHEN created_at >= %%s THEN 1 END) FROM catalog_%s_entity' % (self.scope,), (since,))
+
+		return self.dbCursor.fetchone()
+
+	def findDeletedSkus(self, skus):
+		"""Returns those of `skus` that no longer belong to any entity (looked up in `IN ()`-sized batches)."""
+
+		skus = sorted(skus)
+		existing = set()
+
+		for start in range(0, len(skus), self.inListLimit):
+			batch = skus[start:start + self.inListLimit]
+			self.dbCursor.execute('SELECT sku FROM catalog_%s_entity WHERE sku IN (' % (self.scope,) + ', '.join(['%s'] * len(batch)) + ')', batch)
+			existing.update([row[0] for row in self.dbCursor.fetchall()])
+
+		return set(skus) - existing
+
+	def fetchMatches(self, entityIds):
+		"""Returns the results of the search (for only `entityIds`, unless that is `None`) by `(sku, store_id)`."""
+
+		matches = {}
+		batches = [None] if entityIds is None else [entityIds[start:start + self.inListLimit] for start in range(0, len(entityIds), self.inListLimit)]
+
+		for batch in batches:
+			self.entityIds = batch
+			sql, parameters = self.planSearch()
+			self.dbCursor.execute(sql, parameters)
+
+			rows = self.dbCursor.fetchall()
+			if self.optionLabels is not None:
+				rows = self.decodeOptionLabels(rows)
+
+			for row in rows:
+				matches[(row[0], row[4])] = tuple(row)
+
+		self.entityIds = None
+
+		return matches
+
+	def writeWatchEvents(self, stream, matches, found, searchedSkus):
+		"""
+		Write out how the results `found` for the entities of `searchedSkus` differ from the current `matches` (as events).
+
+		`matches` is then brought up to date, and the number of events is returned.
+		"""
+
+		events = []
+
+		for key in sorted([key for key in matches if key[0] in searchedSkus and key not in found], key=str):
+			events.append(self.formatWatchEvent('removed', matches.pop(key)))
+
+		for key in sorted(found, key=str):
+			if key not in matches:
+				events.append(self.formatWatchEvent('added', found[key]))
+			elif matches[key] != found[key]:
+				events.append(self.formatWatchEvent('changed', found[key], matches[key]))
+
+			matches[key] = found[key]
+
+		stream.write(''.join(events))
+		stream.flush()
+
+		return len(events)
+
+	def formatWatchEvent(self, event, row, previousRow=None):
+		"""Render one change to the results (of `event` "added", "removed", or "changed" from `previousRow`) as a line of JSON."""
+
+		record = dict(event=event, time=time.strftime('%Y-%m-%dT%H:%M:%S'), sku=row[0], attribute=row[2], value=row[3], store_id=row[4])
+
+		for column, value in zip(self.extraColumns, row[6:]):
+			record[column.lower()] = value
+
+		if previousRow is not None:
+			record['previous_value'] = previousRow[3]
+
+		return json.dumps(record, default=str) + '\n'
+
+	def describeSearch(self):
+		"""Returns what identifies this search, for making sure that a checkpoint belongs to it."""
+
+		# (anything changing what the rows look like counts too, as they are appended to those of the interrupted run)
+		return dict(scope=self.scope, attribute=self.attribute, comparison=self.comparison, value=self.value, values=self.values, output=self.outputLocation, format=self.outputFormat, chunk_size=self.chunkSize, store=self.store, labels=self.labels, flat=self.useFlat)
+
+	def loadCheckpoint(self):
+		"""Returns the checkpoint left behind by an interrupted run of this same search, or `None` if there isn't one."""
+
+		if not self.checkpointFile or not os.path.isfile(self.checkpointFile):
+			return None
+
+		with open(self.checkpointFile) as checkpointFile:
+			checkpoint = json.load(checkpointFile)
+
+		if checkpoint.get('search') != self.describeSearch():
+			print('The checkpoint in "' + self.checkpointFile + '" is for a different search. Starting over.')
+			return None
+
+		return checkpoint
+
+	def saveCheckpoint(self, lastEntityId, outputPosition):
+		"""Record that every entity up to `lastEntityId` is done (and where the output was at that point)."""
+
+		if not self.checkpointFile:
+			return
+
+		checkpoint = dict(search=self.describeSearch(), last_entity_id=lastEntityId, output_position=outputPosition)
+
+		# Written aside and then moved into place, so that a crash can never leave a half-written checkpoint behind
+		with open(self.checkpointFile + '.tmp', 'w') as checkpointFile:
+			json.dump(checkpoint, checkpointFile)
+		os.replace(self.checkpointFile + '.tmp', self.checkpointFile)
+
+	def buildEntityRangeCondition(self, alias):
+		"""Build the condition (and its parameters) limiting a query to the current `entityRange` and/or `entityIds`, if any."""
+
+		condition = ''
+		parameters = []
+
+		if self.entityRange:
+			condition += ' AND ' + alias + '.entity_id > %s AND ' + alias + '.entity_id <= %s'
+			parameters += list(self.entityRange)
+
+		if self.entityIds:
+			condition += ' AND ' + alias + '.entity_id IN (' + ', '.join(['%s'] * len(self.entityIds)) + ')'
+			parameters += list(self.entityIds)
+
+		return (condition, parameters)
+
+	def lookupAttribute(self):
+		"""
+		Look up the chosen Attribute within the current scope.
+
+		Returns its `eav_attribute` row as a dict (see `AttributeCache.columns`), or `None` if there is no such Attribute.
+		"""
+
+		if self.snapshot:
+			return self.snapshot.getAttribute(self.attribute)
+
+		return self.loadAttributeMetadata().getAttribute('catalog_' + self.scope, self.attribute)
+
+	def planSearch(self):
+		"""
+		Decide how the search should be executed and build the query for it.
+
+		Returns a `(sql, parameters)` tuple that is ready to be handed to `execute()`.
+
+		# Notes
+		Looking up the Attribute first means that only the one value table that can possibly hold its values needs to be...
+		...touched, and that the comparison can go into a `WHERE` clause where MySQL can make use of the indexes.
+		Attributes that are unknown or `static` (stored on the entity table itself) fall back to the catch-all query.
+		"""
+
+		attribute = self.lookupAttribute()
+
+		if attribute is None or attribute['backend_type'] not in self.valueTableBackendTypes:
+			if self.values:
+				print('Searching for a list of values is not supported for the "' + self.attribute + '" Attribute.')
+				sys.exit()
+
+			if self.store:
+				print('The "' + self.attribute + '" Attribute does not have values per store view.')
+				sys.exit()
+
+			if self.comparison in matching.comparisons:
+				print('Matching with --regex or --fuzzy is not supported for the "' + self.attribute + '" Attribute.')
+				sys.exit()
+
+			if self.comparison == 'EMPTY':
+				print('Finding empty values with --empty is not supported for the "' + self.attribute + '" Attribute.')
+				sys.exit()
+
+			return self.buildCatchAllSearchQuery()
+
+		if self.store:
+			if self.findFlatRoute(attribute):
+				return self.buildFlatSearchQuery(attribute['attribute_id'], attribute['backend_type'])
+
+			return self.buildStoreSearchQuery(attribute['attribute_id'], attribute['backend_type'])
+
+		if self.comparison == 'EMPTY':
+			return self.buildEmptySearchQuery(attribute['attribute_id'], attribute['backend_type'])
+
+		# Labels have already been turned into the option IDs to look for, however many there were
+		if self.values and self.optionIds is None:
+			return self.buildMultiValueSearchQuery(attribute['attribute_id'], attribute['backend_type'])
+
+		return self.buildTypedSearchQuery(attribute['attribute_id'], attribute['backend_type'])
+
+	def buildValueTest(self, column):
+		"""Build the comparison (and its parameters) of the value `column` against what is searched for."""
+
+		# Every value is a candidate, to be matched as it streams in (see `matchResults()`)
+		if self.comparison in matching.comparisons:
+			return (column + ' IS NOT NULL', [])
+
+		if self.optionIds is None:
+			return (column + ' ' + self.comparison + ' %s', [self.value])
+
+		# Nothing matched, so no value can be one of the options (or every value is none of them)
+		if not self.optionIds:
+			return (column + ' IS NOT NULL' if self.optionNegated else '0 = 1', [])
+
+		placeholders = ['%s'] * len(self.optionIds)
+
+		if self.multiselect:
+			test = '(' + ' OR '.join(['FIND_IN_SET(' + placeholder + ', ' + column + ')' for placeholder in placeholders]) + ')'
+			test = 'NOT ' + test if self.optionNegated else test
+		else:
+			test = column + (' NOT IN (' if self.optionNegated else ' IN (') + ', '.join(placeholders) + ')'
+
+		return (test, list(self.optionIds))
+
+	def buildTypedCondition(self, attributeId, backendType):
+		"""Build the `WHERE` condition (and its parameters) for this search against a typed value table aliased as `cev`."""
+
+		valueTest, valueParameters = self.buildValueTest('cev.value')
+		condition = 'cev.attribute_id = %s AND ' + valueTest
+
+		# Only strings can be empty (and comparing a number against '' would quietly drop every `0` on the floor)
+		if backendType in ['varchar', 'text']:
+			condition += " AND cev.value != ''"
+
+		rangeCondition, rangeParameters = self.buildEntityRangeCondition('cev')
+		condition += rangeCondition
+		parameters = [attributeId] + valueParameters + rangeParameters
+
+		if self.valueIds:
+			condition += ' AND cev.value_id IN (' + ', '.join(['%s'] * len(self.valueIds)) + ')'
+			parameters += self.valueIds
+
+		return (condition, parameters)
+
+	def buildTypedSearchQuery(self, attributeId, backendType):
+		"""Build the search query against the single `catalog_%s_entity_%s` table holding the Attribute's values."""
+
+		condition, parameters = self.buildTypedCondition(attributeId, backendType)
+
+		return ("""SELECT
+				ce.sku,
+				ea.attribute_id,
+				ea.attribute_code,
+				cev.value,
+				cev.store_id,
+				ea.is_required AS required
+			FROM catalog_%s_entity_%s AS cev
+			INNER JOIN catalog_%s_entity AS ce
+				ON cev.entity_id = ce.entity_id
+			INNER JOIN eav_attribute AS ea
+				ON cev.attribute_id = ea.attribute_id
+			WHERE """ % (self.scope, backendType, self.scope) + condition,
+			parameters
+		)
+
+	def buildEmptySearchQuery(self, attributeId, backendType):
+		"""
+		Build the search query for the entities whose default value (`store_id` 0) of the Attribute is missing or empty.
+
+		Magento doesn't keep a row at all for most values that were never set, so there is nothing to compare. Instead,...
+		...every entity is left joined against the value table, keeping those without a row (or with a `NULL` or `''` one).
+		"""
+
+		condition = 'cev.value_id IS NULL OR cev.value IS NULL'
+
+		if backendType in ['varchar', 'text']:
+			condition += " OR cev.value = ''"
+
+		rangeCondition, rangeParameters = self.buildEntityRangeCondition('ce')
+
+		return ("""SELECT
+				ce.sku,
+				ea.attribute_id,
+				ea.attribute_code,
+				cev.value,
+				0 AS store_id,
+				ea.is_required AS required
+			FROM catalog_%s_entity AS ce
+			INNER JOIN eav_attribute AS ea
+				ON ea.attribute_id = %%s
+			LEFT JOIN catalog_%s_entity_%s AS cev
+				ON cev.entity_id = ce.entity_id
+				AND cev.attribute_id = ea.attribute_id
+				AND cev.store_id = 0
+			WHERE (""" % (self.scope, self.scope, backendType) + condition + ')' + rangeCondition,
+			[attributeId] + rangeParameters
+		)
+
+	def buildStoreSearchQuery(self, attributeId, backendType):
+		"""
+		Build the search query against the effective values of the Attribute in the chosen store view (or every one).
+
+		# Notes
+		Magento shows a store view's own value (`store_id` = the store view) wherever there is one, and otherwise falls...
+		...back to the default value (`store_id` 0). Joining both onto every pairing of entity and store view resolves...
+		...that in the same single pass as the search itself, returning exactly one (effective) value per entity per...
+		...store view, along with whether it was inherited from the default.
+		"""
+
+		effectiveValue = 'CASE WHEN sv.value_id IS NULL THEN dv.value ELSE sv.value END'
+
+		valueTest, valueParameters = self.buildValueTest(effectiveValue)
+		condition = '(dv.value_id IS NOT NULL OR sv.value_id IS NOT NULL) AND ' + valueTest
+		parameters = [attributeId] + valueParameters
+
+		if backendType in ['varchar', 'text']:
+			condition += ' AND ' + effectiveValue + " != ''"
+
+		if self.storeId is not None:
+			condition += ' AND cs.store_id = %s'
+			parameters.append(self.storeId)
+		else:
+			condition += ' AND cs.store_id != 0'
+
+		rangeCondition, rangeParameters = self.buildEntityRangeCondition('ce')
+		condition += rangeCondition
+		parameters += rangeParameters
+
+		return ("""SELECT
+				ce.sku,
+				ea.attribute_id,
+				ea.attribute_code,
+				""" + effectiveValue + """ AS value,
+				cs.store_id,
+				ea.is_required AS required,
+				cs.code AS store_code,
+				CASE WHEN sv.value_id IS NULL THEN 'yes' ELSE 'no' END AS inherited
+			FROM catalog_%s_entity AS ce
+			INNER JOIN %s AS cs
+			INNER JOIN eav_attribute AS ea
+				ON ea.attribute_id = %%s
+			LEFT JOIN catalog_%s_entity_%s AS dv
+				ON dv.entity_id = ce.entity_id
+				AND dv.attribute_id = ea.attribute_id
+				AND dv.store_id = 0
+			LEFT JOIN catalog_%s_entity_%s AS sv
+				ON sv.entity_id = ce.entity_id
+				AND sv.attribute_id = ea.attribute_id
+				AND sv.store_id = cs.store_id
+			WHERE """ % (self.scope, self.storeTable, self.scope, backendType, self.scope, backendType) + condition,
+			parameters
+		)
+
+	def findFlatRoute(self, attribute):
+		"""
+		Decide (once) whether this store view search can be answered from the flat catalog tables, and report the decision.
+
+		Returns the `(store_id, code, table)` of the flat table of every store view searched, or an empty list when the...
+		...search has to go through the EAV tables instead.
+		"""
+
+		if self.flatRoute is None:
+			self.flatRoute, reason = self.checkFlatTables(attribute)
+
+			if self.flatRoute:
+				print('Searching the flat table' + ('s ' if len(self.flatRoute) > 1 else ' ') + ', '.join(['"' + table + '"' for storeId, code, table in self.flatRoute]) + ' (' + reason + ')...')
+			else:
+				print('Searching the EAV tables (' + reason + ')...')
+
+			if self.profiler:
+				self.profiler.labels['path'] = 'flat' if self.flatRoute else 'eav'
+
+		return self.flatRoute
+
+	def checkFlatTables(self, attribute):
+		"""
+		Returns the flat tables that can answer this search (see `findFlatRoute()`), along with why they can (or can't).
+
+		# Notes
+		Magento keeps one flat table per store view, holding the effective value of each "used in product listing"...
+		...Attribute as a column. Those are only trusted while their indexer is marked up to date, and only when every...
+		...store view searched has one with a column for the Attribute (which `information_schema` tells in one query).
+		A flat table only holds the entities assigned to its store view's website that are enabled in it, where the EAV...
+		...tables hold every entity. So the status Attribute itself (whose disabled entities the flat tables could never...
+		...find) is always searched through the EAV tables, and otherwise the reason given says what the flat route covers.
+		"""
+
+		if not self.useFlat:
+			return ([], 'the flat tables were turned off with --no-flat')
+
+		if self.scope not in self.flatTables:
+			return ([], 'the "' + self.scope + '" catalog entity has no flat tables')
+
+		if attribute['attribute_code'] == self.statusAttributes.get(self.scope):
+			return ([], 'the flat tables only hold enabled entities, so they cannot be searched by "' + attribute['attribute_code'] + '"')
+
+		tablePrefix, indexerCode = self.flatTables[self.scope]
+
+		try:
+			self.dbCursor.execute('SELECT status FROM ' + self.indexProcessTable + ' WHERE indexer_code = %s', (indexerCode,))
+			process = self.dbCursor.fetchone()
+		except pymysql.err.ProgrammingError:
+			process = None
+
+		if process is None:
+			return ([], 'the status of the "' + indexerCode + '" index is unknown')
+
+		if process[0] != 'pending':
+			return ([], 'the "' + indexerCode + '" index is "' + process[0] + '" rather than up to date')
+
+		if self.storeId is not None:
+			stores = [(self.storeId, self.store)]
+		else:
+			self.dbCursor.execute('SELECT store_id, code FROM ' + self.storeTable + ' WHERE store_id != 0 ORDER BY store_id')
+			stores = self.dbCursor.fetchall()
+
+		if not stores:
+			return ([], 'there are no store views')
+
+		route = [(storeId, code, tablePrefix + str(storeId)) for storeId, code in stores]
+
+		self.dbCursor.execute('SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (' + ', '.join(['%s'] * len(route)) + ')',
+			[table for storeId, code, table in route]
+		)
+		columns = {}
+		for table, column in self.dbCursor.fetchall():
+			columns.setdefault(table, set()).add(column)
+
+		for storeId, code, table in route:
+			if table not in columns:
+				return ([], 'there is no "' + table + '" table')
+
+			if attribute['attribute_code'] not in columns[table]:
+				return ([], '"' + attribute['attribute_code'] + '" is not a column of "' + table + '"')
+
+		# The product flat tables carry the SKU, where the category ones have to be joined back onto their entity table for it
+		self.flatSkuColumn = all(['sku' in columns[table] for storeId, code, table in route])
+
+		return (route, 'the "' + indexerCode + '" index is up to date, and only holds the enabled entities of each store view\'s website')
+
+	def buildFlatSearchQuery(self, attributeId, backendType):
+		"""
+		Build the search query against the flat table of the chosen store view (or those of every one, one after the other).
+
+		The flat tables only hold each entity's effective value, so whether it was inherited from the default is "unknown".
+		"""
+
+		column = 'flat.`' + self.attribute + '`'
+		selects = []
+		parameters = []
+
+		for storeId, code, table in self.flatRoute:
+			valueTest, valueParameters = self.buildValueTest(column)
+			condition = column + ' IS NOT NULL AND ' + valueTest
+
+			if backendType in ['varchar', 'text']:
+				condition += ' AND ' + column + " != ''"
+
+			rangeCondition, rangeParameters = self.buildEntityRangeCondition('flat')
+			condition += rangeCondition
+
+			if self.flatSkuColumn:
+				sku = 'flat.sku'
+				join = ''
+			else:
+				sku = 'ce.sku'
+				join = """
+			INNER JOIN catalog_%s_entity AS ce
+				ON ce.entity_id = flat.entity_id""" % (self.scope,)
+
+			selects.append("""SELECT
+				""" + sku + """,
+				ea.attribute_id,
+				ea.attribute_code,
+				""" + column + """ AS value,
+				%s AS store_id,
+				ea.is_required AS required,
+				%s AS store_code,
+				'unknown' AS inherited
+			FROM """ + table + ' AS flat' + join + """
+			INNER JOIN eav_attribute AS ea
+				ON ea.attribute_id = %s
+			WHERE """ + condition)
+			parameters += [storeId, code, attributeId] + valueParameters + rangeParameters
+
+		return ("""
+			UNION ALL
+			""".join(selects), parameters)
+
+	def buildMultiValueSearchQuery(self, attributeId, backendType):
+		"""
+		Build the search query for rows matching any of `values`, reporting which one each row matched as a final column.
+
+		Short lists of exact matches are inlined as an `IN ()` (with `FIELD()` picking out the matching term). Anything...
+		...else is loaded into a session-scoped temporary table and joined against, so it is still one round trip.
+		"""
+
+		placeholders = ', '.join(['%s'] * len(self.values))
+
+		if self.comparison == '=' and len(self.values) <= self.inListLimit:
+			matched = 'ELT(FIELD(cev.value, ' + placeholders + '), ' + placeholders + ')'
+			join = ''
+			condition = 'cev.attribute_id = %s AND cev.value IN (' + placeholders + ')'
+			parameters = self.values + self.values + [attributeId] + self.values
+		else:
+			# The same values serve every chunk of a chunked search
+			if not self.valuesTableLoaded:
+				self.loadValuesTable(backendType)
+				self.valuesTableLoaded = True
+
+			matched = 'sv.term'
+			join = """
+			INNER JOIN mas_search_values AS sv
+				ON cev.value """ + self.comparison + ' sv.term'
+			condition = 'cev.attribute_id = %s'
+			parameters = [attributeId]
+
+		if backendType in ['varchar', 'text']:
+			condition += " AND cev.value != ''"
+
+		rangeCondition, rangeParameters = self.buildEntityRangeCondition('cev')
+		condition += rangeCondition
+		parameters += rangeParameters
+
+		return ("""SELECT
+				ce.sku,
+				ea.attribute_id,
+				ea.attribute_code,
+				cev.value,
+				cev.store_id,
+				ea.is_required AS required,
+				""" + matched + """ AS matched
+			FROM catalog_%s_entity_%s AS cev""" % (self.scope, backendType) + join + """
+			INNER JOIN catalog_%s_entity AS ce
+				ON cev.entity_id = ce.entity_id
+			INNER JOIN eav_attribute AS ea
+				ON cev.attribute_id = ea.attribute_id
+			WHERE """ % (self.scope,) + condition,
+			parameters
+		)
+
+	def buildAggregateQuery(self, sql, parameters):
+		"""
+		Wrap the search query `sql` so that MySQL only returns how many rows (and distinct products) it matches.
+
+		The counts are per group of `aggregate` columns (if any), largest first, and limited to the `top` groups.
+		"""
+
+		groupColumns = [self.aggregateGroupColumns[group][0] for group in self.aggregate]
+
+		sql = 'SELECT ' + ''.join([column + ', ' for column in groupColumns]) + """COUNT(*) AS row_total, COUNT(DISTINCT results.sku) AS product_total
+			FROM (
+				""" + sql + """
+			) AS results"""
+
+		if groupColumns:
+			sql += """
+			GROUP BY """ + ', '.join(groupColumns) + """
+			ORDER BY row_total DESC, """ + ', '.join(groupColumns)
+
+		if self.top:
+			sql += """
+			LIMIT %s"""
+			parameters = parameters + [self.top]
+
+		return (sql, parameters)
+
+	def loadValuesTable(self, backendType):
+		"""Load `values` into the (connection-scoped) temporary table `mas_search_values`."""
+
+		# `LIKE` patterns are always strings, whereas exact matches are best compared using the Attribute's own type
+		columnType = 'TEXT' if self.comparison == 'LIKE' else self.valuesTableColumnTypes[backendType]
+		index = 'INDEX (term(255))' if columnType == 'TEXT' else 'INDEX (term)'
+
+		self.dbCursor.execute('DROP TEMPORARY TABLE IF EXISTS mas_search_values')
+		self.dbCursor.execute('CREATE TEMPORARY TABLE mas_search_values (term ' + columnType + ', ' + index + ')')
+		self.dbCursor.executemany('INSERT INTO mas_search_values (term) VALUES (%s)', self.values)
+
+	def buildCatchAllSearchQuery(self):
+		"""Build the search query that joins every value table (used when the Attribute's `backend_type` is not usable)."""
+
+		# In an ideal world, I could do string interpolation for the table names (since those can't be parameters), and
+		# ...immediately follow that with the parameters for the values (since those *can* be parameters), but instead
+		# ...Python just keeps saying "TypeError: not enough arguments for format string"
+		# Here's an example of what I would like to do:
+		# "some_%s_table INNER JOIN some_%s_other_table WHERE column1 = %s AND column1 = %s" % (tbl1, tbl2), (val1, val2)
+		#
+		# But instead I have to do:
+		# sql1 = "some_%s_table INNER JOIN some_%s_other_table" % (tbl1, tbl2)
+		# query(sql1 + "WHERE column1 =  %s AND column2 = %s", (val1, val2))
+		interpolatedPortion = """SELECT
+				ce.sku,
+				ea.attribute_id,
+				ea.attribute_code,
+				CASE ea.backend_type
+					WHEN 'varchar' THEN ce_varchar.value
+					WHEN 'int' THEN ce_int.value
+					WHEN 'text' THEN ce_text.value
+					WHEN 'decimal' THEN ce_decimal.value
+					WHEN 'datetime' THEN ce_datetime.value
+					ELSE ea.backend_type
+				END AS value,
+				CASE ea.backend_type
+					WHEN 'varchar' THEN ce_varchar.store_id
+					WHEN 'int' THEN ce_int.store_id
+					WHEN 'text' THEN ce_text.store_id
+					WHEN 'decimal' THEN ce_decimal.store_id
+					WHEN 'datetime' THEN ce_datetime.store_id
+					ELSE ea.backend_type
+				END AS store_id,
+				ea.is_required AS required
+			FROM catalog_%s_entity AS ce
+			LEFT JOIN eav_attribute AS ea
+				ON ce.entity_type_id = ea.entity_type_id
+			LEFT JOIN catalog_%s_entity_varchar AS ce_varchar
+				ON ce.entity_id = ce_varchar.entity_id
+				AND ea.attribute_id = ce_varchar.attribute_id
+				AND ea.backend_type = 'varchar'
+			LEFT JOIN catalog_%s_entity_int AS ce_int
+				ON ce.entity_id = ce_int.entity_id
+				AND ea.attribute_id = ce_int.attribute_id
+				AND ea.backend_type = 'int'
+			LEFT JOIN catalog_%s_entity_text AS ce_text
+				ON ce.entity_id = ce_text.entity_id
+				AND ea.attribute_id = ce_text.attribute_id
+				AND ea.backend_type = 'text'
+			LEFT JOIN catalog_%s_entity_decimal AS ce_decimal
+				ON ce.entity_id = ce_decimal.entity_id
+				AND ea.attribute_id = ce_decimal.attribute_id
+				AND ea.backend_type = 'decimal'
+			LEFT JOIN catalog_%s_entity_datetime AS ce_datetime
+				ON ce.entity_id = ce_datetime.entity_id
+				AND ea.attribute_id = ce_datetime.attribute_id
+				AND ea.backend_type = 'datetime'
+			%sHAVING `value` %s """ % (self.scope, self.scope, self.scope, self.scope, self.scope, self.scope, '%s', self.comparison)
+
+		rangeCondition, rangeParameters = self.buildEntityRangeCondition('ce')
+		if rangeCondition:
+			rangeCondition = 'WHERE 1' + rangeCondition + """
+			"""
+
+		return ("""SELECT * FROM (
+				""" + interpolatedPortion % (rangeCondition,) + """%s
+					AND `attribute_code` = %s
+			) AS tab
+			WHERE tab.value != ''""",
+			rangeParameters + [self.value, self.attribute]
+		)
+
+	def getResults(self):
+		"""Wrapper method for formatting and outputting results."""
+
+		if self.isStreamed():
+			self.streamResults()
+			return
+
+		# Basically: self.output = self.formatResultsAs{{self.outputFormat}}
+		# (extra columns, like the matching value of a multi-value search, and aggregates are only known to the generic formatters)
+		with self.profilePhase('format'):
+			if self.extraColumns or self.aggregateColumns or self.optionLabels is not None:
+				self.output = ''.join(self.formatResults(self.dbCursor))
+			elif self.outputFormat == 'text':
+				self.output = self.formatResultsAsText()
+			elif self.outputFormat == 'csv':
+				self.output = self.formatResultsAsCsv()
+
+		if self.profiler:
+			self.profiler.bytes += len(self.output.encode('utf-8'))
+
+		with self.profilePhase('write'):
+			if self.outputLocation == 'stdout':
+				self.writeResultsToStdout()
+			else:
+				self.writeResultsToFile()
+
+	def isStreamed(self):
+		"""Whether the results go straight from the cursor to the output (see `streamResults()`), rather than all at once."""
+
+		# The export formats are always streamed, as are the results being matched locally (which only become known as...
+		# ...each chunk comes back from the worker processes)
+		return self.stream or self.outputFormat not in ['text', 'csv'] or self.comparison in matching.comparisons
+
+	def streamResults(self):
+		"""Pipe the results straight from the cursor, through the formatter, and into the output one chunk at a time."""
+
+		results = self.matchResults() if self.comparison in matching.comparisons else output.fetchInChunks(self.dbCursor, self.fetchSize)
+
+		if self.outputFormat in output.columnarFormats:
+			if self.optionLabels is not None:
+				results = self.decodeOptionLabels(results)
+
+			columns, columnTypes = self.listColumnTypes()
+
+			with self.profilePhase('write'):
+				output.writeColumnar(results, self.outputLocation, self.outputFormat, columns, columnTypes)
+
+			return
+
+		with self.profilePhase('write'):
+			output.writeLines(self.profileLines(self.formatResults(results)), self.outputLocation, output.compressedFormats.get(self.outputFormat))
+
+	def matchResults(self):
+		"""
+		Generator that yields the rows of the executed `dbCursor` (every value of the Attribute) that match locally.
+
+		The rows are fetched `fetchSize` at a time and handed out to a pool of worker processes, which match a chunk each...
+		...at the same time as the next ones are fetched (see `matching.matchInParallel()`). That keeps costly matching...
+		...(e.g. fuzzy matching long `text` values) off the database server, and spreads it over every local core instead.
+		"""
+
+		chunks = output.fetchChunks(self.dbCursor, self.fetchSize)
+
+		yield from matching.matchInParallel(chunks, self.comparison, self.value, self.fuzzyThreshold, self.matchProcesses)
+
+	def listColumnTypes(self):
+		"""
+		Returns the columns of the results (or of their aggregates), along with the type of each one known up front.
+
+		The type of the values follows the Attribute's `backend_type` (option labels always being strings). Anything else,...
+		...like the values of the catch-all search, or what each row of a multi-value search matched, is typed by the...
+		...results themselves.
+		"""
+
+		attribute = self.lookupAttribute()
+
+		if self.optionLabels is not None:
+			valueType = 'string'
+		else:
+			valueType = output.valueTypes.get(attribute['backend_type']) if attribute else None
+
+		if self.aggregateColumns:
+			return (self.aggregateColumns, dict(Value=valueType, Store='int32', Rows='int64', Products='int64'))
+
+		return (output.resultColumns + self.extraColumns, dict(sku='string', attribute_id='int32', attribute_code='string', value=valueType, store_id='int32', required='int8', Store='string', Inherited='string'))
+
+	def writeTable(self, rows, columns, columnTypes={}):
+		"""Write `rows` (of the named `columns`) to the output in the chosen format, as they arrive."""
+
+		if self.outputFormat in output.columnarFormats:
+			output.writeColumnar(rows, self.outputLocation, self.outputFormat, columns, columnTypes)
+		else:
+			output.writeLines(output.generateTable(rows, self.outputFormat, columns), self.outputLocation, output.compressedFormats.get(self.outputFormat))
+
+	def formatResults(self, rows):
+		"""Generator that lazily turns result `rows` (of a search, or of its aggregates) into lines of output."""
+
+		if self.optionLabels is not None:
+			rows = self.decodeOptionLabels(rows)
+
+		if self.aggregateColumns:
+			return output.generateTable(rows, self.outputFormat, self.aggregateColumns)
+
+		return output.generateResults(rows, self.outputFormat, self.extraColumns)
+
+	def writeRows(self, stream, dbCursor):
+		"""Format the rows of an executed `dbCursor` and write them to the open output `stream`, one chunk at a time."""
+
+		rows = output.fetchInChunks(dbCursor, self.fetchSize)
+
+		if self.optionLabels is not None:
+			rows = self.decodeOptionLabels(rows)
+
+		with self.profilePhase('write'):
+			for line in self.profileLines(output.formatRow(row, self.outputFormat, self.extraColumns) for row in rows):
+				stream.write(line)
+
+	def decodeOptionLabels(self, rows):
+		"""Generator that passes result `rows` along with their option IDs replaced by the labels of those options."""
+
+		# The value (and store) of a search's rows, or of its aggregates when they are grouped by value (and store)
+		if self.aggregateColumns:
+			if 'Value' not in self.aggregateColumns:
+				yield from rows
+				return
+
+			valueIndex = self.aggregateColumns.index('Value')
+			storeIndex = self.aggregateColumns.index('Store') if 'Store' in self.aggregateColumns else None
+		else:
+			valueIndex = 3
+			storeIndex = 4
+
+		for row in rows:
+			if row[valueIndex] is None:
+				yield row
+				continue
+
+			storeId = row[storeIndex] if storeIndex is not None else 0
+			optionIds = str(row[valueIndex]).split(',') if self.multiselect else [row[valueIndex]]
+
+			labels = []
+			for optionId in optionIds:
+				# A store view's own label, else the default (admin) one, else the ID itself (e.g. for a deleted option)
+				optionLabels = self.optionLabels.get(int(optionId), {}) if str(optionId).strip().isdigit() else {}
+				labels.append(optionLabels.get(storeId) or optionLabels.get(0) or str(optionId))
+
+			yield tuple(row[:valueIndex]) + (', '.join(labels),) + tuple(row[valueIndex + 1:])
+
+	def profilePhase(self, name):
+		"""Returns the profiler's `phase()` for `name`, or a context manager that does nothing when not profiling."""
+
+		return self.profiler.phase(name) if self.profiler else contextlib.nullcontext()
+
+	def profileCursor(self, dbCursor):
+		"""Returns `dbCursor` wrapped so that fetching its rows is timed and counted (when profiling)."""
+
+		return profiling.ProfiledCursor(dbCursor, self.profiler) if self.profiler else dbCursor
+
+	def profileLines(self, lines):
+		"""Returns the output `lines` wrapped so that formatting them is timed and their bytes counted (when profiling)."""
+
+		return self.profiler.profileLines(lines) if self.profiler else lines
+
+	def formatResultsAsText(self):
+		"""Format the results as plain text/ASCII-like."""
+
+		return ''.join(output.generateResults(self.dbCursor, 'text'))
+
+	def formatResultsAsCsv(self):
+		"""Format the results as a CSV."""
+
+		return ''.join(output.generateResults(self.dbCursor, 'csv'))
+
+	def writeResultsToStdout(self):
+		"""print()'s the output."""
+
+		print(self.output)
+
+	def writeResultsToFile(self):
+		"""Places the output into a file at the location specified by the outputLocation property."""
+
+		with open(self.outputLocation, 'w', newline='') as file:
+			file.write(self.output + "\n")
+			file.close()
+
+
+class MagentoAttributeBatch(MagentoAttributeSearcher):
+	"""
+	Runs many searches (read from a YAML or JSONL file) over a single DB connection.
+
+	Searches that target the same typed value table are answered together by one pass over that table.
+	"""
+
+	def __init__(self, batchFile, defaults, fetchSize=1000, instance=None):
+		"""Connect, then read and validate every search in `batchFile`, filling in anything missing from `defaults`."""
+
+		self.batchFile = batchFile
+		self.defaults = defaults
+		self.automated = True
+		self.stream = True
+		self.fetchSize = fetchSize
+		self.instance = instance
+
+		self.initHelpers()
+
+		self.importDbConfig()
+
+		if not self.dbConn:
+			sys.exit()
+
+		self.searches = [self.createSearch(spec) for spec in self.loadSpecs()]
+
+		if not self.validateOutputs():
+			sys.exit()
+
+	def loadSpecs(self):
+		"""
+		Read the search specifications from the batch file.
+
+		`.jsonl` files hold one JSON object per line. Anything else is read as YAML, and may either be a list of...
+		...searches or a mapping with such a list under `searches`. Each search may set any of `scope`, `attribute`,...
+		...`comparison`, `value`, `values`, `format`, and `output`.
+		"""
+
+		with open(self.batchFile) as batchFile:
+			if self.batchFile.endswith('.jsonl'):
+				specs = [json.loads(line) for line in batchFile if line.strip()]
+			else:
+				specs = yaml.safe_load(batchFile)
+
+		if isinstance(specs, dict):
+			specs = specs.get('searches', [])
+
+		if not specs:
+			print('No searches found in "' + self.batchFile + '".')
+			sys.exit()
+
+		return specs
+
+	def createSearch(self, spec):
+		"""Set up (and validate) one search from its `spec`, sharing this batch's connection."""
+
+		settings = dict(self.defaults)
+		settings.update(spec)
+
+		return MagentoAttributeSearcher(settings['scope'], settings['attribute'], settings['comparison'], settings['value'], settings['format'], settings['output'], True, True, self.fetchSize, self, settings.get('values'))
+
+	def validateOutputs(self):
+		"""
+		Check that the searches sharing an output can all be written to it, explaining what is wrong when they can't.
+
+		The rows of every search sharing an output have to line up with the one header at its top, so they must all be in...
+		...the same format with the same columns. A file written by a search running on its own (see `isSharedScan()`) is...
+		...started over by that search, so it can't be shared at all.
+		"""
+
+		outputs = {}
+		for search in self.searches:
+			outputs.setdefault(search.outputLocation, []).append(search)
+
+		for outputLocation, searches in outputs.items():
+			if len(set([(search.outputFormat, tuple(search.extraColumns)) for search in searches])) > 1:
+				print('The searches writing to "' + outputLocation + '" must all use the same format (and columns).')
+				return False
+
+			if len(searches) > 1 and outputLocation != 'stdout' and not all([self.isSharedScan(search) for search in searches]):
+				print('The searches writing to "' + outputLocation + '" include one that runs on its own, which needs an output of its own.')
+				return False
+
+		return True
+
+	def isSharedScan(self, search):
+		"""Whether `search` is answered by a shared scan of its value table (see `runSharedScan()`), rather than on its own."""
+
+		attribute = search.lookupAttribute()
+
+		# Multi-value searches already are a single query of their own, so they are left to run by themselves
+		# (as are those written in the export formats, which each need a writer of their own, those matched locally, and...
+		# ...those finding empty values, which are looked for among the entities rather than the values)
+		return not (attribute is None or attribute['backend_type'] not in self.valueTableBackendTypes or search.values or search.outputFormat not in ['text', 'csv'] or search.comparison in matching.comparisons + ['EMPTY'])
+
+	def run(self):
+		"""Execute every search, grouped by the value table that it needs to read."""
+
+		print('Running ' + str(len(self.searches)) + ' searches...')
+
+		groups = {}
+		for search in self.searches:
+			if not self.isSharedScan(search):
+				search.executeSearch()
+				continue
+
+			attribute = search.lookupAttribute()
+			groups.setdefault((search.scope, attribute['backend_type']), []).append((search, attribute['attribute_id']))
+
+		# Searches sharing an output location also share its stream (opening it twice would clobber it), whichever...
+		# ...value table they scan
+		streams = {}
+		for members in groups.values():
+			for search, attributeId in members:
+				if search.outputLocation not in streams:
+					streams[search.outputLocation] = output.openOutput(search.outputLocation)
+					streams[search.outputLocation].write(output.formatHeader(search.outputFormat, search.extraColumns))
+
+		for (scope, backendType), members in groups.items():
+			self.runSharedScan(scope, backendType, members, streams)
+
+		for stream in streams.values():
+			output.closeOutput(stream)
+
+		self.closeDb()
+
+	def runSharedScan(self, scope, backendType, members, streams):
+		"""
+		Answer every search in `members` (`(search, attribute_id)` pairs) with a single query on one value table.
+
+		Each search's condition is evaluated once in the `WHERE` clause (to find rows matching *any* of them) and once...
+		...more as a flag column, which is then used to route every row to the output(s) of the search(es) it matched...
+		...(among the open `streams`, by output location).
+		"""
+
+		print('Scanning "catalog_' + scope + '_entity_' + backendType + '" for ' + str(len(members)) + ' searches...')
+
+		conditions = []
+		conditionParameters = []
+		for search, attributeId in members:
+			condition, parameters = search.buildTypedCondition(attributeId, backendType)
+			conditions.append('(' + condition + ')')
+			conditionParameters += parameters
+
+		flags = ''.join([',\n\t\t\t\t' + condition + ' AS matches_' + str(index) for index, condition in enumerate(conditions)])
+
+		dbCursor = self.dbConn.cursor(pymysql.cursors.SSCursor)
+		dbCursor.execute("""SELECT
+				ce.sku,
+				ea.attribute_id,
+				ea.attribute_code,
+				cev.value,
+				cev.store_id,
+				ea.is_required AS required""" + flags + """
+			FROM catalog_%s_entity_%s AS cev
+			INNER JOIN catalog_%s_entity AS ce
+				ON cev.entity_id = ce.entity_id
+			INNER JOIN eav_attribute AS ea
+				ON cev.attribute_id = ea.attribute_id
+			WHERE """ % (scope, backendType, scope) + ' OR '.join(conditions),
+			conditionParameters + conditionParameters
+		)
+
+		for row in output.fetchInChunks(dbCursor, self.fetchSize):
+			for index, (search, attributeId) in enumerate(members):
+				if row[6 + index]:
+					streams[search.outputLocation].write(output.formatRow(row, search.outputFormat))
+
+		dbCursor.close()
+
+
+class MagentoAttributeSnapshotter(MagentoAttributeSearcher):
+	"""Takes (or incrementally refreshes) a local snapshot of one catalog entity, to search later on without MySQL."""
+
+	def __init__(self, snapshotFile, scope, fetchSize=1000, instance=None):
+		"""Validate the scope and connect."""
+
+		self.snapshotFile = snapshotFile
+		self.scope = scope
+		self.automated = True
+		self.fetchSize = fetchSize
+		self.instance = instance
+
+		self.initHelpers()
+
+		if not self.validateScope():
+			print('Invalid value "' + str(self.scope) + '" for Scope.')
+			sys.exit()
+
+		self.importDbConfig()
+
+		if not self.dbConn:
+			sys.exit()
+
+	def run(self):
+		"""Take the snapshot, or only re-pull what has changed if there already is one of this scope."""
+
+		eavSnapshot = snapshot.EavSnapshot(self.snapshotFile)
+		refreshing = eavSnapshot.getMeta('scope') == self.scope
+
+		print(('Refreshing' if refreshing else 'Taking') + ' the snapshot of the "' + self.scope + '" catalog entity in "' + self.snapshotFile + '"...')
+
+		started = time.time()
+		entityCount = eavSnapshot.update(self.dbConn, self.scope, self.fetchSize)
+
+		print('%s entities %s in %.1f seconds.' % (entityCount, 're-pulled' if refreshing else 'copied', time.time() - started))
+
+		eavSnapshot.close()
+		self.closeDb()
+
+
+class MagentoAttributeIndexer(MagentoAttributeSearcher):
+	"""Builds (or incrementally updates) the local trigram index of one `varchar` or `text` Attribute."""
+
+	def __init__(self, indexFile, scope, attribute, fetchSize=1000, instance=None):
+		"""Connect, then validate the scope and Attribute."""
+
+		self.indexFile = indexFile
+		self.scope = scope
+		self.attribute = attribute
+		self.automated = True
+		self.fetchSize = fetchSize
+		self.instance = instance
+
+		self.initHelpers()
+
+		if not self.validateScope():
+			print('Invalid value "' + str(self.scope) + '" for Scope.')
+			sys.exit()
+
+		self.importDbConfig()
+
+		if not self.dbConn:
+			sys.exit()
+
+		if not self.validateAttribute() or self.lookupAttribute()['backend_type'] not in ['varchar', 'text']:
+			print('Only existing `varchar` and `text` Attributes can be indexed, which "' + str(self.attribute) + '" is not.')
+			sys.exit()
+
+	def run(self):
+		"""Index the Attribute and report on how that went."""
+
+		attribute = self.lookupAttribute()
+		trigramIndex = trigrams.TrigramIndex(self.indexFile)
+
+		print('Indexing the "' + self.attribute + '" Attribute in "' + self.indexFile + '"...')
+		statistics = trigramIndex.update(self.dbConn, self.dbIdentity, self.scope, attribute['attribute_id'], attribute['backend_type'], self.fetchSize)
+
+		print('%s %s rows in %.1f seconds.' % ('Updated' if statistics['incremental'] else 'Indexed', statistics['rows_indexed'], statistics['seconds']))
+		print('The Attribute now has %s trigrams with %s postings, and the index file is %.1f MB.' % (statistics['trigrams'], statistics['postings'], statistics['file_bytes'] / 1048576.0))
+
+		trigramIndex.close()
+		self.closeDb()
+
+
+class MagentoAttributeQuery(MagentoAttributeSearcher):
+	"""
+	Finds the entities matching a compound query over several Attributes (see `expressions.ExpressionParser`).
+
+	Every condition is its own query against the one value table that can hold the Attribute's values, returning only...
+	...the sorted `entity_id`s of the entities having a matching value (in any store). These are then combined as sets...
+	...locally, and only the SKUs of the final set of entities are looked up at the end.
+	"""
+
+	def __init__(self, scope, query, outputFormat, outputLocation, fetchSize=1000, instance=None, count=False):
+		"""Parse the `query`, connect, then validate every Attribute (and comparison) in it."""
+
+		self.scope = scope
+		self.query = query
+		self.outputFormat = outputFormat
+		self.outputLocation = outputLocation
+		self.automated = True
+		self.fetchSize = fetchSize
+		self.instance = instance
+		self.count = count
+
+		self.initHelpers()
+
+		if not self.validateScope():
+			print('Invalid value "' + str(self.scope) + '" for Scope.')
+			sys.exit()
+
+		if not self.validateOutputFormat():
+			print('Invalid value "' + str(self.outputFormat) + '" for OutputFormat.')
+			sys.exit()
+
+		if not self.validateExportFormat():
+			sys.exit()
+
+		try:
+			self.expression = expressions.ExpressionParser(query).tree
+		except ValueError as error:
+			print('Invalid query: ' + str(error))
+			sys.exit()
+
+		self.importDbConfig()
+
+		if not self.dbConn:
+			sys.exit()
+
+		for condition, attributeCode, comparison, value in expressions.listConditions(self.expression):
+			self.attribute = attributeCode
+			if not self.validateAttribute():
+				print('Invalid query: there is no "' + attributeCode + '" Attribute in the "' + self.scope + '" catalog entity.')
+				sys.exit()
+
+			if comparison not in expressions.comparisons + ['IN', 'IS NOT']:
+				print('Invalid query: "' + comparison + '" is not a supported comparison.')
+				sys.exit()
+
+	def run(self):
+		"""Evaluate the query, then write out the SKUs of the matching entities (or just how many there are)."""
+
+		print('Querying "' + self.query + '" (within the "' + self.scope + '" catalog entity)...')
+
+		evaluator = expressions.ExpressionEvaluator(self.fetchConditionIds, self.fetchAllIds)
+		entityIds = evaluator.evaluate(self.expression)
+
+		if self.count:
+			self.writeTable([(len(entityIds),)], ['Products'], dict(Products='int64'))
+		else:
+			self.writeTable(self.fetchSkus(entityIds), ['SKU'], dict(SKU='string'))
+
+		self.closeDb()
+
+	def fetchIds(self, sql, parameters):
+		"""Returns the `entity_id`s (the only column) that `sql` returns, in order, as a compact array."""
+
+		entityIds = array.array('I')
+
+		dbCursor = self.dbConn.cursor(pymysql.cursors.SSCursor)
+		dbCursor.execute(sql, parameters)
+
+		while True:
+			rows = dbCursor.fetchmany(self.fetchSize)
+			if not rows:
+				break
+
+			entityIds.extend([row[0] for row in rows])
+
+		dbCursor.close()
+
+		return entityIds
+
+	def fetchAllIds(self):
+		"""Returns the `entity_id`s of every entity, in order."""
+
+		return self.fetchIds('SELECT entity_id FROM catalog_%s_entity ORDER BY entity_id' % (self.scope,), [])
+
+	def fetchConditionIds(self, condition):
+		"""Returns the `entity_id`s, in order, of every entity with a value (in any store) matching the `condition` node."""
+
+		ignored, attributeCode, comparison, value = condition
+
+		self.attribute = attributeCode
+		attribute = self.lookupAttribute()
+
+		if comparison == 'IN':
+			test = ' IN (' + ', '.join(['%s'] * len(value)) + ')'
+			parameters = list(value)
+		elif comparison == 'IS NOT':
+			test = ' IS NOT NULL'
+			parameters = []
+		else:
+			test = ' ' + comparison + ' %s'
+			parameters = [value]
+
+		# `static` Attributes are columns of the entity table itself (named after the Attribute)
+		if attribute['backend_type'] not in self.valueTableBackendTypes:
+			return self.fetchIds(
+				'SELECT entity_id FROM catalog_%s_entity WHERE `%s`' % (self.scope, attributeCode.replace('`', '')) + test + ' ORDER BY entity_id',
+				parameters
+			)
+
+		sql = 'SELECT DISTINCT entity_id FROM catalog_%s_entity_%s WHERE attribute_id = %%s AND value' % (self.scope, attribute['backend_type']) + test
+
+		# An empty string counts as no value at all, the same as it does for a regular search
+		if attribute['backend_type'] in ['varchar', 'text']:
+			sql += " AND value != ''"
+
+		return self.fetchIds(sql + ' ORDER BY entity_id', [attribute['attribute_id']] + parameters)
+
+	def fetchSkus(self, entityIds):
+		"""Generator that yields the `(sku,)` of each of `entityIds`, looking them up an `IN ()`-sized batch at a time."""
+
+		for start in range(0, len(entityIds), self.inListLimit):
+			batch = entityIds[start:start + self.inListLimit].tolist()
+
+			self.dbCursor.execute(
+				'SELECT sku FROM catalog_%s_entity WHERE entity_id IN (' % (self.scope,) + ', '.join(['%s'] * len(batch)) + ') ORDER BY entity_id',
+				batch
+			)
+
+			for row in self.dbCursor.fetchall():
+				yield row
+
+
+class MagentoAttributeConnection(MagentoAttributeSearcher):
+	"""One open DB connection (along with its Attribute metadata cache) that searches can share, as in a pool."""
+
+	def __init__(self, instance=None, attributeCache=None, scope=None):
+		"""Connect to `instance` (see `importDbConfig()`), sharing `attributeCache` if one is given, to look up the Attributes of `scope`."""
+
+		self.automated = True
+		self.instance = instance
+		self.scope = scope
+
+		self.initHelpers(attributeCache)
+
+		self.importDbConfig()
+
+		if not self.dbConn:
+			sys.exit()
+
+class MagentoAttributeServer(object):
+	"""
+	Answers searches sent as JSON over a local Unix socket (see `socketapi.py`, and "Magento-Attribute-Client.py").
+
+	Each instance gets a pool of up to `poolSize` connections, which are kept open (along with the instance's Attribute...
+	...metadata cache) from one search to the next, so that a search only pays for its own queries. Every connection...
+	...has a thread to itself while it serves a search, and its transaction is ended afterwards so that the next search...
+	...sees the latest data. The metadata fingerprints are re-checked once they are older than `metadataTtl` seconds.
+	"""
+
+	def __init__(self, socketPath, poolSize=4, fetchSize=1000, useResultCache=True, resultCacheTtl=3600, metadataTtl=60):
+		"""Set up (but don't start) the server on `socketPath`."""
+
+		self.socketPath = socketPath
+		self.poolSize = poolSize
+		self.fetchSize = fetchSize
+		self.useResultCache = useResultCache
+		self.resultCacheTtl = resultCacheTtl
+		self.metadataTtl = metadataTtl
+
+		# The idle connections of each instance, how many each has open in all, and their shared Attribute metadata caches
+		self.pools = {}
+		self.openCounts = {}
+		self.attributeCaches = {}
+		self.poolLock = threading.Lock()
+		self.metadataCheckedAt = time.time()
+
+		self.output = None
+
+	def serve(self):
+		"""Listen on the socket and answer searches until interrupted."""
+
+		if os.path.exists(self.socketPath):
+			probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+			try:
+				probe.connect(self.socketPath)
+				print('Another server is already listening on "' + self.socketPath + '".')
+				sys.exit()
+			except OSError:
+				# Left behind by a server that did not shut down cleanly
+				os.remove(self.socketPath)
+			finally:
+				probe.close()
+
+		# What each search prints (e.g. why it failed) is captured per thread, to be sent back to its client
+		self.output = socketapi.ThreadOutput(sys.stdout)
+		sys.stdout = self.output
+
+		server = socketserver.ThreadingUnixStreamServer(self.socketPath, lambda clientSocket, address, server: self.handle(clientSocket))
+		server.daemon_threads = True
+
+		# Only the user running the server gets to search through it
+		os.chmod(self.socketPath, 0o600)
+
+		print('Listening for searches on "' + self.socketPath + '" (press Ctrl+C to stop)...')
+
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			print('Shutting down...')
+		finally:
+			server.server_close()
+			os.remove(self.socketPath)
+			self.closeConnections()
+			sys.stdout = self.output.stdout
+
+	def handle(self, clientSocket):
+		"""Answer the single search request sent over `clientSocket`, then report how it went."""
+
+		started = time.perf_counter()
+		response = socketapi.ResponseStream(clientSocket)
+		messages = []
+		request = {}
+
+		try:
+			with self.output.capture(messages):
+				request = socketapi.readRequest(clientSocket.makefile('rb'))
+				self.runSearch(request, response)
+
+			response.flush()
+			status = dict(ok=True, messages=''.join(messages))
+		# A search that fails, even by `sys.exit()`ing (as validation does), is only reported back to its own client
+		except BaseException as error:
+			status = dict(ok=False, error=''.join(messages).strip() or str(error) or type(error).__name__)
+
+		status['seconds'] = time.perf_counter() - started
+
+		try:
+			socketapi.writeFrame(clientSocket, 'done', json.dumps(status).encode('utf-8'))
+		except OSError:
+			# The client has already gone away
+			pass
+
+		print('%s %s %s: %s in %.1f ms' % (request.get('attribute'), request.get('comparison', 'LIKE'), request.get('value', request.get('values')), 'ok' if status['ok'] else 'failed', status['seconds'] * 1000))
+
+	def runSearch(self, request, response):
+		"""Run the search described by `request` on a pooled connection, writing its output to the `response` stream."""
+
+		# The other formats are binary (or compressed), which would have to be sent back as such
+		if request.get('format', 'text') not in output.lineFormats:
+			print('The server only answers in the ' + ', '.join(output.lineFormats) + ' formats.')
+			sys.exit()
+
+		instance = request.get('instance')
+		connection = self.acquireConnection(instance)
+		healthy = False
+
+		try:
+			searcher = MagentoAttributeSearcher(
+				request.get('scope', 'product'), request.get('attribute'), request.get('comparison', 'LIKE'), request.get('value', ''),
+				request.get('format', 'text'), response, True, True, self.fetchSize, connection, request.get('values'), instance,
+				useResultCache=self.useResultCache, resultCacheTtl=self.resultCacheTtl, aggregate=request.get('aggregate'),
+				top=request.get('top'), store=request.get('store'), labels=bool(request.get('labels')), useFlat=request.get('flat', True)
+			)
+
+			try:
+				searcher.executeSearch()
+			finally:
+				if searcher.resultCache:
+					searcher.resultCache.close()
+
+			healthy = True
+		except SystemExit:
+			# Turned down before anything was left half-read on the connection
+			healthy = True
+			raise
+		finally:
+			self.releaseConnection(instance, connection, healthy)
+
+	def acquireConnection(self, instance):
+		"""Returns an idle connection to `instance` from its pool (opening a new one, or waiting for one, if there is none)."""
+
+		with self.poolLock:
+			pool = self.pools.setdefault(instance, queue.Queue())
+
+			if time.time() - self.metadataCheckedAt > self.metadataTtl:
+				for attributeCache in self.attributeCaches.values():
+					attributeCache.expire()
+
+				self.metadataCheckedAt = time.time()
+
+			opening = pool.empty() and self.openCounts.get(instance, 0) < self.poolSize
+			if opening:
+				self.openCounts[instance] = self.openCounts.get(instance, 0) + 1
+
+		if not opening:
+			connection = pool.get()
+
+			# A connection that has been idle for a while may well have been closed by the server in the meantime
+			connection.dbConn.ping(reconnect=True)
+			connection.dbCursor = connection.dbConn.cursor()
+
+			return connection
+
+		try:
+			connection = MagentoAttributeConnection(instance)
+		except BaseException:
+			with self.poolLock:
+				self.openCounts[instance] -= 1
+			raise
+
+		with self.poolLock:
+			if connection.dbIdentity not in self.attributeCaches:
+				self.attributeCaches[connection.dbIdentity] = attributecache.AttributeCache(MagentoAttributeSearcher.attributeCachePath, connection.dbIdentity)
+
+			connection.attributeCache = self.attributeCaches[connection.dbIdentity]
+
+		return connection
+
+	def releaseConnection(self, instance, connection, healthy):
+		"""Return `connection` to the pool of `instance`, or close it if it may have been left in an unknown state."""
+
+		if healthy:
+			# Ending the transaction lets the next search see the latest data, rather than this one's read view
+			connection.dbConn.commit()
+			self.pools[instance].put(connection)
+			return
+
+		connection.dbConn.close()
+
+		with self.poolLock:
+			self.openCounts[instance] -= 1
+
+	def closeConnections(self):
+		"""Close every idle connection, and the Attribute metadata caches."""
+
+		for pool in self.pools.values():
+			while not pool.empty():
+				pool.get().dbConn.close()
+
+		for attributeCache in self.attributeCaches.values():
+			attributeCache.close()
+
+class MagentoAttributeDiff(object):
+	"""
+	Compares the values of one or more Attributes between two Magento databases (e.g. staging and production).
+
+	# Notes
+	Both sides stream their `(sku, store_id, value)` rows ordered by the bytes of the SKU (so that MySQL and Python agree...
+	...on the order, whatever the collation) and then by store. Walking the two streams side by side (a merge join) then...
+	...finds every difference while only ever holding one row of each side in memory, however big the catalog.
+	"""
+
+	def __init__(self, instances, scope, attributes, outputFormat, outputLocation, fetchSize=1000):
+		"""Connect to both `instances`, and check that the `attributes` (a comma-separated string of them) exist on both sides."""
+
+		if len(instances) != 2 or None in instances:
+			print('Please name the two instances to compare with -i (e.g. -i staging -i production).')
+			sys.exit()
+
+		if not attributes:
+			print('Please name the Attribute(s) to compare with -a (comma-separate several).')
+			sys.exit()
+
+		# The differences are written out as they are found, in between reporting on each Attribute
+		if outputFormat not in output.outputFormats or outputFormat in output.columnarFormats or output.findMissingPackage(outputFormat):
+			print('Invalid value "' + str(outputFormat) + '" for OutputFormat (the differences can be written as ' + ', '.join([format for format in output.outputFormats if format not in output.columnarFormats]) + ').')
+			sys.exit()
+
+		if outputFormat not in output.lineFormats and outputLocation == 'stdout':
+			print('The "' + outputFormat + '" format is binary, so it can only be written to a file (see -o).')
+			sys.exit()
+
+		self.instances = instances
+		self.scope = scope
+		self.outputFormat = outputFormat
+		self.outputLocation = outputLocation
+		self.fetchSize = fetchSize
+		self.columns = ['Difference', 'SKU', 'Attribute', 'Store'] + instances
+
+		self.connections = [MagentoAttributeConnection(instance, scope=scope) for instance in instances]
+		self.attributes = [attribute.strip() for attribute in attributes.split(',') if attribute.strip()]
+
+		for attribute in self.attributes:
+			for instance, connection in zip(self.instances, self.connections):
+				if connection.loadAttributeMetadata().getAttribute('catalog_' + scope, attribute) is None:
+					print('There is no "' + attribute + '" Attribute on "' + instance + '".')
+					sys.exit()
+
+	def run(self):
+		"""Compare every Attribute in turn, writing out the differences as they are found."""
+
+		stream = output.openOutput(self.outputLocation, compression=output.compressedFormats.get(self.outputFormat))
+		if output.getLineFormat(self.outputFormat) == 'csv':
+			stream.write(output.formatCsvLine(self.columns))
+
+		for attribute in self.attributes:
+			counts = dict(missing=0, extra=0, changed=0, same=0)
+
+			# MySQL sorts both sides at the same time, rather than one after the other
+			with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+				cursors = list(executor.map(lambda connection: self.openStream(connection, attribute), self.connections))
+
+			differences = self.mergeJoin(*[self.checkOrder(output.fetchInChunks(dbCursor, self.fetchSize), instance) for dbCursor, instance in zip(cursors, self.instances)])
+
+			for difference, key, leftValue, rightValue in differences:
+				counts[difference] += 1
+
+				if difference != 'same':
+					stream.write(output.formatTableRow([difference, key[0], attribute, key[1], leftValue, rightValue], self.outputFormat, self.columns))
+
+			for dbCursor in cursors:
+				dbCursor.close()
+
+			print('"%s": %s missing from "%s", %s extra, %s changed, and %s the same.' % (attribute, counts['missing'], self.instances[1], counts['extra'], counts['changed'], counts['same']), file=sys.stderr)
+
+		output.closeOutput(stream)
+
+		for connection in self.connections:
+			connection.closeDb()
+
+	def openStream(self, connection, attributeCode):
+		"""Returns an unbuffered cursor over the `(sku, store_id, value)` rows of `attributeCode` on `connection`, in key order."""
+
+		attribute = connection.loadAttributeMetadata().getAttribute('catalog_' + self.scope, attributeCode)
+
+		# `static` Attributes are a column of the entity table itself, with a single (default store) value
+		if attribute['backend_type'] not in MagentoAttributeSearcher.valueTableBackendTypes:
+			sql = """SELECT
+					ce.sku,
+					0 AS store_id,
+					ce.`%s` AS value
+				FROM catalog_%s_entity AS ce
+				WHERE ce.sku IS NOT NULL
+				ORDER BY CAST(ce.sku AS BINARY)""" % (attribute['attribute_code'], self.scope)
+			parameters = []
+		else:
+			sql = """SELECT
+					ce.sku,
+					cev.store_id,
+					cev.value
+				FROM catalog_%s_entity_%s AS cev
+				INNER JOIN catalog_%s_entity AS ce
+					ON cev.entity_id = ce.entity_id
+				WHERE cev.attribute_id = %%s
+					AND ce.sku IS NOT NULL
+				ORDER BY CAST(ce.sku AS BINARY), cev.store_id""" % (self.scope, attribute['backend_type'], self.scope)
+			parameters = [attribute['attribute_id']]
+
+		dbCursor = connection.dbConn.cursor(pymysql.cursors.SSCursor)
+		dbCursor.execute(sql, parameters)
+
+		return dbCursor
+
+	def checkOrder(self, rows, instance):
+		"""Generator that passes `rows` along, making sure that they really are in key order (which the merge join relies upon)."""
+
+		previousKey = None
+
+		for row in rows:
+			key = (row[0], row[1])
+
+			if previousKey is not None and key <= previousKey:
+				raise ValueError('The rows of "' + instance + '" are not in SKU order (at "' + str(row[0]) + '"), so they cannot be compared.')
+
+			previousKey = key
+			yield row
+
+	def mergeJoin(self, leftRows, rightRows):
+		"""
+		Generator that walks two key-ordered streams of `(sku, store_id, value)` rows side by side.
+
+		Yields `(difference, (sku, store_id), leftValue, rightValue)` for every key on either side, where `difference` is...
+		..."missing" (only on the left), "extra" (only on the right), "changed", or "same".
+		"""
+
+		left = next(leftRows, None)
+		right = next(rightRows, None)
+
+		while left is not None or right is not None:
+			leftKey = (left[0], left[1]) if left is not None else None
+			rightKey = (right[0], right[1]) if right is not None else None
+
+			if right is None or (left is not None and leftKey < rightKey):
+				yield ('missing', leftKey, left[2], None)
+				left = next(leftRows, None)
+			elif left is None or rightKey < leftKey:
+				yield ('extra', rightKey, None, right[2])
+				right = next(rightRows, None)
+			else:
+				yield ('same' if left[2] == right[2] else 'changed', leftKey, left[2], right[2])
+				left = next(leftRows, None)
+				right = next(rightRows, None)
+
+class MagentoAttributeMultiSearch(object):
+	"""
+	Runs the same search against several Magento databases (the named connections in "db.yaml") at once.
+
+	Every instance is searched on its own thread (and connection), with at most `parallel` of them running at a time.
+	Their results are merged into a single output as they arrive, with an extra column naming the instance of each row.
+	"""
+
+	def __init__(self, instances, scope, attribute, comparison, value, outputFormat, outputLocation, automated, fetchSize=1000, values=None, parallel=4, store=None, labels=False, useFlat=True):
+		"""Set up the search on the first reachable instance (prompting for anything missing), to be repeated on all of the others."""
+
+		self.instances = instances
+		self.fetchSize = fetchSize
+		self.parallel = parallel
+		self.automated = automated
+
+		# The first instance doubles as the place where the user is prompted for any details of the search not yet given...
+		# ...unless it can't be reached, which (like any other failure) only takes down that one instance
+		self.searchers = {}
+		self.failures = {}
+		first = None
+
+		for instance in instances:
+			try:
+				first = MagentoAttributeSearcher(scope, attribute, comparison, value, outputFormat, outputLocation, automated, True, fetchSize, None, values, instance, store=store, labels=labels, useFlat=useFlat)
+			except pymysql.err.MySQLError as error:
+				self.failures[instance] = error
+				continue
+
+			self.searchers[instance] = first
+			break
+
+		if first is None:
+			print('None of the ' + str(len(instances)) + ' instances could be reached: ' + '; '.join(['"' + instance + '": ' + str(error) for instance, error in self.failures.items()]))
+			sys.exit(1)
+
+		self.first = first
+
+		self.outputFormat = first.outputFormat
+		self.outputLocation = first.outputLocation
+		self.extraColumns = first.extraColumns + ['Instance']
+
+		# Every instance writes its results to the one output as they arrive, which a columnar file can't be shared for
+		if self.outputFormat in output.columnarFormats:
+			print('Searching several instances at once is not supported with the ' + ', '.join(output.columnarFormats) + ' formats.')
+			sys.exit()
+
+		# (each instance's search would need a pool of worker processes of its own)
+		if first.comparison in matching.comparisons:
+			print('Searching several instances at once is not supported together with --regex or --fuzzy.')
+			sys.exit()
+
+		self.outputLock = threading.Lock()
+
+	def createSearch(self, instance):
+		"""Set up (and connect) the search for one `instance`, using the details settled on for the first instance."""
+
+		first = self.first
+
+		# (the store view and option labels are looked up again on each instance, as their IDs can differ between them)
+		return MagentoAttributeSearcher(first.scope, first.attribute, first.comparison, first.value, first.outputFormat, first.outputLocation, True, True, self.fetchSize, None, first.values, instance, store=first.store, labels=first.labels, useFlat=first.useFlat)
+
+	def search(self):
+		"""Search every instance concurrently, and report on how each one of them went."""
+
+		first = self.first
+		searchMessage = first.describeSearchMessage() + ' on ' + str(len(self.instances)) + ' instances'
+
+		if self.automated:
+			print(searchMessage + '...')
+		elif not prompts.promptYesNo(searchMessage, 'yes'):
+			print('Okay. Cancelling search.')
+			first.closeDb()
+			sys.exit()
+
+		self.stream = output.openOutput(self.outputLocation, compression=output.compressedFormats.get(self.outputFormat))
+		self.stream.write(output.formatHeader(self.outputFormat, self.extraColumns))
+
+		# (the instances that could not even be set up have already failed)
+		for instance, error in self.failures.items():
+			print('Instance "' + instance + '" failed: ' + (str(error) or 'see above'))
+
+		failures = len(self.failures)
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel) as executor:
+			futures = dict([(executor.submit(self.searchInstance, instance), instance) for instance in self.instances if instance not in self.failures])
+
+			for future in concurrent.futures.as_completed(futures):
+				# Anything at all (even a `sys.exit()` from validation) only takes down that one instance
+				try:
+					print('Instance "' + futures[future] + '": ' + str(future.result()) + ' results.')
+				except BaseException as error:
+					print('Instance "' + futures[future] + '" failed: ' + (str(error) or 'see above'))
+					failures += 1
+
+		output.closeOutput(self.stream)
+
+		if failures:
+			sys.exit(1)
+
+	def searchInstance(self, instance):
+		"""Run the search on one `instance`, writing its results to the shared output a chunk at a time."""
+
+		searcher = self.searchers[instance] if instance in self.searchers else self.createSearch(instance)
+
+		try:
+			sql, parameters = searcher.planSearch()
+
+			dbCursor = searcher.dbConn.cursor(pymysql.cursors.SSCursor)
+			dbCursor.execute(sql, parameters)
+
+			# Only the columns that the formatter knows about are kept, so that the instance name lines up after them
+			width = 6 + len(searcher.extraColumns)
+			resultCount = 0
+
+			while True:
+				rows = dbCursor.fetchmany(self.fetchSize)
+				if not rows:
+					break
+
+				lines = [output.formatRow(tuple(row[:width]) + (instance,), self.outputFormat, self.extraColumns) for row in rows]
+				with self.outputLock:
+					self.stream.write(''.join(lines))
+
+				resultCount += len(rows)
+
+			dbCursor.close()
+		finally:
+			searcher.closeDb()
+
+		return resultCount
 
 
 # Start script!
-parser = argparse.ArgumentParser(description='Interactive Attribute searcher for Magento.')
-parser.add_argument('-a', '--attribute', help="The `attribute_code` to search on.")
-parser.add_argument('-c', '--comparison', help="The comparison to use when searching for the --value.\n(default: '%(default)s')", default='LIKE')
-parser.add_argument('-f', '--format', help="The format of the output.\n(default: '%(default)s')", default='text')
-parser.add_argument('-o', '--output', help="Where the output should be written.\n(default: '%(default)s')", default='stdout')
-parser.add_argument('-s', '--scope', help="The table to search. Example options include 'category' and 'product'.\n(default: '%(default)s')", default='product')
-parser.add_argument('-v', '--value', help="The term to match against.\n(default: '%(default)s' (literal empty string))", default='')
-parser.add_argument('-z', '--automated', help="Automatically conduct the search and trigger the output without user intervention.\n(default: '%(default)s')", default=False)
-args = parser.parse_args()
-
-searcher = MagentoAttributeSearcher(args.scope, args.attribute, args.comparison, args.value, args.format, args.output, args.automated)
-searcher.search()
+# (only when run directly, so that the classes above can also be loaded by e.g. `benchmark.py`)
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Interactive Attribute searcher for Magento.')
+	parser.add_argument('command', help="What to do: 'search' for Attribute values, take/refresh a 'snapshot' of a scope (see --snapshot), build/update the trigram 'index' of an Attribute (see --trigram-index), 'serve' searches over a Unix socket (see --socket), or 'diff' the values of Attributes (comma-separate several with -a) between two instances (see -i).\n(default: '%(default)s')", nargs='?', default='search', choices=['search', 'snapshot', 'index', 'serve', 'diff'])
+	parser.add_argument('-a', '--attribute', help="The `attribute_code` to search on.")
+	parser.add_argument('-q', '--query', help="Find the SKUs matching a compound query over several Attributes instead, e.g. \"status = 1 AND visibility IN (2, 4) AND NOT price < 1\" (with AND, OR, NOT, parentheses, IN, LIKE, and IS [NOT] NULL). With --count, only how many there are.")
+	parser.add_argument('-c', '--comparison', help="The comparison to use when searching for the --value.\n(default: '%(default)s')", default='LIKE')
+	parser.add_argument('-f', '--format', help="The format of the output: 'text', 'csv', 'jsonl', compressed CSV ('csv.gz', or 'csv.zst' with zstandard installed), or columnar 'parquet' / 'arrow' (with pyarrow installed).\n(default: '%(default)s')", default='text')
+	parser.add_argument('-o', '--output', help="Where the output should be written.\n(default: '%(default)s')", default='stdout')
+	parser.add_argument('-s', '--scope', help="The table to search. Example options include 'category' and 'product'.\n(default: '%(default)s')", default='product')
+	parser.add_argument('-v', '--value', help="The term to match against. Repeat to match against any of several terms.\n(default: '' (literal empty string))", action='append')
+	parser.add_argument('--empty', help="Find the entities whose (default) value of the Attribute is missing, NULL, or '', instead of comparing against a --value. Combines with --count.", action='store_true')
+	parser.add_argument('--regex', help="Match the --value as a regular expression (anywhere in the value). Every value of the Attribute is streamed in and matched locally, over a pool of worker processes.", action='store_true')
+	parser.add_argument('--fuzzy', help="Fuzzy match the --value, keeping the values at least this similar to it (from 0 to 1, ignoring case, against the most similar run of as many words). Matched locally, like --regex.", type=float)
+	parser.add_argument('--match-processes', help="How many worker processes --regex/--fuzzy matching uses.\n(default: one per core)", type=int)
+	parser.add_argument('--values-file', help="A file of terms to match against (one per line), for matching against any of many terms at once.")
+	parser.add_argument('--stream', help="Stream the results from the database to the output in chunks instead of loading them all into memory first.", action='store_true')
+	parser.add_argument('--fetch-size', help="How many rows to fetch from the database at a time when streaming.\n(default: '%(default)s')", type=int, default=1000)
+	parser.add_argument('--batch', help="Run every search listed in this YAML or JSONL file over one connection. The other arguments become the defaults for each search.")
+	parser.add_argument('--chunk-size', help="Search the entities this many at a time (by `entity_id`), committing after each chunk instead of running one giant query.", type=int)
+	parser.add_argument('--checkpoint', help="With --chunk-size, record progress in this file so that an interrupted search resumes where it left off when re-run.")
+	parser.add_argument('--pause', help="With --chunk-size, how many seconds to wait between chunks (to go easy on the database).\n(default: '%(default)s')", type=float, default=0)
+	parser.add_argument('--snapshot', help="A local snapshot file. The `snapshot` command takes (or refreshes) it, and searches given one run against it instead of the DB.")
+	parser.add_argument('--trigram-index', help="A local trigram index file. The `index` command builds (or updates) it for the --attribute, and `LIKE` searches given one use it to skip most of the scan.")
+	parser.add_argument('--no-cache', help="Always run the search, rather than serving its results from the local result cache when they are still current.", action='store_true')
+	parser.add_argument('--cache-ttl', help="How many seconds cached results may be served for.\n(default: '%(default)s')", type=int, default=3600)
+	parser.add_argument('--verbose', help="Print extra details (e.g. about the result cache) along the way.", action='store_true')
+	parser.add_argument('--profile', help="Write a report of where the search's time went (per phase), rows fetched, bytes written, and peak memory to this file. Written in the Prometheus textfile format if the name ends in '.prom', else as JSON.")
+	parser.add_argument('--explain', help="With --profile, also capture MySQL's plan for the search (`EXPLAIN FORMAT=JSON`), and count the full table scans in it.", action='store_true')
+	parser.add_argument('--store', help="Search the effective values in the store view with this code (its own value, or else the default one), one per entity. 'all' for every store view.")
+	parser.add_argument('--count', help="Only return how many rows (and distinct products) match, counted by the database, instead of the rows themselves.", action='store_true')
+	parser.add_argument('--group-by-value', help="Count the matches per distinct value (implies --count).", action='store_true')
+	parser.add_argument('--group-by-store', help="Count the matches per store (implies --count). Combines with --group-by-value.", action='store_true')
+	parser.add_argument('--top', help="With --group-by-value/--group-by-store, only return this many of the largest groups.", type=int)
+	parser.add_argument('--watch', help="Keep watching the search: after the first full search, every this many seconds search only the entities updated since, and output the results that were added, removed, or changed as JSONL events.", type=float)
+	parser.add_argument('--no-flat', help="With --store, always search the EAV tables, rather than the flat catalog tables when those are up to date and have a column for the --attribute.", action='store_true')
+	parser.add_argument('--labels', help="For select/multiselect Attributes (e.g. color), search by option label (e.g. 'Red') instead of option ID, and output labels instead of IDs.", action='store_true')
+	parser.add_argument('--socket', help="The Unix socket that the `serve` command listens on (and \"Magento-Attribute-Client.py\" sends searches to).\n(default: '%(default)s')", default=socketapi.defaultSocketPath)
+	parser.add_argument('--pool-size', help="How many connections the `serve` command keeps open to each instance (and so how many searches it runs on one at a time).\n(default: '%(default)s')", type=int, default=4)
+	parser.add_argument('--metadata-ttl', help="How many seconds the `serve` command trusts its Attribute metadata for before checking it against the database again.\n(default: '%(default)s')", type=int, default=60)
+	parser.add_argument('-i', '--instance', help="The named connection(s) in \"db.yaml\" to search. Repeat (or comma-separate) for several, which are then searched concurrently.\n(default: all of them)", action='append')
+	parser.add_argument('--parallel', help="How many instances to search at the same time.\n(default: '%(default)s')", type=int, default=4)
+	parser.add_argument('-z', '--automated', help="Automatically conduct the search and trigger the output without user intervention.\n(default: '%(default)s')", default=False)
+	args = parser.parse_args()
+
+	values = args.value or []
+	if args.values_file:
+		with open(args.values_file) as valuesFile:
+			values += [line.rstrip('\r\n') for line in valuesFile if line.strip()]
+
+	# A single term is still just a plain old `--value`
+	value = values[0] if len(values) == 1 else ''
+	values = values if len(values) > 1 else None
+
+	instances = dbconfig.selectInstances(args.instance)
+
+	aggregate = [group for group, wanted in [('value', args.group_by_value), ('store', args.group_by_store)] if wanted]
+	aggregate = aggregate if aggregate or args.count else None
+
+	comparison = 'EMPTY' if args.empty else 'REGEX' if args.regex else 'FUZZY' if args.fuzzy is not None else args.comparison
+
+	if args.command == 'snapshot':
+		if not args.snapshot:
+			print('Please provide the file to keep the snapshot in with --snapshot.')
+			sys.exit()
+
+		snapshotter = MagentoAttributeSnapshotter(args.snapshot, args.scope, args.fetch_size, instances[0])
+		snapshotter.run()
+	elif args.command == 'index':
+		if not args.trigram_index:
+			print('Please provide the file to keep the index in with --trigram-index.')
+			sys.exit()
+
+		indexer = MagentoAttributeIndexer(args.trigram_index, args.scope, args.attribute, args.fetch_size, instances[0])
+		indexer.run()
+	elif args.command == 'diff':
+		diff = MagentoAttributeDiff(instances, args.scope, args.attribute, args.format, args.output, args.fetch_size)
+		diff.run()
+	elif args.command == 'serve':
+		server = MagentoAttributeServer(args.socket, args.pool_size, args.fetch_size, not args.no_cache, args.cache_ttl, args.metadata_ttl)
+		server.serve()
+	elif args.query:
+		query = MagentoAttributeQuery(args.scope, args.query, args.format, args.output, args.fetch_size, instances[0], args.count)
+		query.run()
+	elif args.batch:
+		defaults = dict(scope=args.scope, attribute=args.attribute, comparison=comparison, value=value, values=values, format=args.format, output=args.output)
+		batch = MagentoAttributeBatch(args.batch, defaults, args.fetch_size, instances[0])
+		batch.run()
+	elif args.snapshot:
+		searcher = MagentoAttributeSearcher(args.scope, args.attribute, comparison, value, args.format, args.output, args.automated, args.stream, args.fetch_size, None, values, snapshotFile=args.snapshot, profileFile=args.profile, aggregate=aggregate, top=args.top)
+		searcher.search()
+	elif len(instances) > 1:
+		# Each instance's results are streamed straight to the shared output, which leaves no room for these
+		unsupported = [
+			('--count, --group-by-value, --group-by-store, and --top', aggregate is not None or args.top),
+			('--watch', args.watch),
+			('--chunk-size, --checkpoint, and --pause', args.chunk_size or args.checkpoint or args.pause),
+			('--profile and --explain', args.profile or args.explain),
+			('--trigram-index', args.trigram_index),
+			('--no-cache (several instances are never searched from the result cache anyway)', args.no_cache),
+		]
+		for options, given in unsupported:
+			if given:
+				print('Searching several instances at once (pick one with -i) is not supported together with ' + options + '.')
+		if any(given for options, given in unsupported):
+			sys.exit()
+
+		multiSearch = MagentoAttributeMultiSearch(instances, args.scope, args.attribute, comparison, value, args.format, args.output, args.automated, args.fetch_size, values, args.parallel, args.store, args.labels, not args.no_flat)
+		multiSearch.search()
+	else:
+		searcher = MagentoAttributeSearcher(args.scope, args.attribute, comparison, value, args.format, args.output, args.automated, args.stream, args.fetch_size, None, values, instances[0], args.chunk_size, args.checkpoint, args.pause, None, args.trigram_index, not args.no_cache, args.cache_ttl, args.verbose, args.profile, args.explain, aggregate, args.top, args.store, args.labels, not args.no_flat, args.watch, args.fuzzy if args.fuzzy is not None else 0.8, args.match_processes)
+		searcher.search()
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+import sqlite3
+import threading
+
+class AttributeCache(object):
+	"""
+	Keeps a local SQLite copy of the `eav_attribute` rows of every catalog entity type that has been searched.
+
+	Each entity type's copy is tagged with a fingerprint of its Attributes, and is only re-read from MySQL when that...
+	...fingerprint changes, so listing and validating Attributes never has to touch the catalog itself.
+
+	The option labels of select/multiselect Attributes are kept the same way, per Attribute, once they have been asked for.
+	"""
+
+	# The `eav_attribute` columns that are kept, in the order that they are stored and returned
+	columns = ['attribute_id', 'attribute_code', 'backend_type', 'frontend_input', 'source_model', 'backend_model', 'is_required']
+
+	def __init__(self, cachePath, instance):
+		"""Open (creating if needed) the cache file at `cachePath` for the database identified by `instance`."""
+
+		self.instance = instance
+		self.refreshed = set()
+		self.refreshedOptions = set()
+
+		# Shared between the threads of a multi-instance search, but only ever used by one of them at a time
+		self.lock = threading.RLock()
+		self.cacheConn = sqlite3.connect(cachePath, check_same_thread=False)
+		self.cacheConn.executescript("""
+			CREATE TABLE IF NOT EXISTS fingerprints (
+				instance TEXT NOT NULL,
+				entity_type_code TEXT NOT NULL,
+				fingerprint TEXT NOT NULL,
+				PRIMARY KEY (instance, entity_type_code)
+			);
+			CREATE TABLE IF NOT EXISTS attributes (
+				instance TEXT NOT NULL,
+				entity_type_code TEXT NOT NULL,
+				attribute_id INTEGER NOT NULL,
+				attribute_code TEXT NOT NULL,
+				backend_type TEXT,
+				frontend_input TEXT,
+				source_model TEXT,
+				backend_model TEXT,
+				is_required INTEGER,
+				PRIMARY KEY (instance, entity_type_code, attribute_code)
+			);
+			CREATE TABLE IF NOT EXISTS option_fingerprints (
+				instance TEXT NOT NULL,
+				attribute_id INTEGER NOT NULL,
+				fingerprint TEXT NOT NULL,
+				PRIMARY KEY (instance, attribute_id)
+			);
+			CREATE TABLE IF NOT EXISTS option_labels (
+				instance TEXT NOT NULL,
+				attribute_id INTEGER NOT NULL,
+				option_id INTEGER NOT NULL,
+				store_id INTEGER NOT NULL,
+				label TEXT,
+				PRIMARY KEY (instance, attribute_id, option_id, store_id)
+			);
+		""")
+
+	def close(self):
+		"""Close the cache file."""
+
+		self.cacheConn.close()
+
+	def fetchFingerprint(self, dbCursor, entityTypeCode):
+		"""
+		Ask MySQL for a fingerprint of the Attributes of `entityTypeCode`.
+
+		This only reads `eav_attribute` (a few thousand rows at most), so it is cheap enough to run on every use.
+		"""
+
+		dbCursor.execute("""SELECT
+				COUNT(*),
+				MAX(ea.attribute_id),
+				SUM(CRC32(CONCAT_WS('|', ea.attribute_id, ea.attribute_code, ea.backend_type, ea.frontend_input,
+					ea.source_model, ea.backend_model, ea.is_required)))
+			FROM eav_attribute AS ea
+			INNER JOIN eav_entity_type AS eet
+				ON ea.entity_type_id = eet.entity_type_id
+			WHERE eet.entity_type_code = %s""",
+			(entityTypeCode,)
+		)
+
+		return ':'.join([str(part) for part in dbCursor.fetchone()])
+
+	def refresh(self, dbCursor, entityTypeCode):
+		"""Re-read the Attributes of `entityTypeCode` from MySQL, but only if their fingerprint has changed."""
+
+		with self.lock:
+			# Once per entity type per run is plenty
+			if entityTypeCode in self.refreshed:
+				return
+
+			fingerprint = self.fetchFingerprint(dbCursor, entityTypeCode)
+			cached = self.cacheConn.execute(
+				'SELECT fingerprint FROM fingerprints WHERE instance = ? AND entity_type_code = ?',
+				(self.instance, entityTypeCode)
+			).fetchone()
+
+			if cached is None or cached[0] != fingerprint:
+				dbCursor.execute("""SELECT
+						""" + ', '.join(['ea.' + column for column in self.columns]) + """
+					FROM eav_attribute AS ea
+					INNER JOIN eav_entity_type AS eet
+						ON ea.entity_type_id = eet.entity_type_id
+					WHERE eet.entity_type_code = %s""",
+					(entityTypeCode,)
+				)
+
+				with self.cacheConn:
+					self.cacheConn.execute(
+						'DELETE FROM attributes WHERE instance = ? AND entity_type_code = ?',
+						(self.instance, entityTypeCode)
+					)
+					self.cacheConn.executemany(
+						'INSERT INTO attributes (instance, entity_type_code, ' + ', '.join(self.columns) + ') VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+						[(self.instance, entityTypeCode) + tuple(attribute) for attribute in dbCursor.fetchall()]
+					)
+					self.cacheConn.execute(
+						'INSERT OR REPLACE INTO fingerprints (instance, entity_type_code, fingerprint) VALUES (?, ?, ?)',
+						(self.instance, entityTypeCode, fingerprint)
+					)
+
+			self.refreshed.add(entityTypeCode)
+
+	def expire(self):
+		"""Have the fingerprints checked against MySQL again on next use (for a long-running process, rather than once per run)."""
+
+		with self.lock:
+			self.refreshed = set()
+			self.refreshedOptions = set()
+
+	def listAttributes(self, entityTypeCode):
+		"""Returns `(attribute_id, attribute_code, is_required)` for every Attribute of `entityTypeCode`."""
+
+		with self.lock:
+			return self.cacheConn.execute(
+				"""SELECT attribute_id, attribute_code, is_required
+				FROM attributes
+				WHERE instance = ? AND entity_type_code = ?
+				ORDER BY attribute_code""",
+				(self.instance, entityTypeCode)
+			).fetchall()
+
+	def getAttribute(self, entityTypeCode, attributeCode):
+		"""Returns the cached `eav_attribute` row (as a dict of `columns`) of `attributeCode`, or `None` if it is unknown."""
+
+		with self.lock:
+			attribute = self.cacheConn.execute(
+				'SELECT ' + ', '.join(self.columns) + ' FROM attributes WHERE instance = ? AND entity_type_code = ? AND attribute_code = ?',
+				(self.instance, entityTypeCode, attributeCode)
+			).fetchone()
+
+			if attribute is None:
+				return None
+
+			return dict(zip(self.columns, attribute))
+
+	def fetchOptionFingerprint(self, dbCursor, attributeId):
+		"""Ask MySQL for a fingerprint of the option labels of `attributeId` (which only reads that Attribute's options)."""
+
+		dbCursor.execute("""SELECT
+				COUNT(*),
+				MAX(eaov.value_id),
+				SUM(CRC32(CONCAT_WS('|', eaov.option_id, eaov.store_id, eaov.value)))
+			FROM eav_attribute_option_value AS eaov
+			INNER JOIN eav_attribute_option AS eao
+				ON eaov.option_id = eao.option_id
+			WHERE eao.attribute_id = %s""",
+			(attributeId,)
+		)
+
+		return ':'.join([str(part) for part in dbCursor.fetchone()])
+
+	def refreshOptions(self, dbCursor, attributeId):
+		"""Re-read the option labels of `attributeId` from MySQL, but only if their fingerprint has changed."""
+
+		with self.lock:
+			if attributeId in self.refreshedOptions:
+				return
+
+			fingerprint = self.fetchOptionFingerprint(dbCursor, attributeId)
+			cached = self.cacheConn.execute(
+				'SELECT fingerprint FROM option_fingerprints WHERE instance = ? AND attribute_id = ?',
+				(self.instance, attributeId)
+			).fetchone()
+
+			if cached is None or cached[0] != fingerprint:
+				dbCursor.execute("""SELECT
+						eaov.option_id,
+						eaov.store_id,
+						eaov.value
+					FROM eav_attribute_option_value AS eaov
+					INNER JOIN eav_attribute_option AS eao
+						ON eaov.option_id = eao.option_id
+					WHERE eao.attribute_id = %s""",
+					(attributeId,)
+				)
+
+				with self.cacheConn:
+					self.cacheConn.execute(
+						'DELETE FROM option_labels WHERE instance = ? AND attribute_id = ?',
+						(self.instance, attributeId)
+					)
+					self.cacheConn.executemany(
+						'INSERT OR REPLACE INTO option_labels (instance, attribute_id, option_id, store_id, label) VALUES (?, ?, ?, ?, ?)',
+						[(self.instance, attributeId) + tuple(option) for option in dbCursor.fetchall()]
+					)
+					self.cacheConn.execute(
+						'INSERT OR REPLACE INTO option_fingerprints (instance, attribute_id, fingerprint) VALUES (?, ?, ?)',
+						(self.instance, attributeId, fingerprint)
+					)
+
+			self.refreshedOptions.add(attributeId)
+
+	def getOptionLabels(self, attributeId):
+		"""Returns the cached option labels of `attributeId`, as a dict of `{option_id: {store_id: label}}`."""
+
+		with self.lock:
+			optionLabels = {}
+			for optionId, storeId, label in self.cacheConn.execute(
+				'SELECT option_id, store_id, label FROM option_labels WHERE instance = ? AND attribute_id = ?',
+				(self.instance, attributeId)
+			):
+				optionLabels.setdefault(optionId, {})[storeId] = label
+
+			return optionLabels
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import types
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+import syntheticeav
+
+# The Attributes searched on (one of each of the commonly searched `backend_type`s)
+searchedAttributes = ['name', 'description', 'status', 'price']
+
+# The term searched for, by `backend_type` and comparison (`!=` and `NOT LIKE` reuse the `=` and `LIKE` terms)
+searchTerms = {
+	'varchar': {'=': 'red', '<': 'm', 'LIKE': '%red%'},
+	'text': {'=': 'red', '<': 'm', 'LIKE': '%cotton shirt%'},
+	'int': {'=': 10, '<': 10, 'LIKE': '1%'},
+	'decimal': {'=': 250.0, '<': 250.0, 'LIKE': '1%'},
+}
+
+comparisons = ['=', '!=', '<', 'LIKE', 'NOT LIKE', 'IS NOT']
+
+def loadSearcherModule():
+	"""Load "Magento-Attribute-Searcher.py" (whose name is not importable as is) as a module."""
+
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Magento-Attribute-Searcher.py')
+	spec = importlib.util.spec_from_file_location('magento_attribute_searcher', path)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+
+	return module
+
+def getSearchTerm(backendType, comparison):
+	"""Returns the term to search `backendType` values for with `comparison`."""
+
+	if comparison == 'IS NOT':
+		return None
+
+	return searchTerms[backendType][{'!=': '=', 'NOT LIKE': 'LIKE'}.get(comparison, comparison)]
+
+def describeEnvironment():
+	"""Returns where the benchmark ran (so that results from different machines and versions are not mixed up)."""
+
+	try:
+		revision = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		revision = None
+
+	return dict(python=platform.python_version(), sqlite=sqlite3.sqlite_version, platform=platform.platform(), revision=revision)
+
+class SearchBenchmark(object):
+	"""Times the searcher's query strategies (and Attribute listing) against a generated catalog."""
+
+	def __init__(self, databasePath, repeat=3, fetchSize=1000):
+		"""Benchmark against the generated catalog at `databasePath`, timing each case `repeat` times."""
+
+		self.databasePath = databasePath
+		self.repeat = repeat
+		self.fetchSize = fetchSize
+		self.workDir = tempfile.mkdtemp(prefix='mas-benchmark-')
+
+		self.searcherModule = loadSearcherModule()
+		self.searcherModule.MagentoAttributeSearcher.attributeCachePath = os.path.join(self.workDir, 'attribute-cache.sqlite')
+		self.searcherModule.MagentoAttributeSearcher.resultCachePath = os.path.join(self.workDir, 'result-cache.sqlite')
+
+		self.dbConn = syntheticeav.StandInConnection(databasePath)
+		self.connectionSource = self.createConnectionSource()
+
+	def createConnectionSource(self):
+		"""Returns something that searchers can share the stand-in connection (and a fresh Attribute cache) of."""
+
+		return types.SimpleNamespace(dbConn=self.dbConn, dbCursor=self.dbConn.cursor(), dbIdentity='benchmark:' + self.databasePath, attributeCache=None)
+
+	def createSearch(self, attribute, comparison, value, outputFormat='text', stream=False, strategy='typed'):
+		"""Set up a search (writing its results to nowhere) using the `typed` or legacy `catch-all` query strategy."""
+
+		searcher = self.searcherModule.MagentoAttributeSearcher('product', attribute, comparison, value, outputFormat, os.devnull, True, stream, self.fetchSize, self.connectionSource)
+
+		if strategy == 'catch-all':
+			searcher.planSearch = searcher.buildCatchAllSearchQuery
+
+		return searcher
+
+	def countRows(self, searcher):
+		"""Returns how many rows `searcher` finds (outside of any timing)."""
+
+		sql, parameters = searcher.planSearch()
+		dbCursor = self.dbConn.cursor()
+		dbCursor.execute(sql, parameters)
+
+		return len(dbCursor.fetchall())
+
+	def time(self, run, setUp=None):
+		"""Returns summary statistics (in seconds) of calling `run` `repeat` times (calling `setUp` untimed before each)."""
+
+		timings = []
+		for iteration in range(self.repeat):
+			if setUp:
+				setUp()
+
+			started = time.perf_counter()
+			run()
+			timings.append(time.perf_counter() - started)
+
+		timings.sort()
+
+		return dict(min=timings[0], median=timings[len(timings) // 2], max=timings[-1])
+
+	def benchmarkSearches(self, strategies=['catch-all', 'typed'], outputFormats=['text', 'csv'], streamModes=[False, True]):
+		"""Returns a result for every combination of Attribute, comparison, strategy, output format and streaming."""
+
+		results = []
+		for attribute in searchedAttributes:
+			for comparison in comparisons:
+				for strategy in strategies:
+					searcher = self.createSearch(attribute, comparison, None, strategy=strategy)
+					backendType = searcher.lookupAttribute()['backend_type']
+					value = getSearchTerm(backendType, comparison)
+
+					searcher.value = value
+					rows = self.countRows(searcher)
+
+					for outputFormat in outputFormats:
+						for stream in streamModes:
+							searcher = self.createSearch(attribute, comparison, value, outputFormat, stream, strategy)
+
+							# Every search closes its cursor once done, so each run gets a new one
+							timings = self.time(searcher.executeSearch, lambda: setattr(searcher, 'dbCursor', self.dbConn.cursor()))
+
+							results.append(dict(
+								benchmark='search', attribute=attribute, backend_type=backendType, comparison=comparison, value=value,
+								strategy=strategy, format=outputFormat, stream=stream, rows=rows, seconds=timings
+							))
+							print('search %-12s %-8s %-7s %-10s %-4s %-6s %8s rows %9.4fs' % (attribute, comparison, backendType, strategy, outputFormat, 'stream' if stream else '', rows, timings['median']), file=sys.stderr)
+
+		return results
+
+	def benchmarkListing(self):
+		"""Returns results for listing the Attributes with a cold (empty) and a warm (current) Attribute cache."""
+
+		def listCold():
+			if os.path.exists(self.searcherModule.MagentoAttributeSearcher.attributeCachePath):
+				os.remove(self.searcherModule.MagentoAttributeSearcher.attributeCachePath)
+
+			self.listAttributes()
+
+		results = []
+		for cache, run in [('cold', listCold), ('warm', self.listAttributes)]:
+			timings = self.time(run)
+			results.append(dict(benchmark='list', cache=cache, seconds=timings))
+			print('list   %-4s %9.4fs' % (cache, timings['median']), file=sys.stderr)
+
+		return results
+
+	def listAttributes(self):
+		"""List the Attributes the way a new run would (with its own Attribute cache, which still has to check its fingerprint)."""
+
+		self.connectionSource = self.createConnectionSource()
+		self.createSearch('name', '=', '').listAttributes()
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark Attribute searches and listing against a synthetic Magento catalog.')
+	parser.add_argument('--entities', help="How many products to generate.\n(default: '%(default)s')", type=int, default=2000)
+	parser.add_argument('--attributes', help="How many Attributes to generate (besides `sku`).\n(default: '%(default)s')", type=int, default=50)
+	parser.add_argument('--stores', help="How many store views to generate value overrides for.\n(default: '%(default)s')", type=int, default=3)
+	parser.add_argument('--value-length', help="The typical length of generated `varchar` values (`text` ones are ten times longer).\n(default: '%(default)s')", type=int, default=20)
+	parser.add_argument('--seed', help="The random seed, so that runs can be compared on the same catalog.\n(default: '%(default)s')", type=int, default=1)
+	parser.add_argument('--repeat', help="How many times to time each case (the min, median and max are reported).\n(default: '%(default)s')", type=int, default=3)
+	parser.add_argument('--database', help="Keep the generated catalog in this file, reusing it if it already exists.\n(default: a temporary file)")
+	parser.add_argument('--output', help="Where the JSON results should be written.\n(default: '%(default)s')", default='stdout')
+	args = parser.parse_args()
+
+	parameters = dict(entities=args.entities, attributes=args.attributes, stores=args.stores, value_length=args.value_length, seed=args.seed, repeat=args.repeat)
+
+	databasePath = args.database or os.path.join(tempfile.mkdtemp(prefix='mas-benchmark-'), 'catalog.sqlite')
+	if not os.path.exists(databasePath):
+		print('Generating a catalog of %s products with %s Attributes...' % (args.entities, args.attributes), file=sys.stderr)
+		started = time.perf_counter()
+		syntheticeav.generate(databasePath, args.entities, args.attributes, args.stores, args.value_length, seed=args.seed)
+		parameters['generate_seconds'] = time.perf_counter() - started
+
+	benchmark = SearchBenchmark(databasePath, args.repeat)
+	report = dict(parameters=parameters, environment=describeEnvironment(), results=benchmark.benchmarkListing() + benchmark.benchmarkSearches())
+	report = json.dumps(report, indent=2)
+
+	if args.output == 'stdout':
+		print(report)
+	else:
+		with open(args.output, 'w') as outputFile:
+			outputFile.write(report + "\n")
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+import os.path
+import yaml
+
+# Every connection in "db.yaml" needs all of these
+requiredParameters = ['host','user','port','passwd','db']
+
+def loadDbConfigs(dbConfigPath='db.yaml'):
+	"""
+	Read every database connection configured in `dbConfigPath`.
+
+	The file may either hold a single connection, or a list of connections that each have a `name` (the list may also...
+	...be nested under an `instances` key). Returns an (ordered) dict of connection settings by name, where a lone...
+	...connection is named "default". Returns an empty dict if the file does not exist.
+	"""
+
+	if not os.path.isfile(dbConfigPath):
+		return {}
+
+	with open(dbConfigPath) as dbConfigFile:
+		dbConfig = yaml.safe_load(dbConfigFile) or {}
+
+	if isinstance(dbConfig, dict) and 'instances' in dbConfig:
+		dbConfig = dbConfig['instances']
+
+	if isinstance(dbConfig, dict):
+		return {'default': dbConfig}
+
+	return dict([(str(instance.get('name', index)), instance) for index, instance in enumerate(dbConfig)])
+
+def selectInstances(requested, dbConfigPath='db.yaml'):
+	"""
+	Work out the names of the connections that a search should run against.
+
+	Nothing `requested` (or "all") means every configured connection. Otherwise `requested` is a list of names, each of...
+	...which may itself be a comma-separated list. Returns `[None]` when there is nothing to choose from (yet).
+	"""
+
+	configured = list(loadDbConfigs(dbConfigPath).keys())
+
+	if not requested or 'all' in requested:
+		return configured or [None]
+
+	return [name.strip() for names in requested for name in names.split(',') if name.strip()]
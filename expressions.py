@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+import re
+import array
+import trigrams
+
+# The comparisons that a condition can make (besides `[NOT] IN (...)` and `IS [NOT] NULL`)
+comparisons = ['=', '<=>', '!=', '<>', '<', '<=', '>=', '>', 'LIKE', 'NOT LIKE']
+
+keywords = ['AND', 'OR', 'NOT', 'LIKE', 'IN', 'IS', 'NULL']
+
+tokenPattern = re.compile(r"""\s*(?:
+	(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|
+	(?P<operator><=>|<=|>=|!=|<>|=|<|>)|
+	(?P<punctuation>[(),])|
+	(?P<word>[^\s()<>=!,'"]+)
+)""", re.X)
+
+def tokenize(expression):
+	"""Split `expression` into `(kind, text)` tokens, where `kind` is one of "string", "operator", "punctuation", "keyword", or "word"."""
+
+	tokens = []
+	position = 0
+
+	while expression[position:].strip():
+		match = tokenPattern.match(expression, position)
+		if not match:
+			raise ValueError('Could not make sense of the query from "' + expression[position:].strip() + '" on.')
+
+		kind = match.lastgroup
+		text = match.group(kind)
+
+		if kind == 'string':
+			text = re.sub(r'\\(.)', r'\1', text[1:-1])
+		elif kind == 'word' and text.upper() in keywords:
+			kind = 'keyword'
+			text = text.upper()
+
+		tokens.append((kind, text))
+		position = match.end()
+
+	return tokens
+
+class ExpressionParser(object):
+	"""
+	Parses a compound query, like `status = 1 AND visibility IN (2, 4) AND NOT price < 1`, into a tree.
+
+	The tree is made of `('and', [nodes])`, `('or', [nodes])`, `('not', node)`, and `('condition', attribute_code,...
+	...comparison, value)` nodes, where `value` is a list for `IN`. `NOT` binds tighter than `AND`, which binds tighter...
+	...than `OR`. `x IS NULL` becomes `NOT x IS NOT NULL`, and `x NOT IN (...)` becomes `NOT x IN (...)`, so that every...
+	...condition can be looked up as "which entities have a value like this".
+	"""
+
+	def __init__(self, expression):
+		"""Parse `expression` (raising a `ValueError` that explains what is wrong with it, if anything)."""
+
+		self.tokens = tokenize(expression)
+		self.position = 0
+
+		if not self.tokens:
+			raise ValueError('The query is empty.')
+
+		self.tree = self.parseOr()
+
+		if self.position < len(self.tokens):
+			raise ValueError('Unexpected "' + self.tokens[self.position][1] + '" in the query.')
+
+	def peek(self):
+		"""Returns the next token (or `(None, None)` at the end)."""
+
+		return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+	def accept(self, kind, text=None):
+		"""Consume and return the text of the next token if it is of `kind` (and is `text`), else return `None`."""
+
+		nextKind, nextText = self.peek()
+		if nextKind != kind or (text is not None and nextText != text):
+			return None
+
+		self.position += 1
+
+		return nextText
+
+	def expect(self, kind, text=None):
+		"""Consume and return the text of the next token, which must be of `kind` (and be `text`)."""
+
+		accepted = self.accept(kind, text)
+		if accepted is None:
+			raise ValueError('Expected ' + (text or 'a ' + kind) + ' but found "' + str(self.peek()[1] or 'the end of the query') + '".')
+
+		return accepted
+
+	def parseOr(self):
+		"""`and-expression [OR and-expression]...`"""
+
+		nodes = [self.parseAnd()]
+		while self.accept('keyword', 'OR'):
+			nodes.append(self.parseAnd())
+
+		return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+	def parseAnd(self):
+		"""`not-expression [AND not-expression]...`"""
+
+		nodes = [self.parseNot()]
+		while self.accept('keyword', 'AND'):
+			nodes.append(self.parseNot())
+
+		return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+	def parseNot(self):
+		"""`[NOT] (expression) | [NOT] condition`"""
+
+		if self.accept('keyword', 'NOT'):
+			return ('not', self.parseNot())
+
+		if self.accept('punctuation', '('):
+			node = self.parseOr()
+			self.expect('punctuation', ')')
+			return node
+
+		return self.parseCondition()
+
+	def parseValue(self):
+		"""A quoted string, or a bare word (e.g. a number)."""
+
+		value = self.accept('string')
+		if value is None:
+			value = self.expect('word')
+
+		return value
+
+	def parseCondition(self):
+		"""`attribute_code comparison value | attribute_code [NOT] IN (value, ...) | attribute_code IS [NOT] NULL`"""
+
+		attribute = self.expect('word')
+
+		if self.accept('keyword', 'IS'):
+			negated = self.accept('keyword', 'NOT')
+			self.expect('keyword', 'NULL')
+			condition = ('condition', attribute, 'IS NOT', None)
+
+			return condition if negated else ('not', condition)
+
+		negated = self.accept('keyword', 'NOT')
+
+		if self.accept('keyword', 'IN'):
+			self.expect('punctuation', '(')
+			values = [self.parseValue()]
+			while self.accept('punctuation', ','):
+				values.append(self.parseValue())
+			self.expect('punctuation', ')')
+			condition = ('condition', attribute, 'IN', values)
+
+			return ('not', condition) if negated else condition
+
+		if self.accept('keyword', 'LIKE'):
+			return ('condition', attribute, 'NOT LIKE' if negated else 'LIKE', self.parseValue())
+
+		if negated:
+			raise ValueError('Expected IN or LIKE after "' + attribute + ' NOT".')
+
+		comparison = self.expect('operator')
+
+		return ('condition', attribute, comparison, self.parseValue())
+
+def listConditions(node):
+	"""Returns every `condition` node of the tree under `node`."""
+
+	if node[0] == 'condition':
+		return [node]
+
+	if node[0] == 'not':
+		return listConditions(node[1])
+
+	return [condition for child in node[1] for condition in listConditions(child)]
+
+def unionSorted(left, right):
+	"""Returns the values found in either of the sorted arrays `left` and `right` (as a sorted array)."""
+
+	result = array.array('I')
+	leftIndex = 0
+	rightIndex = 0
+
+	while leftIndex < len(left) and rightIndex < len(right):
+		if left[leftIndex] < right[rightIndex]:
+			result.append(left[leftIndex])
+			leftIndex += 1
+		elif left[leftIndex] > right[rightIndex]:
+			result.append(right[rightIndex])
+			rightIndex += 1
+		else:
+			result.append(left[leftIndex])
+			leftIndex += 1
+			rightIndex += 1
+
+	result.extend(left[leftIndex:])
+	result.extend(right[rightIndex:])
+
+	return result
+
+def differenceSorted(left, right):
+	"""Returns the values of the sorted array `left` that are not in the sorted array `right` (as a sorted array)."""
+
+	result = array.array('I')
+	rightIndex = 0
+
+	for value in left:
+		while rightIndex < len(right) and right[rightIndex] < value:
+			rightIndex += 1
+
+		if rightIndex == len(right) or right[rightIndex] != value:
+			result.append(value)
+
+	return result
+
+class ExpressionEvaluator(object):
+	"""
+	Evaluates a parsed query tree into the sorted array of `entity_id`s that it matches.
+
+	Each condition is looked up (by `fetchConditionIds`) as the sorted `entity_id`s having a matching value, and those are...
+	...then combined as sets, so memory only ever grows with the number of matching entities (not rows). The `entity_id`s...
+	...of every entity (from `fetchAllIds`) are only fetched when a `NOT` can't be turned into a difference instead.
+	"""
+
+	def __init__(self, fetchConditionIds, fetchAllIds):
+		"""Evaluate with the `fetchConditionIds(condition)` and `fetchAllIds()` lookups."""
+
+		self.fetchConditionIds = fetchConditionIds
+		self.fetchAllIds = fetchAllIds
+		self.allIds = None
+
+		# The same condition may well appear more than once in a query
+		self.conditionIds = {}
+
+	def getAllIds(self):
+		"""Returns (fetching them the first time) the `entity_id`s of every entity."""
+
+		if self.allIds is None:
+			self.allIds = self.fetchAllIds()
+
+		return self.allIds
+
+	def evaluate(self, node):
+		"""Returns the sorted array of the `entity_id`s that `node` matches."""
+
+		if node[0] == 'condition':
+			key = repr(node)
+			if key not in self.conditionIds:
+				self.conditionIds[key] = self.fetchConditionIds(node)
+
+			return self.conditionIds[key]
+
+		if node[0] == 'not':
+			return differenceSorted(self.getAllIds(), self.evaluate(node[1]))
+
+		if node[0] == 'or':
+			ids = array.array('I')
+			for child in node[1]:
+				ids = unionSorted(ids, self.evaluate(child))
+
+			return ids
+
+		# `x AND NOT y` is just `x` minus `y`, which saves ever having to fetch every entity
+		included = [self.evaluate(child) for child in node[1] if child[0] != 'not']
+		excluded = [self.evaluate(child[1]) for child in node[1] if child[0] == 'not']
+
+		if not included:
+			included = [self.getAllIds()]
+
+		ids = trigrams.intersectAll(included)
+		for other in excluded:
+			ids = differenceSorted(ids, other)
+
+		return ids
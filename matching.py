@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+import os
+import re
+import difflib
+import collections
+import concurrent.futures
+
+# The comparisons that are made here, on the values as they stream in, rather than by MySQL
+comparisons = ['REGEX', 'FUZZY']
+
+def scoreFuzzy(term, value):
+	"""
+	Returns how similar (from 0 to 1) `term` is to the most similar run of as many words within `value`.
+
+	Comparing against runs of words, rather than the whole value, lets a short term be found within a long `text` value...
+	...(e.g. a misspelt "cotton blend" within a description). The cheap upper bounds that `SequenceMatcher` offers are...
+	...checked first, so that only the runs that could beat the best one so far are compared in full.
+	"""
+
+	words = value.split()
+	size = max(1, len(term.split()))
+
+	# The matcher caches what it learns about its second sequence, so that one is the term that stays the same
+	matcher = difflib.SequenceMatcher(None, '', term, False)
+	best = 0.0
+
+	for start in range(max(1, len(words) - size + 1)):
+		matcher.set_seq1(' '.join(words[start:start + size]))
+
+		if matcher.real_quick_ratio() > best and matcher.quick_ratio() > best:
+			best = max(best, matcher.ratio())
+
+			if best == 1.0:
+				break
+
+	return best
+
+def matchChunk(rows, comparison, term, threshold=None, valueIndex=3):
+	"""
+	Returns those of `rows` whose value (at `valueIndex`) matches `term`.
+
+	"REGEX" finds the regular expression `term` anywhere within the value, and "FUZZY" scores the value against `term`...
+	...(ignoring case) with `scoreFuzzy()`, keeping those scoring at least `threshold`. This runs in the worker processes...
+	...of `matchInParallel()`, which is why it is a top-level function taking nothing but plain (picklable) arguments.
+	"""
+
+	if comparison == 'REGEX':
+		pattern = re.compile(term)
+
+		return [row for row in rows if row[valueIndex] is not None and pattern.search(str(row[valueIndex]))]
+
+	term = term.lower()
+
+	return [row for row in rows if row[valueIndex] is not None and scoreFuzzy(term, str(row[valueIndex]).lower()) >= threshold]
+
+def matchInParallel(chunks, comparison, term, threshold=None, processes=None, valueIndex=3):
+	"""
+	Generator that yields the rows of `chunks` (lists of rows) that match `term`, matching a chunk at a time in each of...
+	...`processes` worker processes (by default, one per core).
+
+	# Notes
+	The rows come out in the same order that they went in. At most two chunks per process are ever in flight, so the...
+	...next chunks are fetched (e.g. from a streaming cursor) while the workers are busy matching, but memory use stays...
+	...flat however many rows stream through.
+	"""
+
+	processes = processes or os.cpu_count() or 1
+	pending = collections.deque()
+
+	with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+		for chunk in chunks:
+			pending.append(executor.submit(matchChunk, chunk, comparison, term, threshold, valueIndex))
+
+			if len(pending) >= processes * 2:
+				yield from pending.popleft().result()
+
+		while pending:
+			yield from pending.popleft().result()
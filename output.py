@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+import sys
+import csv
+import gzip
+import json
+import decimal
+import datetime
+import itertools
+from io import StringIO
+
+# Only some of the output formats need these, so they are only required when one of those is chosen
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+try:
+	import pyarrow
+	import pyarrow.ipc
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+# The formats written as lines of text, those written as CSV compressed on the fly (and how), and the columnar ones
+lineFormats = ['text', 'csv', 'jsonl']
+compressedFormats = {'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+columnarFormats = ['parquet', 'arrow']
+outputFormats = lineFormats + list(compressedFormats) + columnarFormats
+
+# The optional package that each format needs (by the name that it is installed as), if any
+formatPackages = {'csv.zst': 'zstandard', 'parquet': 'pyarrow', 'arrow': 'pyarrow'}
+
+# The columns of a search result row, as they are named in the formats that keep all of them
+resultColumns = ['sku', 'attribute_id', 'attribute_code', 'value', 'store_id', 'required']
+
+# The column type of the values of each `backend_type` in the columnar formats
+valueTypes = {'varchar': 'string', 'text': 'string', 'int': 'int64', 'decimal': 'decimal', 'datetime': 'timestamp'}
+
+def findMissingPackage(outputFormat):
+	"""Returns the name of the optional package that `outputFormat` needs but is not installed (or `None`)."""
+
+	package = formatPackages.get(outputFormat)
+	if package and {'zstandard': zstandard, 'pyarrow': pyarrow}[package] is None:
+		return package
+
+	return None
+
+def getLineFormat(outputFormat):
+	"""Returns the format that the lines of `outputFormat` are in (which is "csv" for the compressed CSV formats)."""
+
+	return 'csv' if outputFormat in compressedFormats else outputFormat
+
+def convertJsonValue(value):
+	"""Returns `value` (of a type that JSON has no notion of) as something that it does."""
+
+	if isinstance(value, decimal.Decimal):
+		return float(value)
+
+	if isinstance(value, (datetime.date, datetime.datetime)):
+		return value.isoformat()
+
+	if isinstance(value, bytes):
+		return value.decode('utf-8', 'replace')
+
+	return str(value)
+
+def fetchInChunks(cursor, size=1000):
+	"""
+	Generator that yields the rows of an executed `cursor` while only ever holding `size` of them in memory.
+
+	Pairs with an unbuffered (server-side) cursor, where `fetchmany()` pulls the next batch off of the wire on demand.
+	"""
+
+	for rows in fetchChunks(cursor, size):
+		for row in rows:
+			yield row
+
+def fetchChunks(cursor, size=1000):
+	"""Generator that yields the rows of an executed `cursor` as lists of (up to) `size` rows, as `fetchInChunks()` fetches them."""
+
+	while True:
+		rows = cursor.fetchmany(size)
+
+		if not rows:
+			break
+
+		yield list(rows)
+
+def formatCsvLine(values):
+	"""Render a single list of `values` as one line of CSV (including its line terminator)."""
+
+	line = StringIO()
+	csv.writer(line, delimiter=',').writerow(values)
+
+	return line.getvalue()
+
+def formatHeader(outputFormat, extraColumns=[]):
+	"""Returns whatever must precede the first row of the given `outputFormat` (which may be nothing at all)."""
+
+	if getLineFormat(outputFormat) == 'csv':
+		return formatCsvLine(['SKU','Value'] + list(extraColumns))
+
+	return ''
+
+def formatRow(row, outputFormat, extraColumns=[]):
+	"""
+	Render one search result `row` (`sku, attribute_id, attribute_code, value, store_id, required`) as a line.
+
+	Rows may carry additional values after those six, which are labelled by `extraColumns` (and ignored without one).
+	Only JSONL keeps all six (typed as they came), where text and CSV only show the SKU and value.
+	"""
+
+	extraValues = list(row[6:6 + len(extraColumns)])
+
+	if outputFormat == 'jsonl':
+		return json.dumps(dict(zip(resultColumns + [column.lower() for column in extraColumns], list(row[:6]) + extraValues)), default=convertJsonValue) + '\n'
+
+	if getLineFormat(outputFormat) == 'csv':
+		return formatCsvLine([row[0], row[3]] + extraValues)
+
+	line = '| SKU: %s | Value: %s |' % (row[0], row[3])
+	for column, value in zip(extraColumns, extraValues):
+		line += ' %s: %s |' % (column, value)
+
+	return line + '\n'
+
+def generateResults(rows, outputFormat, extraColumns=[]):
+	"""Generator that lazily turns an iterable of search result `rows` into lines of the given `outputFormat`."""
+
+	header = formatHeader(outputFormat, extraColumns)
+	if header:
+		yield header
+
+	for row in rows:
+		yield formatRow(row, outputFormat, extraColumns)
+
+def formatTableRow(row, outputFormat, columns):
+	"""Render one row of arbitrary `columns` (such as the aggregates of a `--count`) as a line."""
+
+	if outputFormat == 'jsonl':
+		return json.dumps(dict(zip([column.lower() for column in columns], row)), default=convertJsonValue) + '\n'
+
+	if getLineFormat(outputFormat) == 'csv':
+		return formatCsvLine(row)
+
+	return '|' + ''.join([' %s: %s |' % (column, value) for column, value in zip(columns, row)]) + '\n'
+
+def generateTable(rows, outputFormat, columns):
+	"""Generator that lazily turns an iterable of `rows` of arbitrary `columns` into lines of the given `outputFormat`."""
+
+	if getLineFormat(outputFormat) == 'csv':
+		yield formatCsvLine(columns)
+
+	for row in rows:
+		yield formatTableRow(row, outputFormat, columns)
+
+def openOutput(outputLocation, bufferSize=65536, resumeAt=None, compression=None):
+	"""
+	Returns a writable text stream for `outputLocation`, which is either a filepath, the literal string 'stdout', or an...
+	...already open stream (which is returned as it is).
+
+	Writes to a file are buffered in chunks of `bufferSize` bytes instead of going to disk row-by-row.
+	If `resumeAt` (a position previously returned by `tell()`) is supplied, then an existing file is cut back to that...
+	...point and appended to, rather than being started over.
+	If a `compression` ("gzip" or "zstd") is supplied, then everything written to the file is compressed on its way out.
+	"""
+
+	if compression == 'gzip':
+		return gzip.open(outputLocation, 'wt', encoding='utf-8', newline='')
+
+	if compression == 'zstd':
+		return zstandard.open(outputLocation, 'wt', encoding='utf-8', newline='')
+
+	if outputLocation == 'stdout':
+		return sys.stdout
+
+	if not isinstance(outputLocation, str):
+		return outputLocation
+
+	if resumeAt is not None:
+		stream = open(outputLocation, 'r+', newline='', buffering=bufferSize)
+		stream.seek(resumeAt)
+		stream.truncate()
+		return stream
+
+	return open(outputLocation, 'w', newline='', buffering=bufferSize)
+
+def closeOutput(stream):
+	"""Flush the `stream` returned by `openOutput()`, and close it unless it is stdout (which is not ours to close)."""
+
+	if stream is sys.stdout:
+		stream.flush()
+	else:
+		stream.close()
+
+def writeLines(lines, outputLocation, compression=None):
+	"""Write an iterable of `lines` to `outputLocation` as they arrive (compressing them if asked to), without ever joining them together first."""
+
+	stream = openOutput(outputLocation, compression=compression)
+
+	try:
+		for line in lines:
+			stream.write(line)
+	finally:
+		closeOutput(stream)
+
+def getArrowType(typeName):
+	"""Returns the pyarrow type of one of the column type names used by `writeColumnar()` (e.g. those of `valueTypes`)."""
+
+	return {
+		'string': pyarrow.string(),
+		'int8': pyarrow.int8(),
+		'int32': pyarrow.int32(),
+		'int64': pyarrow.int64(),
+		'decimal': pyarrow.decimal128(12, 4),
+		'timestamp': pyarrow.timestamp('s'),
+	}[typeName]
+
+def coerceColumnarValue(value, typeName):
+	"""Returns `value` as what a column of `typeName` expects (e.g. a `Decimal` rather than a float)."""
+
+	if value is None:
+		return None
+
+	if typeName == 'string' and not isinstance(value, str):
+		return value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+
+	if typeName == 'decimal' and not isinstance(value, decimal.Decimal):
+		return decimal.Decimal(str(value))
+
+	if typeName == 'timestamp' and isinstance(value, str):
+		return datetime.datetime.fromisoformat(value)
+
+	if typeName in ['int8', 'int32', 'int64'] and not isinstance(value, int):
+		return int(value)
+
+	return value
+
+def inferColumnType(values):
+	"""Returns the name of the column type to store `values` (of a column whose type isn't known up front) as."""
+
+	for value in values:
+		if value is None:
+			continue
+
+		if isinstance(value, int):
+			return 'int64'
+		if isinstance(value, decimal.Decimal):
+			return 'decimal'
+		if isinstance(value, datetime.datetime):
+			return 'timestamp'
+
+		break
+
+	return 'string'
+
+def writeColumnar(rows, outputLocation, outputFormat, columns, columnTypes={}, batchSize=65536):
+	"""
+	Write an iterable of `rows` (of `columns`) to the file `outputLocation` as Parquet or Arrow IPC (`outputFormat` "parquet" or "arrow").
+
+	The rows are written `batchSize` at a time, each batch as a Parquet row group or an Arrow record batch.
+	`columnTypes` gives the type names (see `getArrowType()`) of the columns whose types are known up front, and the...
+	...types of the others are worked out from the first batch. The columns are named in lowercase, as they are in JSONL.
+	"""
+
+	rows = iter(rows)
+	typeNames = None
+	schema = None
+	writer = None
+
+	try:
+		while True:
+			batch = list(itertools.islice(rows, batchSize))
+			columnValues = [[row[index] if index < len(row) else None for row in batch] for index in range(len(columns))]
+
+			if writer is None:
+				typeNames = [columnTypes.get(column) or inferColumnType(values) for column, values in zip(columns, columnValues)]
+				schema = pyarrow.schema([(column.lower(), getArrowType(typeName)) for column, typeName in zip(columns, typeNames)])
+				writer = pyarrow.parquet.ParquetWriter(outputLocation, schema) if outputFormat == 'parquet' else pyarrow.ipc.new_file(outputLocation, schema)
+
+			if batch:
+				arrays = [pyarrow.array([coerceColumnarValue(value, typeName) for value in values], type=field.type) for values, typeName, field in zip(columnValues, typeNames, schema)]
+				recordBatch = pyarrow.record_batch(arrays, schema=schema)
+
+				if outputFormat == 'parquet':
+					writer.write_table(pyarrow.Table.from_batches([recordBatch]))
+				else:
+					writer.write_batch(recordBatch)
+
+			if len(batch) < batchSize:
+				break
+	finally:
+		if writer is not None:
+			writer.close()
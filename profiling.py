@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+import os
+import sys
+import time
+import json
+import contextlib
+
+try:
+	import resource
+except ImportError:
+	# Not available on Windows, where the peak RSS is simply left out of the report
+	resource = None
+
+class ProfiledCursor(object):
+	"""Wraps an executed DB cursor to time (as the "fetch" phase) and count the rows pulled through it."""
+
+	def __init__(self, dbCursor, profiler):
+		"""Profile the fetching of `dbCursor` into `profiler`."""
+
+		self.dbCursor = dbCursor
+		self.profiler = profiler
+
+	def fetchmany(self, size):
+		"""Returns the next `size` rows."""
+
+		with self.profiler.phase('fetch'):
+			rows = self.dbCursor.fetchmany(size)
+
+		self.profiler.rows += len(rows)
+
+		return rows
+
+	def __iter__(self):
+		"""Iterate over every remaining row."""
+
+		with self.profiler.phase('fetch'):
+			rows = list(self.dbCursor)
+
+		self.profiler.rows += len(rows)
+
+		return iter(rows)
+
+	def close(self):
+		"""Close the underlying cursor."""
+
+		self.dbCursor.close()
+
+class Profiler(object):
+	"""
+	Records where the time of a run goes, phase by phase, along with how many rows were fetched and bytes written.
+
+	Phases nest, but their times are exclusive: time spent in an inner phase (e.g. fetching rows while formatting them)...
+	...is only charged to the inner one, so the phases add up to the whole run.
+	"""
+
+	def __init__(self, labels=None, explain=False):
+		"""Start profiling a run identified by `labels` (a dict), capturing `EXPLAIN` plans if `explain` is set."""
+
+		self.labels = labels or {}
+		self.explain = explain
+		self.started = time.time()
+
+		self.phases = {}
+		self.stack = []
+		self.lastWall = time.perf_counter()
+		self.lastCpu = time.process_time()
+
+		self.rows = 0
+		self.bytes = 0
+		self.plans = []
+
+	def charge(self):
+		"""Charge the time since the last switch between phases to the current phase (if any)."""
+
+		wall = time.perf_counter()
+		cpu = time.process_time()
+
+		if self.stack:
+			phase = self.phases.setdefault(self.stack[-1], dict(wall_seconds=0.0, cpu_seconds=0.0))
+			phase['wall_seconds'] += wall - self.lastWall
+			phase['cpu_seconds'] += cpu - self.lastCpu
+
+		self.lastWall = wall
+		self.lastCpu = cpu
+
+	@contextlib.contextmanager
+	def phase(self, name):
+		"""Context manager that charges the time spent within it to the `name` phase."""
+
+		self.charge()
+		self.stack.append(name)
+
+		try:
+			yield
+		finally:
+			self.charge()
+			self.stack.pop()
+
+	def profileLines(self, lines, phaseName='format'):
+		"""Generator that passes `lines` along, charging the time taken to produce each to `phaseName` and counting their bytes."""
+
+		lines = iter(lines)
+
+		while True:
+			with self.phase(phaseName):
+				line = next(lines, None)
+
+			if line is None:
+				break
+
+			self.bytes += len(line.encode('utf-8'))
+			yield line
+
+	def captureExplain(self, dbConn, sql, parameters):
+		"""Ask MySQL for the plan (`EXPLAIN FORMAT=JSON`) of `sql`, and keep it for the report."""
+
+		with self.phase('explain'):
+			dbCursor = dbConn.cursor()
+			dbCursor.execute('EXPLAIN FORMAT=JSON ' + sql, parameters)
+			plan = json.loads(dbCursor.fetchone()[0])
+			dbCursor.close()
+
+		self.plans.append(dict(plan=plan, full_table_scans=self.findFullTableScans(plan)))
+
+	def findFullTableScans(self, plan):
+		"""Returns the names of the tables that an `EXPLAIN FORMAT=JSON` `plan` reads in full (`access_type` "ALL")."""
+
+		tables = []
+
+		if isinstance(plan, dict):
+			if plan.get('access_type') == 'ALL':
+				tables.append(plan.get('table_name'))
+
+			for value in plan.values():
+				tables += self.findFullTableScans(value)
+		elif isinstance(plan, list):
+			for value in plan:
+				tables += self.findFullTableScans(value)
+
+		return tables
+
+	def fetchPeakRss(self):
+		"""Returns the peak resident set size of this process in bytes (or `None` where that can't be found out)."""
+
+		if resource is None:
+			return None
+
+		peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+		# Linux reports kilobytes, macOS bytes
+		return peakRss if sys.platform == 'darwin' else peakRss * 1024
+
+	def report(self):
+		"""Returns everything recorded so far, as a dict."""
+
+		self.charge()
+
+		return dict(
+			labels=self.labels,
+			started=self.started,
+			wall_seconds=sum([phase['wall_seconds'] for phase in self.phases.values()]),
+			phases=self.phases,
+			rows_fetched=self.rows,
+			bytes_written=self.bytes,
+			peak_rss_bytes=self.fetchPeakRss(),
+			explain=self.plans
+		)
+
+	def formatPrometheus(self, report):
+		"""Render a `report` in the Prometheus text exposition format (for the node exporter's textfile collector)."""
+
+		def formatLabels(extraLabels={}):
+			labels = dict(self.labels, **extraLabels)
+			return '{' + ','.join(['%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in sorted(labels.items())]) + '}'
+
+		metrics = [
+			('phase_wall_seconds', 'Wall-clock time spent in each phase of the run.', [(formatLabels(dict(phase=name)), phase['wall_seconds']) for name, phase in sorted(report['phases'].items())]),
+			('phase_cpu_seconds', 'CPU time spent in each phase of the run.', [(formatLabels(dict(phase=name)), phase['cpu_seconds']) for name, phase in sorted(report['phases'].items())]),
+			('wall_seconds', 'Wall-clock time of all of the phases of the run together.', [(formatLabels(), report['wall_seconds'])]),
+			('rows_fetched', 'Rows fetched from the database.', [(formatLabels(), report['rows_fetched'])]),
+			('bytes_written', 'Bytes of output written.', [(formatLabels(), report['bytes_written'])]),
+			('full_table_scans', 'Tables read in full according to the captured EXPLAIN plans.', [(formatLabels(), sum([len(plan['full_table_scans']) for plan in report['explain']]))]),
+			('last_run_timestamp_seconds', 'When the run started.', [(formatLabels(), report['started'])]),
+		]
+
+		if report['peak_rss_bytes'] is not None:
+			metrics.append(('peak_rss_bytes', 'Peak resident set size of the process.', [(formatLabels(), report['peak_rss_bytes'])]))
+
+		lines = []
+		for name, description, samples in metrics:
+			lines.append('# HELP magento_attribute_searcher_%s %s' % (name, description))
+			lines.append('# TYPE magento_attribute_searcher_%s gauge' % (name,))
+			for labels, value in samples:
+				lines.append('magento_attribute_searcher_%s%s %s' % (name, labels, value))
+
+		return '\n'.join(lines) + '\n'
+
+	def writeReport(self, reportPath):
+		"""Write the report to `reportPath`, in the Prometheus textfile format if it ends in ".prom" (else as JSON)."""
+
+		report = self.report()
+
+		if reportPath.endswith('.prom'):
+			content = self.formatPrometheus(report)
+		else:
+			content = json.dumps(report, indent=2, default=str) + '\n'
+
+		# (like the checkpoints of chunked searches, so that a collector never picks up a half-written report)
+		with open(reportPath + '.tmp', 'w') as reportFile:
+			reportFile.write(content)
+		os.replace(reportPath + '.tmp', reportPath)
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+import time
+import json
+import zlib
+import pickle
+import sqlite3
+import hashlib
+
+class CachedResults(object):
+	"""Stands in for an executed DB cursor, serving up rows that came out of the cache."""
+
+	def __init__(self, rows):
+		"""Serve `rows`."""
+
+		self.rows = rows
+		self.position = 0
+
+	def fetchmany(self, size):
+		"""Returns the next `size` rows (or fewer, once they run out)."""
+
+		rows = self.rows[self.position:self.position + size]
+		self.position += len(rows)
+
+		return rows
+
+	def __iter__(self):
+		"""Iterate over the remaining rows."""
+
+		rows = self.rows[self.position:]
+		self.position = len(self.rows)
+
+		return iter(rows)
+
+	def close(self):
+		"""Nothing to close (but cursors can be closed, so this can be too)."""
+
+		pass
+
+class RecordingCursor(object):
+	"""
+	Wraps an executed DB cursor to keep a copy of every row that passes through it, so that they can be cached.
+
+	Gives up on keeping the copy (but not on passing rows along) once they add up to more than `maxBytes`.
+	"""
+
+	def __init__(self, dbCursor, maxBytes):
+		"""Record the rows of `dbCursor`."""
+
+		self.dbCursor = dbCursor
+		self.maxBytes = maxBytes
+		self.rows = []
+		self.recordedBytes = 0
+		self.finished = False
+
+	def record(self, rows):
+		"""Keep a copy of `rows` (if there is still room for them)."""
+
+		if not rows:
+			self.finished = True
+			return rows
+
+		if self.rows is not None:
+			self.recordedBytes += sum([len(str(value)) for row in rows for value in row])
+
+			if self.recordedBytes > self.maxBytes:
+				self.rows = None
+			else:
+				self.rows.extend([tuple(row) for row in rows])
+
+		return rows
+
+	def fetchmany(self, size):
+		"""Returns (and records) the next `size` rows."""
+
+		return self.record(self.dbCursor.fetchmany(size))
+
+	def __iter__(self):
+		"""Iterate over (and record) every remaining row."""
+
+		rows = self.record(list(self.dbCursor))
+		self.record([])
+
+		return iter(rows)
+
+	def close(self):
+		"""Close the underlying cursor."""
+
+		self.dbCursor.close()
+
+	def getRecording(self):
+		"""Returns every row, or `None` if they were not all seen (or there were too many of them to keep)."""
+
+		return self.rows if self.finished else None
+
+class ResultCache(object):
+	"""
+	A local, size-bounded cache of search results, kept in SQLite.
+
+	Entries are looked up by the search that produced them, and are only served while they are younger than the TTL...
+	...and their `validator` (a cheap summary of the catalog, taken when they were stored) still matches the catalog's.
+	Once the cache grows past `maxBytes`, the least recently used entries are evicted.
+	"""
+
+	def __init__(self, cachePath, ttl=3600, maxBytes=268435456):
+		"""Open (creating if needed) the cache file at `cachePath`."""
+
+		self.ttl = ttl
+		self.maxBytes = maxBytes
+
+		self.cacheConn = sqlite3.connect(cachePath)
+		self.cacheConn.executescript("""
+			CREATE TABLE IF NOT EXISTS entries (
+				key TEXT PRIMARY KEY,
+				validator TEXT NOT NULL,
+				created REAL NOT NULL,
+				last_used REAL NOT NULL,
+				size INTEGER NOT NULL,
+				rows BLOB NOT NULL
+			);
+			CREATE TABLE IF NOT EXISTS statistics (
+				name TEXT PRIMARY KEY,
+				value INTEGER NOT NULL
+			);
+		""")
+
+	def close(self):
+		"""Close the cache file."""
+
+		self.cacheConn.close()
+
+	def makeKey(self, search):
+		"""Returns the key for a `search` (any JSON-able description of it)."""
+
+		return hashlib.sha1(json.dumps(search, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+	def count(self, name):
+		"""Add one to the `name` statistic."""
+
+		with self.cacheConn:
+			self.cacheConn.execute('INSERT OR IGNORE INTO statistics (name, value) VALUES (?, 0)', (name,))
+			self.cacheConn.execute('UPDATE statistics SET value = value + 1 WHERE name = ?', (name,))
+
+	def get(self, key, validator):
+		"""Returns the cached rows for `key` as a `CachedResults`, or `None` if there are none that are still valid."""
+
+		entry = self.cacheConn.execute('SELECT validator, created, rows FROM entries WHERE key = ?', (key,)).fetchone()
+
+		if entry is None or entry[0] != validator or entry[1] + self.ttl < time.time():
+			if entry is not None:
+				with self.cacheConn:
+					self.cacheConn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+			self.count('misses')
+			return None
+
+		with self.cacheConn:
+			self.cacheConn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+
+		self.count('hits')
+		return CachedResults(pickle.loads(zlib.decompress(entry[2])))
+
+	def put(self, key, validator, rows):
+		"""Store `rows` under `key`, then evict whatever it takes to get back under `maxBytes`."""
+
+		data = zlib.compress(pickle.dumps(rows, pickle.HIGHEST_PROTOCOL))
+		now = time.time()
+
+		with self.cacheConn:
+			self.cacheConn.execute(
+				'INSERT OR REPLACE INTO entries (key, validator, created, last_used, size, rows) VALUES (?, ?, ?, ?, ?, ?)',
+				(key, validator, now, now, len(data), data)
+			)
+
+			totalBytes = 0
+			for entryKey, size in self.cacheConn.execute('SELECT key, size FROM entries ORDER BY last_used DESC').fetchall():
+				totalBytes += size
+
+				if totalBytes > self.maxBytes:
+					self.cacheConn.execute('DELETE FROM entries WHERE key = ?', (entryKey,))
+
+	def describe(self):
+		"""Returns a one-line summary of what is in the cache and how well it has been doing."""
+
+		entries, totalBytes = self.cacheConn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+		statistics = dict(self.cacheConn.execute('SELECT name, value FROM statistics').fetchall())
+
+		return '%s entries (%.1f MB), %s hits and %s misses so far.' % (entries, totalBytes / 1048576.0, statistics.get('hits', 0), statistics.get('misses', 0))
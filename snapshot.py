@@ -0,0 +1,293 @@
+#!/usr/bin/python3
+import sqlite3
+import datetime
+import decimal
+import pymysql
+
+class EavSnapshot(object):
+	"""
+	A local SQLite copy of one catalog scope's Attributes, entities, and typed Attribute values.
+
+	Once taken, searches can be run against the snapshot without touching MySQL at all. Snapshots are kept current by...
+	...only re-pulling the entities whose `updated_at` has moved since the last time (see `refresh()`).
+	"""
+
+	# The typed value tables that are copied
+	backendTypes = ['varchar', 'int', 'text', 'decimal', 'datetime']
+
+	# The `eav_attribute` columns that are copied
+	attributeColumns = ['attribute_id', 'attribute_code', 'backend_type', 'frontend_input', 'source_model', 'backend_model', 'is_required']
+
+	# MySQL comparisons that are spelled differently in SQLite
+	comparisonTranslations = {'<=>': 'IS'}
+
+	def __init__(self, snapshotPath):
+		"""Open (creating if needed) the snapshot file at `snapshotPath`."""
+
+		self.snapshotPath = snapshotPath
+		self.snapshotConn = sqlite3.connect(snapshotPath)
+		self.snapshotConn.executescript("""
+			CREATE TABLE IF NOT EXISTS meta (
+				key TEXT PRIMARY KEY,
+				value TEXT
+			);
+			CREATE TABLE IF NOT EXISTS attributes (
+				attribute_id INTEGER PRIMARY KEY,
+				attribute_code TEXT NOT NULL UNIQUE,
+				backend_type TEXT,
+				frontend_input TEXT,
+				source_model TEXT,
+				backend_model TEXT,
+				is_required INTEGER
+			);
+			CREATE TABLE IF NOT EXISTS entities (
+				entity_id INTEGER PRIMARY KEY,
+				sku TEXT,
+				updated_at TEXT
+			);
+			CREATE TABLE IF NOT EXISTS entity_values (
+				entity_id INTEGER NOT NULL,
+				attribute_id INTEGER NOT NULL,
+				store_id INTEGER NOT NULL,
+				value
+			);
+			CREATE INDEX IF NOT EXISTS entity_values_attribute_value ON entity_values (attribute_id, value);
+			CREATE INDEX IF NOT EXISTS entity_values_entity ON entity_values (entity_id);
+		""")
+
+	def close(self):
+		"""Close the snapshot file."""
+
+		self.snapshotConn.close()
+
+	def getMeta(self, key):
+		"""Returns the snapshot's `key` setting (or `None`)."""
+
+		row = self.snapshotConn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+
+		return row[0] if row else None
+
+	def setMeta(self, key, value):
+		"""Store the snapshot's `key` setting."""
+
+		self.snapshotConn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+	def toLocalValue(self, value):
+		"""Convert a value from MySQL into something SQLite stores (and compares) faithfully."""
+
+		if isinstance(value, decimal.Decimal):
+			return float(value)
+
+		if isinstance(value, (datetime.datetime, datetime.date)):
+			return str(value)
+
+		return value
+
+	def update(self, dbConn, scope, fetchSize=1000):
+		"""Bring the snapshot of `scope` up to date, by refreshing it if it already holds that scope or taking it from scratch."""
+
+		if self.getMeta('scope') == scope and self.getMeta('high_water_mark'):
+			return self.refresh(dbConn, fetchSize)
+
+		return self.take(dbConn, scope, fetchSize)
+
+	def take(self, dbConn, scope, fetchSize=1000):
+		"""Copy everything of `scope` into the (emptied) snapshot. Returns the number of entities copied."""
+
+		dbCursor = dbConn.cursor()
+		highWaterMark = self.fetchHighWaterMark(dbCursor, scope)
+
+		with self.snapshotConn:
+			self.snapshotConn.execute('DELETE FROM entity_values')
+			self.snapshotConn.execute('DELETE FROM entities')
+			self.setMeta('scope', scope)
+
+			self.copyAttributes(dbCursor, scope)
+
+			streamCursor = dbConn.cursor(pymysql.cursors.SSCursor)
+			streamCursor.execute('SELECT entity_id, sku, updated_at FROM catalog_%s_entity' % (scope,))
+			self.copyRows(streamCursor, 'INSERT INTO entities (entity_id, sku, updated_at) VALUES (?, ?, ?)', fetchSize)
+
+			for backendType in self.backendTypes:
+				streamCursor.execute('SELECT entity_id, attribute_id, store_id, value FROM catalog_%s_entity_%s' % (scope, backendType))
+				self.copyRows(streamCursor, 'INSERT INTO entity_values (entity_id, attribute_id, store_id, value) VALUES (?, ?, ?, ?)', fetchSize)
+
+			streamCursor.close()
+
+			self.setMeta('high_water_mark', highWaterMark)
+
+		return self.snapshotConn.execute('SELECT COUNT(*) FROM entities').fetchone()[0]
+
+	def refresh(self, dbConn, fetchSize=1000):
+		"""
+		Re-pull only the entities changed since the last update (plus drop any that were deleted).
+
+		Returns the number of entities re-pulled.
+		"""
+
+		scope = self.getMeta('scope')
+		dbCursor = dbConn.cursor()
+
+		# Read before pulling anything, so that changes made during the pull are caught next time
+		highWaterMark = self.fetchHighWaterMark(dbCursor, scope)
+
+		# `>=` rather than `>`, since `updated_at` only has a resolution of one second
+		dbCursor.execute('SELECT entity_id, sku, updated_at FROM catalog_%s_entity WHERE updated_at >= %%s' % (scope,), (self.getMeta('high_water_mark'),))
+		changedEntities = [tuple(self.toLocalValue(value) for value in entity) for entity in dbCursor.fetchall()]
+
+		with self.snapshotConn:
+			self.copyAttributes(dbCursor, scope)
+
+			for start in range(0, len(changedEntities), fetchSize):
+				batch = changedEntities[start:start + fetchSize]
+				entityIds = [entity[0] for entity in batch]
+				placeholders = ', '.join(['?'] * len(entityIds))
+
+				self.snapshotConn.execute('DELETE FROM entity_values WHERE entity_id IN (' + placeholders + ')', entityIds)
+				self.snapshotConn.executemany('INSERT OR REPLACE INTO entities (entity_id, sku, updated_at) VALUES (?, ?, ?)', batch)
+
+				for backendType in self.backendTypes:
+					dbCursor.execute(
+						'SELECT entity_id, attribute_id, store_id, value FROM catalog_%s_entity_%s WHERE entity_id IN (' % (scope, backendType) + ', '.join(['%s'] * len(entityIds)) + ')',
+						entityIds
+					)
+					self.copyRows(dbCursor, 'INSERT INTO entity_values (entity_id, attribute_id, store_id, value) VALUES (?, ?, ?, ?)', fetchSize)
+
+			self.removeDeletedEntities(dbConn, scope, fetchSize)
+
+			self.setMeta('high_water_mark', highWaterMark)
+
+		return len(changedEntities)
+
+	def removeDeletedEntities(self, dbConn, scope, fetchSize=1000):
+		"""Drop every entity (and its values) that no longer exists in MySQL. Skipped when the entity counts agree."""
+
+		dbCursor = dbConn.cursor()
+		dbCursor.execute('SELECT COUNT(*) FROM catalog_%s_entity' % (scope,))
+
+		if dbCursor.fetchone()[0] == self.snapshotConn.execute('SELECT COUNT(*) FROM entities').fetchone()[0]:
+			return
+
+		self.snapshotConn.execute('CREATE TEMPORARY TABLE IF NOT EXISTS remote_entities (entity_id INTEGER PRIMARY KEY)')
+		self.snapshotConn.execute('DELETE FROM remote_entities')
+
+		streamCursor = dbConn.cursor(pymysql.cursors.SSCursor)
+		streamCursor.execute('SELECT entity_id FROM catalog_%s_entity' % (scope,))
+		self.copyRows(streamCursor, 'INSERT INTO remote_entities (entity_id) VALUES (?)', fetchSize)
+		streamCursor.close()
+
+		self.snapshotConn.execute('DELETE FROM entity_values WHERE entity_id NOT IN (SELECT entity_id FROM remote_entities)')
+		self.snapshotConn.execute('DELETE FROM entities WHERE entity_id NOT IN (SELECT entity_id FROM remote_entities)')
+
+	def fetchHighWaterMark(self, dbCursor, scope):
+		"""Returns the most recent `updated_at` of `scope` in MySQL (as a string)."""
+
+		dbCursor.execute('SELECT MAX(updated_at) FROM catalog_%s_entity' % (scope,))
+
+		return str(dbCursor.fetchone()[0])
+
+	def copyAttributes(self, dbCursor, scope):
+		"""Replace the snapshot's Attributes with the current ones of `scope`."""
+
+		dbCursor.execute("""SELECT
+				""" + ', '.join(['ea.' + column for column in self.attributeColumns]) + """
+			FROM eav_attribute AS ea
+			INNER JOIN eav_entity_type AS eet
+				ON ea.entity_type_id = eet.entity_type_id
+			WHERE eet.entity_type_code = %s""",
+			('catalog_' + scope,)
+		)
+
+		self.snapshotConn.execute('DELETE FROM attributes')
+		self.snapshotConn.executemany(
+			'INSERT INTO attributes (' + ', '.join(self.attributeColumns) + ') VALUES (?, ?, ?, ?, ?, ?, ?)',
+			dbCursor.fetchall()
+		)
+
+	def copyRows(self, dbCursor, insertSql, fetchSize=1000):
+		"""Insert every row of an executed MySQL `dbCursor` using `insertSql`, `fetchSize` rows at a time."""
+
+		while True:
+			rows = dbCursor.fetchmany(fetchSize)
+			if not rows:
+				break
+
+			self.snapshotConn.executemany(insertSql, [tuple(self.toLocalValue(value) for value in row) for row in rows])
+
+	def getAttribute(self, attributeCode):
+		"""Returns the snapshot's `eav_attribute` row (as a dict of `attributeColumns`) of `attributeCode`, or `None`."""
+
+		attribute = self.snapshotConn.execute(
+			'SELECT ' + ', '.join(self.attributeColumns) + ' FROM attributes WHERE attribute_code = ?',
+			(attributeCode,)
+		).fetchone()
+
+		if attribute is None:
+			return None
+
+		return dict(zip(self.attributeColumns, attribute))
+
+	def listAttributes(self):
+		"""Returns `(attribute_id, attribute_code, is_required)` for every Attribute in the snapshot."""
+
+		return self.snapshotConn.execute('SELECT attribute_id, attribute_code, is_required FROM attributes ORDER BY attribute_code').fetchall()
+
+	def toSearchTerm(self, term, backendType):
+		"""Convert a search `term` to the type that `backendType` values are stored as (SQLite won't coerce it for us)."""
+
+		try:
+			if backendType == 'int':
+				return int(term)
+			if backendType == 'decimal':
+				return float(term)
+		except (TypeError, ValueError):
+			pass
+
+		return term
+
+	def search(self, attributeCode, comparison, value, values=None):
+		"""
+		Search the snapshot, the same as `MagentoAttributeSearcher.search()` does MySQL.
+
+		Returns a cursor over `sku, attribute_id, attribute_code, value, store_id, required` rows (with a final `matched`...
+		...column when searching for any of several `values`).
+		"""
+
+		attribute = self.getAttribute(attributeCode)
+		backendType = attribute['backend_type']
+		comparison = self.comparisonTranslations.get(comparison, comparison)
+
+		if values:
+			self.snapshotConn.execute('CREATE TEMPORARY TABLE IF NOT EXISTS search_values (term)')
+			self.snapshotConn.execute('DELETE FROM search_values')
+			self.snapshotConn.executemany('INSERT INTO search_values (term) VALUES (?)', [(self.toSearchTerm(term, backendType),) for term in values])
+
+			matched = ', sv.term AS matched'
+			join = 'INNER JOIN search_values AS sv ON v.value ' + comparison + ' sv.term'
+			condition = ''
+			parameters = [attribute['attribute_id']]
+		else:
+			matched = ''
+			join = ''
+			condition = ' AND v.value ' + comparison + ' ?'
+			parameters = [attribute['attribute_id'], self.toSearchTerm(value, backendType)]
+
+		if backendType in ['varchar', 'text']:
+			condition += " AND v.value != ''"
+
+		return self.snapshotConn.execute("""SELECT
+				e.sku,
+				a.attribute_id,
+				a.attribute_code,
+				v.value,
+				v.store_id,
+				a.is_required AS required""" + matched + """
+			FROM entity_values AS v
+			""" + join + """
+			INNER JOIN entities AS e
+				ON v.entity_id = e.entity_id
+			INNER JOIN attributes AS a
+				ON v.attribute_id = a.attribute_id
+			WHERE v.attribute_id = ?""" + condition,
+			parameters
+		)
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+import json
+import threading
+import contextlib
+
+# Where the `serve` command listens (and the client connects) unless told otherwise, alongside "db.yaml"
+defaultSocketPath = 'searcher.sock'
+
+# How much output is gathered up before it is sent on as a frame of its own
+frameSize = 65536
+
+def sendRequest(sock, request):
+	"""Send a search `request` (a dict) over the connected `sock`, as a single line of JSON."""
+
+	sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+
+def readRequest(reader):
+	"""Read the search request (a dict) from the binary file-like `reader` of a connection."""
+
+	request = json.loads(reader.readline().decode('utf-8') or 'null')
+
+	if not isinstance(request, dict):
+		raise ValueError('The request must be a JSON object on a single line.')
+
+	return request
+
+def writeFrame(sock, kind, payload):
+	"""
+	Send one frame of the response over `sock`: a line holding its `kind` and length, followed by its `payload` (bytes).
+
+	The response to a request is any number of "data" frames (the output, in order), followed by a single "done" frame...
+	...holding the outcome as JSON (`{"ok": true, ...}` or `{"ok": false, "error": ...}`), so that a failure part of the...
+	...way through can always be told apart from output that simply ended.
+	"""
+
+	sock.sendall(('%s %s\n' % (kind, len(payload))).encode('ascii') + payload)
+
+def readFrames(reader):
+	"""Generator that yields the `(kind, payload)` frames of a response from the binary file-like `reader`."""
+
+	while True:
+		header = reader.readline()
+		if not header:
+			raise ConnectionError('The server hung up before finishing its response.')
+
+		kind, length = header.decode('ascii').split()
+		payload = reader.read(int(length))
+
+		yield (kind, payload)
+
+		if kind == 'done':
+			break
+
+class ResponseStream(object):
+	"""A writable text stream that sends whatever is written to it back over a connection, as "data" frames."""
+
+	def __init__(self, sock):
+		"""Write to the connected `sock`."""
+
+		self.sock = sock
+		self.pending = []
+		self.pendingSize = 0
+
+	def write(self, text):
+		"""Write `text`, sending it on once enough has been gathered up."""
+
+		data = text.encode('utf-8')
+		self.pending.append(data)
+		self.pendingSize += len(data)
+
+		if self.pendingSize >= frameSize:
+			self.flush()
+
+		return len(text)
+
+	def flush(self):
+		"""Send whatever has been written so far."""
+
+		if self.pending:
+			writeFrame(self.sock, 'data', b''.join(self.pending))
+			self.pending = []
+			self.pendingSize = 0
+
+	def close(self):
+		"""Send whatever has been written so far (the connection itself still has the outcome to send)."""
+
+		self.flush()
+
+class ThreadOutput(object):
+	"""
+	Stands in for `sys.stdout`, so that what each thread prints can be captured (while it handles a request) on its own.
+
+	Anything printed outside of a capture still goes to the real `stdout`.
+	"""
+
+	def __init__(self, stdout):
+		"""Pass anything not being captured on to `stdout`."""
+
+		self.stdout = stdout
+		self.local = threading.local()
+
+	@contextlib.contextmanager
+	def capture(self, messages):
+		"""Context manager that appends whatever the current thread prints within it to the list `messages`."""
+
+		self.local.messages = messages
+
+		try:
+			yield messages
+		finally:
+			self.local.messages = None
+
+	def write(self, text):
+		"""Write `text` to the current thread's capture (if any), else to the real `stdout`."""
+
+		messages = getattr(self.local, 'messages', None)
+		if messages is None:
+			return self.stdout.write(text)
+
+		messages.append(text)
+
+		return len(text)
+
+	def flush(self):
+		"""Flush the real `stdout`."""
+
+		self.stdout.flush()
@@ -0,0 +1,413 @@
+#!/usr/bin/python3
+import re
+import zlib
+import random
+import sqlite3
+import datetime
+
+# The share of generated Attributes that get each `backend_type`
+backendTypeShares = [('varchar', 0.4), ('int', 0.25), ('text', 0.15), ('decimal', 0.15), ('datetime', 0.05)]
+
+# The column type of each value table's `value`, so that SQLite compares (e.g.) '10' against numbers the way MySQL does
+valueColumnTypes = {'varchar': 'VARCHAR(255)', 'int': 'INTEGER', 'text': 'TEXT', 'decimal': 'DECIMAL(12,4)', 'datetime': 'DATETIME'}
+
+# What a value computed from the numeric value tables is cast to, so that it too compares against numbers (see `translate()`)
+effectiveValueCasts = {'int': 'INTEGER', 'decimal': 'REAL'}
+
+# Attributes that every generated catalog has (beyond the numbered filler ones), as `(attribute_code, backend_type, frontend_input)`
+wellKnownAttributes = [
+	('name', 'varchar', 'text'),
+	('description', 'text', 'textarea'),
+	('status', 'int', 'select'),
+	('visibility', 'int', 'select'),
+	('color', 'int', 'select'),
+	('price', 'decimal', 'price'),
+	('news_from_date', 'datetime', 'date'),
+]
+
+# The option labels of the `color` Attribute, whose (generated `int`) values 1 to 20 are the IDs of these options
+colorLabels = ['Red', 'Blue', 'Green', 'Black', 'White', 'Grey', 'Yellow', 'Orange', 'Purple', 'Pink', 'Brown', 'Beige',
+	'Navy', 'Teal', 'Olive', 'Maroon', 'Silver', 'Gold', 'Ivory', 'Turquoise']
+
+# The values that `status` is generated with (1 being enabled, and 2 disabled), most products being enabled
+statusValues = [1, 1, 1, 2]
+
+# The share of products assigned to each website (every two store views sharing one)
+websiteDensity = 0.9
+
+# The Attributes that get a column in the flat table of each store view (as if they were "used in product listing")
+flatAttributes = ['name', 'status', 'visibility', 'color', 'price']
+
+words = ['red', 'blue', 'green', 'cotton', 'steel', 'classic', 'deluxe', 'compact', 'organic', 'vintage', 'premium', 'basic',
+	'large', 'small', 'shirt', 'lamp', 'chair', 'kettle', 'bottle', 'jacket', 'widget', 'gadget', 'soft', 'bright']
+
+def sqlCrc32(value):
+	"""MySQL's `CRC32()`, for SQLite."""
+
+	return zlib.crc32(str(value).encode('utf-8'))
+
+def sqlConcatWs(separator, *values):
+	"""MySQL's `CONCAT_WS()`, for SQLite."""
+
+	return separator.join([str(value) for value in values if value is not None])
+
+def sqlField(value, *options):
+	"""MySQL's `FIELD()`, for SQLite."""
+
+	for index, option in enumerate(options):
+		if str(value) == str(option):
+			return index + 1
+
+	return 0
+
+def sqlElt(index, *options):
+	"""MySQL's `ELT()`, for SQLite."""
+
+	if index and 0 < index <= len(options):
+		return options[index - 1]
+
+	return None
+
+def sqlFindInSet(needle, haystack):
+	"""MySQL's `FIND_IN_SET()`, for SQLite."""
+
+	items = str(haystack or '').split(',')
+
+	return items.index(str(needle)) + 1 if str(needle) in items else 0
+
+class StandInCursor(object):
+	"""A pymysql-like cursor over SQLite, translating the bits of MySQL dialect that this tool's queries rely upon."""
+
+	def __init__(self, sqliteConn):
+		"""Open a cursor on `sqliteConn`."""
+
+		self.sqliteCursor = sqliteConn.cursor()
+		self.description = None
+
+	def translate(self, sql):
+		"""Turn one of this tool's MySQL queries into its SQLite equivalent."""
+
+		# `%s` placeholders (and `%%` escapes) become `?` placeholders (and plain `%`s)
+		sql = re.sub(r'%(%|s)', lambda match: '?' if match.group(1) == 's' else '%', sql)
+
+		# SQLite has no `HAVING` without `GROUP BY` (as the catch-all query uses it), so it becomes a `WHERE` around a subquery
+		having = re.match(r'(\s*SELECT \* FROM \(\s*)(SELECT\s.*?)\sHAVING\s(.*?)(\)\s*AS tab.*)$', sql, re.S)
+		if having and 'GROUP BY' not in sql:
+			sql = having.group(1) + 'SELECT * FROM (' + having.group(2) + ') WHERE ' + having.group(3) + having.group(4)
+
+		sql = re.sub(r'CREATE TEMPORARY TABLE (\w+) \(term ([^,]+), INDEX \(term(?:\(\d+\))?\)\)', r'CREATE TEMP TABLE \1 (term \2)', sql)
+		sql = sql.replace('DROP TEMPORARY TABLE', 'DROP TABLE')
+
+		# SQLite only converts a search term to a column's type when comparing it against that column itself, which the...
+		# ...effective value of a store view search (a `CASE` choosing between two columns) is not, so it is cast back
+		valueTable = re.search(r'_entity_(\w+) AS dv\b', sql)
+		if valueTable and valueTable.group(1) in effectiveValueCasts:
+			sql = re.sub(r'(CASE WHEN sv\.value_id IS NULL THEN dv\.value ELSE sv\.value END)', r'CAST(\1 AS ' + effectiveValueCasts[valueTable.group(1)] + ')', sql)
+
+		# Byte-wise ordering (whatever the collation) is a cast to `BINARY` in MySQL, and to `BLOB` in SQLite
+		sql = sql.replace(' AS BINARY)', ' AS BLOB)')
+
+		# The columns of every table are listed by `information_schema` in MySQL, and by `pragma_table_info()` in SQLite
+		sql = sql.replace('information_schema.COLUMNS', "(SELECT 'main' AS TABLE_SCHEMA, m.name AS TABLE_NAME, p.name AS COLUMN_NAME FROM sqlite_master AS m, pragma_table_info(m.name) AS p WHERE m.type = 'table')")
+		sql = sql.replace('DATABASE()', "'main'")
+
+		return sql
+
+	def execute(self, sql, parameters=None):
+		"""Execute one query."""
+
+		self.sqliteCursor.execute(self.translate(sql), tuple(parameters or ()))
+		self.description = self.sqliteCursor.description
+
+		return self.sqliteCursor.rowcount
+
+	def executemany(self, sql, parameters):
+		"""Execute one query for each set of `parameters`."""
+
+		self.sqliteCursor.executemany(self.translate(sql), [tuple(row) if isinstance(row, (list, tuple)) else (row,) for row in parameters])
+
+	def fetchone(self):
+		"""Returns the next row."""
+
+		return self.sqliteCursor.fetchone()
+
+	def fetchmany(self, size):
+		"""Returns the next `size` rows."""
+
+		return self.sqliteCursor.fetchmany(size)
+
+	def fetchall(self):
+		"""Returns every remaining row."""
+
+		return self.sqliteCursor.fetchall()
+
+	def __iter__(self):
+		"""Iterate over every remaining row."""
+
+		return iter(self.sqliteCursor.fetchall())
+
+	def close(self):
+		"""Close the cursor."""
+
+		self.sqliteCursor.close()
+
+class StandInConnection(object):
+	"""A pymysql-like connection to a generated SQLite catalog, standing in for a real Magento database."""
+
+	def __init__(self, databasePath):
+		"""Open the catalog at `databasePath`."""
+
+		# (the server's connection pool passes it from thread to thread)
+		self.sqliteConn = sqlite3.connect(databasePath, check_same_thread=False)
+
+		for name, function, argumentCount in [('CRC32', sqlCrc32, 1), ('CONCAT_WS', sqlConcatWs, -1), ('FIELD', sqlField, -1), ('ELT', sqlElt, -1), ('FIND_IN_SET', sqlFindInSet, 2)]:
+			self.sqliteConn.create_function(name, argumentCount, function)
+
+	def cursor(self, cursorClass=None):
+		"""Returns a new cursor (every cursor is as "unbuffered" as SQLite's are, whatever the `cursorClass`)."""
+
+		return StandInCursor(self.sqliteConn)
+
+	def ping(self, reconnect=True):
+		"""Check that the connection is still alive (which a local file always is)."""
+
+		return True
+
+	def commit(self):
+		"""Commit the current transaction."""
+
+		self.sqliteConn.commit()
+
+	def close(self):
+		"""Close the connection."""
+
+		self.sqliteConn.close()
+
+def randomText(generator, meanLength, maxLength=None):
+	"""Returns some words adding up to (roughly) a log-normally distributed length around `meanLength`."""
+
+	length = max(1, int(generator.lognormvariate(0, 0.5) * meanLength))
+	if maxLength:
+		length = min(length, maxLength)
+
+	text = ''
+	while len(text) < length:
+		text += generator.choice(words) + ' '
+
+	return text[:length].strip() or generator.choice(words)
+
+def randomValue(generator, backendType, valueLength):
+	"""Returns a random value for an Attribute of `backendType`."""
+
+	if backendType == 'varchar':
+		return randomText(generator, valueLength, 255)
+	if backendType == 'text':
+		return randomText(generator, valueLength * 10)
+	if backendType == 'int':
+		return generator.randint(1, 20)
+	if backendType == 'decimal':
+		return round(generator.uniform(0, 500), 4)
+
+	return str(datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds=generator.randint(0, 157680000)))
+
+def randomAttributeValue(generator, code, backendType, valueLength):
+	"""Returns a random value for the Attribute with the `attribute_code` `code` (see `randomValue()`)."""
+
+	if code == 'status':
+		return generator.choice(statusValues)
+
+	return randomValue(generator, backendType, valueLength)
+
+def websiteOfStore(storeId):
+	"""Returns the `website_id` of the store view `storeId` (every two store views sharing a website)."""
+
+	return (storeId + 1) // 2
+
+def generate(databasePath, entities=10000, attributes=50, stores=3, valueLength=20, density=0.8, overrides=0.1, seed=1, flat=True):
+	"""
+	Generate a Magento-like EAV catalog of products into the (new) SQLite database at `databasePath`.
+
+	There are `entities` products with `attributes` Attributes (split across the backend types by `backendTypeShares`),...
+	...each having a store 0 value for a `density` share of the products, and a store view override in each of `stores`...
+	...store views for an `overrides` share of those. String values have a log-normally distributed length around...
+	...`valueLength` (ten times that for `text`). The same `seed` always generates the same catalog. If `flat` is set,...
+	...then each store view also gets an (up to date) flat table of the effective values of the `flatAttributes`,...
+	...holding the products that are assigned to its website and enabled in it (like Magento's flat indexer).
+	"""
+
+	generator = random.Random(seed)
+	sqliteConn = sqlite3.connect(databasePath)
+
+	sqliteConn.executescript("""
+		CREATE TABLE eav_entity_type (
+			entity_type_id INTEGER PRIMARY KEY,
+			entity_type_code TEXT NOT NULL
+		);
+		CREATE TABLE eav_attribute (
+			attribute_id INTEGER PRIMARY KEY,
+			entity_type_id INTEGER NOT NULL,
+			attribute_code TEXT NOT NULL,
+			backend_type TEXT NOT NULL,
+			frontend_input TEXT,
+			source_model TEXT,
+			backend_model TEXT,
+			is_required INTEGER NOT NULL DEFAULT 0
+		);
+		CREATE INDEX eav_attribute_entity_type ON eav_attribute (entity_type_id, attribute_code);
+		CREATE TABLE catalog_product_entity (
+			entity_id INTEGER PRIMARY KEY,
+			entity_type_id INTEGER NOT NULL,
+			sku TEXT,
+			created_at TEXT,
+			updated_at TEXT
+		);
+		CREATE INDEX catalog_product_entity_sku ON catalog_product_entity (sku);
+		CREATE TABLE core_store (
+			store_id INTEGER PRIMARY KEY,
+			code TEXT NOT NULL UNIQUE,
+			website_id INTEGER NOT NULL,
+			name TEXT NOT NULL
+		);
+		CREATE TABLE catalog_product_website (
+			product_id INTEGER NOT NULL,
+			website_id INTEGER NOT NULL,
+			PRIMARY KEY (product_id, website_id)
+		);
+		CREATE TABLE eav_attribute_option (
+			option_id INTEGER PRIMARY KEY,
+			attribute_id INTEGER NOT NULL,
+			sort_order INTEGER NOT NULL DEFAULT 0
+		);
+		CREATE INDEX eav_attribute_option_attribute ON eav_attribute_option (attribute_id);
+		CREATE TABLE eav_attribute_option_value (
+			value_id INTEGER PRIMARY KEY,
+			option_id INTEGER NOT NULL,
+			store_id INTEGER NOT NULL,
+			value TEXT
+		);
+		CREATE INDEX eav_attribute_option_value_option ON eav_attribute_option_value (option_id, store_id);
+		CREATE TABLE index_process (
+			process_id INTEGER PRIMARY KEY,
+			indexer_code TEXT NOT NULL UNIQUE,
+			status TEXT NOT NULL DEFAULT 'pending'
+		);
+	""")
+
+	for backendType, share in backendTypeShares:
+		sqliteConn.executescript("""
+			CREATE TABLE catalog_product_entity_%(type)s (
+				value_id INTEGER PRIMARY KEY,
+				entity_type_id INTEGER NOT NULL,
+				attribute_id INTEGER NOT NULL,
+				store_id INTEGER NOT NULL,
+				entity_id INTEGER NOT NULL,
+				value %(valueType)s
+			);
+			CREATE UNIQUE INDEX catalog_product_entity_%(type)s_unique ON catalog_product_entity_%(type)s (entity_id, attribute_id, store_id);
+			CREATE INDEX catalog_product_entity_%(type)s_attribute ON catalog_product_entity_%(type)s (attribute_id);
+			CREATE INDEX catalog_product_entity_%(type)s_store ON catalog_product_entity_%(type)s (store_id);
+		""" % {'type': backendType, 'valueType': valueColumnTypes[backendType]})
+
+	sqliteConn.execute("INSERT INTO eav_entity_type (entity_type_id, entity_type_code) VALUES (4, 'catalog_product')")
+	sqliteConn.executemany(
+		'INSERT INTO core_store (store_id, code, website_id, name) VALUES (?, ?, ?, ?)',
+		[(0, 'admin', 0, 'Admin')] + [(storeId, 'store_%s' % storeId, websiteOfStore(storeId), 'Store View %s' % storeId) for storeId in range(1, stores + 1)]
+	)
+
+	# The well-known Attributes come first, followed by numbered filler ones up to the requested count (plus `sku`)
+	attributeDefinitions = list(wellKnownAttributes)
+	for index in range(len(attributeDefinitions), attributes):
+		pick = generator.random()
+		for backendType, share in backendTypeShares:
+			pick -= share
+			if pick <= 0:
+				break
+
+		attributeDefinitions.append(('attribute_%s_%s' % (index, backendType), backendType, 'text'))
+
+	attributeDefinitions = attributeDefinitions[:attributes]
+
+	sqliteConn.execute("INSERT INTO eav_attribute (attribute_id, entity_type_id, attribute_code, backend_type, frontend_input, is_required) VALUES (1, 4, 'sku', 'static', 'text', 1)")
+	sqliteConn.executemany(
+		'INSERT INTO eav_attribute (attribute_id, entity_type_id, attribute_code, backend_type, frontend_input, is_required) VALUES (?, 4, ?, ?, ?, ?)',
+		[(index + 2, code, backendType, frontendInput, 1 if code in ['name', 'status', 'price'] else 0) for index, (code, backendType, frontendInput) in enumerate(attributeDefinitions)]
+	)
+
+	# The `color` options, labelled in the admin store, with the first store view (if any) translating them
+	attributeCodes = [code for code, backendType, frontendInput in attributeDefinitions]
+	if 'color' in attributeCodes:
+		colorAttributeId = attributeCodes.index('color') + 2
+		sqliteConn.executemany(
+			'INSERT INTO eav_attribute_option (option_id, attribute_id, sort_order) VALUES (?, ?, ?)',
+			[(index + 1, colorAttributeId, index) for index in range(len(colorLabels))]
+		)
+		sqliteConn.executemany(
+			'INSERT INTO eav_attribute_option_value (option_id, store_id, value) VALUES (?, ?, ?)',
+			[(index + 1, 0, label) for index, label in enumerate(colorLabels)] +
+			([(index + 1, 1, label + ' (store_1)') for index, label in enumerate(colorLabels)] if stores else [])
+		)
+
+	for start in range(1, entities + 1, 1000):
+		entityIds = range(start, min(start + 1000, entities + 1))
+		sqliteConn.executemany(
+			'INSERT INTO catalog_product_entity (entity_id, entity_type_id, sku, created_at, updated_at) VALUES (?, 4, ?, ?, ?)',
+			[(entityId, 'SKU-%08d' % entityId, '2020-01-01 00:00:00', randomValue(generator, 'datetime', 0)) for entityId in entityIds]
+		)
+
+		valueRows = dict([(backendType, []) for backendType, share in backendTypeShares])
+		websiteRows = []
+		for entityId in entityIds:
+			for websiteId in range(1, websiteOfStore(stores) + 1):
+				if generator.random() < websiteDensity:
+					websiteRows.append((entityId, websiteId))
+
+			for index, (code, backendType, frontendInput) in enumerate(attributeDefinitions):
+				if generator.random() > density:
+					continue
+
+				valueRows[backendType].append((index + 2, 0, entityId, randomAttributeValue(generator, code, backendType, valueLength)))
+
+				for storeId in range(1, stores + 1):
+					if generator.random() < overrides:
+						valueRows[backendType].append((index + 2, storeId, entityId, randomAttributeValue(generator, code, backendType, valueLength)))
+
+		sqliteConn.executemany('INSERT INTO catalog_product_website (product_id, website_id) VALUES (?, ?)', websiteRows)
+
+		for backendType, rows in valueRows.items():
+			sqliteConn.executemany(
+				'INSERT INTO catalog_product_entity_%s (entity_type_id, attribute_id, store_id, entity_id, value) VALUES (4, ?, ?, ?, ?)' % (backendType,),
+				rows
+			)
+
+	if flat:
+		generateFlatTables(sqliteConn, attributeDefinitions, stores)
+
+	sqliteConn.commit()
+	sqliteConn.close()
+
+	return [('sku', 'static')] + [(code, backendType) for code, backendType, frontendInput in attributeDefinitions]
+
+def generateFlatTables(sqliteConn, attributeDefinitions, stores):
+	"""Build the flat table of each of `stores` store views from the generated values, and mark that index up to date."""
+
+	flatDefinitions = [(index + 2, code, backendType) for index, (code, backendType, frontendInput) in enumerate(attributeDefinitions) if code in flatAttributes]
+	statusAttributeIds = [attributeId for attributeId, code, backendType in flatDefinitions if code == 'status']
+
+	for storeId in range(1, stores + 1):
+		sqliteConn.execute('CREATE TABLE catalog_product_flat_%s (entity_id INTEGER PRIMARY KEY, sku TEXT%s)' % (
+			storeId, ''.join([', `%s` %s' % (code, valueColumnTypes[backendType]) for attributeId, code, backendType in flatDefinitions])
+		))
+
+		# The store view's own value where it has one, else the default one
+		effectiveValue = '(SELECT v.value FROM catalog_product_entity_%s AS v WHERE v.entity_id = ce.entity_id AND v.attribute_id = %s AND v.store_id IN (0, %s) ORDER BY v.store_id DESC LIMIT 1)'
+
+		# (only for the products of the store view's website that are enabled in it)
+		sqliteConn.execute('INSERT INTO catalog_product_flat_%s SELECT ce.entity_id, ce.sku%s FROM catalog_product_entity AS ce INNER JOIN catalog_product_website AS cw ON cw.product_id = ce.entity_id AND cw.website_id = %s%s' % (
+			storeId, ''.join([',\n\t\t\t\t' + effectiveValue % (backendType, attributeId, storeId) for attributeId, code, backendType in flatDefinitions]),
+			websiteOfStore(storeId), ''.join([' WHERE ' + effectiveValue % ('int', attributeId, storeId) + ' = 1' for attributeId in statusAttributeIds])
+		))
+
+		for attributeId, code, backendType in flatDefinitions:
+			sqliteConn.execute('CREATE INDEX catalog_product_flat_%s_%s ON catalog_product_flat_%s (`%s`)' % (storeId, code, storeId, code))
+
+	sqliteConn.execute("INSERT INTO index_process (indexer_code, status) VALUES ('catalog_product_flat', 'pending')")
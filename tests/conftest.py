@@ -0,0 +1,107 @@
+import os
+import csv
+import sys
+import shutil
+import sqlite3
+import pytest
+
+# The modules live in the repository root, next to "Magento-Attribute-Searcher.py" (rather than in a package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql
+import output
+import benchmark
+import syntheticeav
+
+# How big the generated catalog that every test searches is
+catalogEntities = 500
+catalogAttributes = 30
+
+@pytest.fixture(scope='session')
+def searcherModule():
+	"""The "Magento-Attribute-Searcher.py" script, loaded as a module."""
+
+	return benchmark.loadSearcherModule()
+
+@pytest.fixture(scope='session')
+def catalogTemplate(tmp_path_factory):
+	"""A generated catalog, which each test gets a copy of (see `catalog`)."""
+
+	catalogPath = str(tmp_path_factory.mktemp('template') / 'catalog.sqlite')
+	syntheticeav.generate(catalogPath, catalogEntities, catalogAttributes)
+
+	return catalogPath
+
+@pytest.fixture
+def catalog(catalogTemplate, tmp_path, monkeypatch):
+	"""
+	Run the test in a directory of its own, with a "db.yaml" whose connection opens a copy of the generated catalog.
+
+	Returns the path of that copy. Every `db` named in "db.yaml" is opened as "<db>.sqlite" in the test's directory.
+	"""
+
+	catalogPath = str(tmp_path / 'catalog.sqlite')
+	shutil.copy(catalogTemplate, catalogPath)
+
+	monkeypatch.chdir(tmp_path)
+	monkeypatch.setattr(pymysql, 'connect', lambda host, port, user, passwd, db: syntheticeav.StandInConnection(str(tmp_path / (db + '.sqlite'))))
+	writeDbConfig(['catalog'])
+
+	return catalogPath
+
+def writeDbConfig(databases):
+	"""Write a "db.yaml" naming one instance after each of `databases` (or a lone connection, if there is only one)."""
+
+	with open('db.yaml', 'w') as dbConfigFile:
+		if len(databases) == 1:
+			dbConfigFile.write('host: localhost\nport: 3306\nuser: test\npasswd: test\ndb: ' + databases[0] + '\n')
+			return
+
+		dbConfigFile.write('instances:\n')
+		for database in databases:
+			dbConfigFile.write('  - name: ' + database + '\n    host: localhost\n    port: 3306\n    user: test\n    passwd: test\n    db: ' + database + '\n')
+
+def readCsv(outputPath):
+	"""Returns the header and rows of the CSV file at `outputPath` (skipping the blank line that a buffered search ends with)."""
+
+	with open(outputPath, newline='') as outputFile:
+		lines = [line for line in csv.reader(outputFile) if line]
+
+	return (lines[0], lines[1:]) if lines else ([], [])
+
+def queryCatalog(catalogPath, sql, parameters=()):
+	"""Returns every row of `sql`, run against the generated catalog at `catalogPath` directly."""
+
+	sqliteConn = sqlite3.connect(catalogPath)
+	try:
+		return sqliteConn.execute(sql, parameters).fetchall()
+	finally:
+		sqliteConn.close()
+
+def getAttributeId(catalogPath, attributeCode):
+	"""Returns the `attribute_id` of `attributeCode` in the generated catalog at `catalogPath`."""
+
+	return queryCatalog(catalogPath, 'SELECT attribute_id FROM eav_attribute WHERE attribute_code = ?', (attributeCode,))[0][0]
+
+@pytest.fixture
+def runSearch(searcherModule, catalog, tmp_path):
+	"""
+	Returns a function that runs a search on the catalog (as `-z 1` would) and returns the header and rows it output.
+
+	It takes the `attribute`, `comparison` and `value`, and any other arguments of `MagentoAttributeSearcher`. The Nth...
+	...search of a test is written to "search-N.<format>" in the test's directory. Only the output of the plain line...
+	...formats is read back (`None` being returned for the compressed and columnar ones).
+	"""
+
+	searches = []
+
+	def runSearch(attribute, comparison, value, outputFormat='csv', **options):
+		outputPath = str(tmp_path / ('search-%s.%s' % (len(searches), outputFormat)))
+		searches.append(outputPath)
+
+		searcher = searcherModule.MagentoAttributeSearcher('product', attribute, comparison, value, outputFormat, outputPath, True, **options)
+		searcher.search()
+
+		return readCsv(outputPath) if outputFormat in output.lineFormats else None
+
+	return runSearch
@@ -0,0 +1,34 @@
+from collections import Counter
+from conftest import queryCatalog, getAttributeId
+
+def testCountsTheRowsOfASearch(runSearch):
+	header, rows = runSearch('name', 'LIKE', '%red%')
+	countHeader, countRows = runSearch('name', 'LIKE', '%red%', aggregate=[])
+
+	assert countHeader == ['Rows', 'Products']
+	assert countRows == [[str(len(rows)), str(len(set([row[0] for row in rows])))]]
+
+def testCountsTheRowsOfEachValue(runSearch):
+	header, rows = runSearch('color', '<', '6')
+	countHeader, countRows = runSearch('color', '<', '6', aggregate=['value'])
+
+	assert countHeader == ['Value', 'Rows', 'Products']
+	assert dict([(value, int(total)) for value, total, products in countRows]) == Counter([row[1] for row in rows])
+	assert [int(total) for value, total, products in countRows] == sorted([int(total) for value, total, products in countRows], reverse=True)
+
+def testKeepsTheTopGroups(runSearch):
+	allRows = runSearch('color', '<', '6', aggregate=['value'])[1]
+	topRows = runSearch('color', '<', '6', aggregate=['value'], top=2)[1]
+
+	assert topRows == allRows[:2]
+
+def testCountsTheEntitiesWithAnEmptyValue(runSearch, catalog):
+	countRows = runSearch('description', 'EMPTY', '', aggregate=[])[1]
+
+	expected = queryCatalog(catalog,
+		"SELECT COUNT(*) FROM catalog_product_entity AS ce LEFT JOIN catalog_product_entity_text AS cev ON cev.entity_id = ce.entity_id AND cev.attribute_id = ? AND cev.store_id = 0 WHERE cev.value_id IS NULL OR cev.value IS NULL OR cev.value = ''",
+		(getAttributeId(catalog, 'description'),)
+	)[0][0]
+
+	assert expected > 0
+	assert int(countRows[0][0]) == expected
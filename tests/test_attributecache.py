@@ -0,0 +1,62 @@
+import sqlite3
+import attributecache
+import syntheticeav
+
+class CountingCursor(syntheticeav.StandInCursor):
+	"""A stand-in cursor that counts the queries reading whole `eav_attribute` rows (rather than their fingerprint)."""
+
+	def __init__(self, sqliteConn):
+		super().__init__(sqliteConn)
+		self.reads = 0
+
+	def execute(self, sql, parameters=None):
+		if 'ea.attribute_code' in sql and 'COUNT(*)' not in sql:
+			self.reads += 1
+
+		return super().execute(sql, parameters)
+
+def openCache(catalog):
+	"""Returns a fresh Attribute cache next to the catalog, and a counting cursor on the catalog."""
+
+	dbConn = syntheticeav.StandInConnection(catalog)
+
+	return (attributecache.AttributeCache('attribute-cache.sqlite', 'test'), CountingCursor(dbConn.sqliteConn))
+
+def testReadsTheAttributesOnceWhileTheirFingerprintHolds(catalog):
+	cache, dbCursor = openCache(catalog)
+	cache.refresh(dbCursor, 'catalog_product')
+
+	assert dbCursor.reads == 1
+	assert cache.getAttribute('catalog_product', 'price')['backend_type'] == 'decimal'
+	assert cache.getAttribute('catalog_product', 'no_such_attribute') is None
+
+	cache.expire()
+	cache.refresh(dbCursor, 'catalog_product')
+	cache.close()
+
+	reopened, dbCursor = openCache(catalog)
+	reopened.refresh(dbCursor, 'catalog_product')
+
+	assert dbCursor.reads == 0
+	assert len(reopened.listAttributes('catalog_product')) == len(dbCursor.sqliteCursor.execute('SELECT * FROM eav_attribute').fetchall())
+
+def testReadsTheAttributesAgainOnceTheyChange(catalog):
+	cache, dbCursor = openCache(catalog)
+	cache.refresh(dbCursor, 'catalog_product')
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute("UPDATE eav_attribute SET backend_type = 'varchar' WHERE attribute_code = 'price'")
+		sqliteConn.execute("INSERT INTO eav_attribute (entity_type_id, attribute_code, backend_type, frontend_input, is_required) VALUES (4, 'manufacturer', 'int', 'select', 0)")
+	sqliteConn.close()
+
+	# (not until it is checked again)
+	cache.refresh(dbCursor, 'catalog_product')
+	assert cache.getAttribute('catalog_product', 'manufacturer') is None
+
+	cache.expire()
+	cache.refresh(dbCursor, 'catalog_product')
+
+	assert dbCursor.reads == 2
+	assert cache.getAttribute('catalog_product', 'price')['backend_type'] == 'varchar'
+	assert cache.getAttribute('catalog_product', 'manufacturer')['frontend_input'] == 'select'
@@ -0,0 +1,71 @@
+import json
+import pytest
+from conftest import readCsv
+
+defaults = dict(scope='product', attribute=None, comparison='LIKE', value='', values=None, format='csv', output='stdout')
+
+def runBatch(searcherModule, searches):
+	"""Run the `searches` (specs, as in a batch file) as one batch."""
+
+	with open('batch.jsonl', 'w') as batchFile:
+		batchFile.write(''.join([json.dumps(search) + '\n' for search in searches]))
+
+	batch = searcherModule.MagentoAttributeBatch('batch.jsonl', defaults)
+	batch.run()
+
+def testAnswersSearchesOnTheSameTableWithOneScan(searcherModule, runSearch, capsys):
+	runBatch(searcherModule, [
+		dict(attribute='name', value='%red%', output='name.csv'),
+		dict(attribute='attribute_7_varchar', value='%blue%', output='other.csv'),
+		dict(attribute='price', comparison='<', value='50', output='price.csv'),
+	])
+
+	assert capsys.readouterr().out.count('Scanning ') == 2
+
+	for attribute, comparison, value, outputPath in [('name', 'LIKE', '%red%', 'name.csv'), ('attribute_7_varchar', 'LIKE', '%blue%', 'other.csv'), ('price', '<', '50', 'price.csv')]:
+		header, rows = runSearch(attribute, comparison, value)
+
+		assert readCsv(outputPath) == (header, rows)
+		assert rows
+
+def testSharesAnOutputBetweenSearches(searcherModule, runSearch):
+	runBatch(searcherModule, [
+		dict(attribute='name', value='%red%', output='both.csv'),
+		dict(attribute='price', comparison='<', value='50', output='both.csv'),
+	])
+
+	header, rows = readCsv('both.csv')
+	nameHeader, nameRows = runSearch('name', 'LIKE', '%red%')
+	priceHeader, priceRows = runSearch('price', '<', '50')
+
+	assert header == nameHeader
+	assert sorted(rows) == sorted(nameRows + priceRows)
+
+def testFindsEmptyValuesOnTheirOwn(searcherModule, runSearch, capsys):
+	runBatch(searcherModule, [
+		dict(attribute='name', value='%red%', output='name.csv'),
+		dict(attribute='description', comparison='EMPTY', output='empty.csv'),
+	])
+
+	header, rows = runSearch('description', 'EMPTY', '')
+
+	assert readCsv('empty.csv') == (header, rows)
+	assert rows
+
+def testRejectsSharingAnOutputBetweenFormats(searcherModule, catalog, capsys):
+	with pytest.raises(SystemExit):
+		runBatch(searcherModule, [
+			dict(attribute='name', value='%red%', output='both.csv'),
+			dict(attribute='price', comparison='<', value='50', format='text', output='both.csv'),
+		])
+
+	assert 'must all use the same format' in capsys.readouterr().out
+
+def testRejectsSharingAFileWithASearchRunningOnItsOwn(searcherModule, catalog, capsys):
+	with pytest.raises(SystemExit):
+		runBatch(searcherModule, [
+			dict(attribute='name', value='%red%', output='both.csv'),
+			dict(attribute='sku', value='SKU-0000001%', output='both.csv'),
+		])
+
+	assert 'needs an output of its own' in capsys.readouterr().out
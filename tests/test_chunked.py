@@ -0,0 +1,59 @@
+import os
+import json
+import pytest
+import syntheticeav
+from conftest import readCsv
+
+class Interrupted(Exception):
+	"""Stands in for the search being killed part of the way through."""
+
+def interruptAtCommit(monkeypatch, commits):
+	"""Have the `commits`th commit of the stand-in connection (the end of a chunk) interrupt the search (and no other)."""
+
+	committed = []
+	commit = syntheticeav.StandInConnection.commit
+
+	def interruptingCommit(self):
+		committed.append(True)
+		if len(committed) == commits:
+			raise Interrupted()
+
+		commit(self)
+
+	monkeypatch.setattr(syntheticeav.StandInConnection, 'commit', interruptingCommit)
+
+def testFindsTheSameRowsChunkByChunk(runSearch, capsys):
+	whole = runSearch('price', '<', '100')
+	chunked = runSearch('price', '<', '100', chunkSize=64)
+
+	assert chunked == whole
+	assert capsys.readouterr().out.count('Closing connection') == 2
+
+def testResumesAnInterruptedSearchFromItsCheckpoint(searcherModule, runSearch, monkeypatch, capsys):
+	whole = runSearch('price', '<', '100')
+
+	interruptAtCommit(monkeypatch, 3)
+	with pytest.raises(Interrupted):
+		runSearch('price', '<', '100', chunkSize=64, checkpointFile='checkpoint.json')
+
+	with open('checkpoint.json') as checkpointFile:
+		assert json.load(checkpointFile)['last_entity_id'] == 128
+
+	# (the same search, down to its output)
+	searcher = searcherModule.MagentoAttributeSearcher('product', 'price', '<', '100', 'csv', os.path.abspath('search-1.csv'), True, chunkSize=64, checkpointFile='checkpoint.json')
+	searcher.search()
+
+	assert 'Resuming after entity 128...' in capsys.readouterr().out
+	assert readCsv('search-1.csv') == whole
+	assert not os.path.isfile('checkpoint.json')
+
+def testStartsOverFromTheCheckpointOfADifferentSearch(searcherModule, runSearch, monkeypatch, capsys):
+	interruptAtCommit(monkeypatch, 2)
+	with pytest.raises(Interrupted):
+		runSearch('price', '<', '100', chunkSize=64, checkpointFile='checkpoint.json')
+
+	# (the same output, but in another format)
+	searcher = searcherModule.MagentoAttributeSearcher('product', 'price', '<', '100', 'text', os.path.abspath('search-0.csv'), True, chunkSize=64, checkpointFile='checkpoint.json')
+	searcher.search()
+
+	assert 'is for a different search. Starting over.' in capsys.readouterr().out
@@ -0,0 +1,79 @@
+import shutil
+import sqlite3
+import pytest
+from conftest import writeDbConfig, readCsv, queryCatalog, getAttributeId
+
+def listNames(catalogPath):
+	"""Returns the `name` values of the catalog at `catalogPath`, as `{(sku, store_id): value}`."""
+
+	return dict([((sku, storeId), value) for sku, storeId, value in queryCatalog(catalogPath,
+		'SELECT ce.sku, cev.store_id, cev.value FROM catalog_product_entity_varchar AS cev INNER JOIN catalog_product_entity AS ce ON ce.entity_id = cev.entity_id WHERE cev.attribute_id = ?',
+		(getAttributeId(catalogPath, 'name'),)
+	)])
+
+@pytest.fixture
+def instances(catalog):
+	"""Two instances ("staging" and "production") of the catalog, where production has had a few `name` values changed."""
+
+	for instance in ['staging', 'production']:
+		shutil.copy(catalog, instance + '.sqlite')
+
+	nameId = getAttributeId(catalog, 'name')
+	defaultNames = [entityId for entityId, in queryCatalog(catalog, 'SELECT entity_id FROM catalog_product_entity_varchar WHERE attribute_id = ? AND store_id = 0 ORDER BY entity_id LIMIT 2', (nameId,))]
+	unnamed = queryCatalog(catalog, 'SELECT MIN(entity_id) FROM catalog_product_entity WHERE entity_id NOT IN (SELECT entity_id FROM catalog_product_entity_varchar WHERE attribute_id = ? AND store_id = 2)', (nameId,))[0][0]
+
+	sqliteConn = sqlite3.connect('production.sqlite')
+	with sqliteConn:
+		sqliteConn.execute("UPDATE catalog_product_entity_varchar SET value = 'renamed' WHERE entity_id = ? AND store_id = 0 AND attribute_id = ?", (defaultNames[0], nameId))
+		sqliteConn.execute('DELETE FROM catalog_product_entity_varchar WHERE entity_id = ? AND store_id = 0 AND attribute_id = ?', (defaultNames[1], nameId))
+		sqliteConn.execute("INSERT INTO catalog_product_entity_varchar (entity_type_id, attribute_id, store_id, entity_id, value) VALUES (4, ?, 2, ?, 'only in production')", (nameId, unnamed))
+	sqliteConn.close()
+
+	writeDbConfig(['staging', 'production'])
+
+	return ['staging', 'production']
+
+def testFindsEveryDifferenceBetweenTwoInstances(searcherModule, instances, capsys):
+	staging = listNames('staging.sqlite')
+	production = listNames('production.sqlite')
+
+	diff = searcherModule.MagentoAttributeDiff(instances, 'product', 'name, price', 'csv', 'diff.csv')
+	diff.run()
+
+	header, rows = readCsv('diff.csv')
+
+	expected = sorted([[
+		'missing' if key not in production else 'extra' if key not in staging else 'changed', key[0], 'name', str(key[1]), staging.get(key, ''), production.get(key, '')
+	] for key in set(staging) | set(production) if staging.get(key) != production.get(key)], key=lambda row: (row[1], int(row[3])))
+
+	assert header == ['Difference', 'SKU', 'Attribute', 'Store', 'staging', 'production']
+	assert rows == expected
+	assert sorted([row[0] for row in rows]) == ['changed', 'extra', 'missing']
+	assert '"price": 0 missing from "production", 0 extra, 0 changed' in capsys.readouterr().err
+
+def testWalksTwoOrderedStreamsSideBySide(searcherModule, instances):
+	diff = searcherModule.MagentoAttributeDiff(instances, 'product', 'name', 'csv', 'diff.csv')
+
+	left = [('A', 0, 'x'), ('B', 0, 'y'), ('B', 1, 'z'), ('D', 0, 'w')]
+	right = [('A', 0, 'x'), ('B', 1, 'Z'), ('C', 0, 'v'), ('D', 0, 'w'), ('E', 0, 'u')]
+
+	assert list(diff.mergeJoin(iter(left), iter(right))) == [
+		('same', ('A', 0), 'x', 'x'),
+		('missing', ('B', 0), 'y', None),
+		('changed', ('B', 1), 'z', 'Z'),
+		('extra', ('C', 0), None, 'v'),
+		('same', ('D', 0), 'w', 'w'),
+		('extra', ('E', 0), None, 'u'),
+	]
+
+	for connection in diff.connections:
+		connection.closeDb()
+
+def testRefusesRowsOutOfOrder(searcherModule, instances):
+	diff = searcherModule.MagentoAttributeDiff(instances, 'product', 'name', 'csv', 'diff.csv')
+
+	with pytest.raises(ValueError):
+		list(diff.checkOrder(iter([('B', 0, 'x'), ('A', 0, 'y')]), 'staging'))
+
+	for connection in diff.connections:
+		connection.closeDb()
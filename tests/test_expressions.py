@@ -0,0 +1,67 @@
+import array
+import pytest
+import expressions
+from conftest import catalogEntities, readCsv, queryCatalog, getAttributeId
+
+def testParsesAQueryIntoATree():
+	tree = expressions.ExpressionParser("status = 1 AND visibility NOT IN (2, '4') OR name LIKE \"%red%\" AND description IS NULL").tree
+
+	assert tree == ('or', [
+		('and', [('condition', 'status', '=', '1'), ('not', ('condition', 'visibility', 'IN', ['2', '4']))]),
+		('and', [('condition', 'name', 'LIKE', '%red%'), ('not', ('condition', 'description', 'IS NOT', None))]),
+	])
+
+@pytest.mark.parametrize('query', ['', 'status =', 'status = 1 AND', 'status NOT = 1', '(status = 1', 'status = 1)'])
+def testRejectsMalformedQueries(query):
+	with pytest.raises(ValueError):
+		expressions.ExpressionParser(query)
+
+def testCombinesSortedArrays():
+	left = array.array('I', [1, 3, 5, 7])
+	right = array.array('I', [2, 3, 7, 9])
+
+	assert expressions.unionSorted(left, right).tolist() == [1, 2, 3, 5, 7, 9]
+	assert expressions.differenceSorted(left, right).tolist() == [1, 5]
+	assert expressions.differenceSorted(right, array.array('I')).tolist() == [2, 3, 7, 9]
+
+def testOnlyFetchesEveryEntityWhenItHasTo():
+	conditionIds = dict(a=[1, 2, 3, 4], b=[2, 4], c=[3])
+	fetchedAll = []
+
+	def fetchAllIds():
+		fetchedAll.append(True)
+		return array.array('I', range(1, 6))
+
+	evaluator = expressions.ExpressionEvaluator(lambda condition: array.array('I', conditionIds[condition[1]]), fetchAllIds)
+
+	assert evaluator.evaluate(expressions.ExpressionParser('a = 1 AND NOT b = 1').tree).tolist() == [1, 3]
+	assert not fetchedAll
+
+	assert evaluator.evaluate(expressions.ExpressionParser('NOT a = 1 OR c = 1').tree).tolist() == [3, 5]
+	assert fetchedAll
+
+def findEntities(catalog, attributeCode, backendType, test, parameters=()):
+	"""Returns the set of `entity_id`s with a value (in any store) of the Attribute for which `test` holds, straight from the catalog."""
+
+	return set([row[0] for row in queryCatalog(catalog,
+		'SELECT entity_id FROM catalog_product_entity_%s WHERE attribute_id = ? AND value %s' % (backendType, test),
+		[getAttributeId(catalog, attributeCode)] + list(parameters)
+	)])
+
+def testFindsTheEntitiesMatchingAQuery(searcherModule, catalog):
+	query = searcherModule.MagentoAttributeQuery('product', "status = 1 AND color IN (3, 5) AND NOT price < 50 OR name LIKE '%red lamp%'", 'csv', 'query.csv')
+	query.run()
+
+	expected = (findEntities(catalog, 'status', 'int', '= 1') & findEntities(catalog, 'color', 'int', 'IN (3, 5)') - findEntities(catalog, 'price', 'decimal', '< 50')) | findEntities(catalog, 'name', 'varchar', "LIKE '%red lamp%'")
+	skus = [row[0] for row in queryCatalog(catalog, 'SELECT sku FROM catalog_product_entity WHERE entity_id IN (' + ', '.join([str(entityId) for entityId in expected]) + ') ORDER BY entity_id')]
+
+	assert readCsv('query.csv') == (['SKU'], [[sku] for sku in skus])
+	assert skus
+
+def testCountsTheEntitiesMatchingAQuery(searcherModule, catalog):
+	query = searcherModule.MagentoAttributeQuery('product', 'description IS NULL', 'csv', 'query.csv', count=True)
+	query.run()
+
+	expected = catalogEntities - len(findEntities(catalog, 'description', 'text', "IS NOT NULL AND value != ''"))
+
+	assert readCsv('query.csv') == (['Products'], [[str(expected)]])
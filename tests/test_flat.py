@@ -0,0 +1,56 @@
+import sqlite3
+import pytest
+from conftest import queryCatalog, getAttributeId
+
+def listHeldProducts(catalog):
+	"""Returns the `(sku, store code)` of every product that a store view holds (assigned to its website, and enabled in it)."""
+
+	statusId = getAttributeId(catalog, 'status')
+
+	return set(queryCatalog(catalog,
+		"""SELECT ce.sku, cs.code
+		FROM catalog_product_entity AS ce
+		INNER JOIN core_store AS cs ON cs.store_id != 0
+		INNER JOIN catalog_product_website AS cw ON cw.product_id = ce.entity_id AND cw.website_id = cs.website_id
+		WHERE COALESCE(
+			(SELECT value FROM catalog_product_entity_int WHERE entity_id = ce.entity_id AND attribute_id = ? AND store_id = cs.store_id),
+			(SELECT value FROM catalog_product_entity_int WHERE entity_id = ce.entity_id AND attribute_id = ? AND store_id = 0)
+		) = 1""",
+		(statusId, statusId)
+	))
+
+@pytest.mark.parametrize('attribute, comparison, value, store', [('name', 'LIKE', '%red%', 'all'), ('price', '<', '100', 'all'), ('color', '=', '3', 'store_2'), ('visibility', '!=', '1', 'store_1')])
+def testFindsTheSameRowsAsTheEavTablesAmongTheProductsHeld(runSearch, catalog, capsys, attribute, comparison, value, store):
+	fromFlat = runSearch(attribute, comparison, value, store=store)
+	assert 'only holds the enabled entities of each store view\'s website' in capsys.readouterr().out
+
+	fromEav = runSearch(attribute, comparison, value, store=store, useFlat=False)
+
+	# (the flat tables can't tell whether a value was inherited, and the EAV tables hold every product)
+	held = listHeldProducts(catalog)
+
+	assert fromFlat[0] == fromEav[0]
+	assert sorted([row[:3] for row in fromFlat[1]]) == sorted([row[:3] for row in fromEav[1] if (row[0], row[2]) in held])
+	assert len(fromEav[1]) > len(fromFlat[1])
+	assert set([row[3] for row in fromFlat[1]]) == set(['unknown'])
+
+def testSearchesTheEavTablesWhileTheIndexIsStale(runSearch, catalog, capsys):
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute("UPDATE index_process SET status = 'require_reindex' WHERE indexer_code = 'catalog_product_flat'")
+	sqliteConn.close()
+
+	runSearch('name', 'LIKE', '%red%', store='all')
+
+	assert 'Searching the EAV tables (the "catalog_product_flat" index is "require_reindex" rather than up to date)...' in capsys.readouterr().out
+
+def testSearchesTheEavTablesForAttributesNotInTheFlatTables(runSearch, capsys):
+	runSearch('description', 'LIKE', '%red%', store='store_1')
+
+	assert 'Searching the EAV tables (' in capsys.readouterr().out
+
+def testSearchesTheEavTablesForTheStatus(runSearch, capsys):
+	header, rows = runSearch('status', '=', '2', store='store_1')
+
+	assert 'Searching the EAV tables (the flat tables only hold enabled entities, so they cannot be searched by "status")...' in capsys.readouterr().out
+	assert rows
@@ -0,0 +1,50 @@
+import sqlite3
+import attributecache
+import syntheticeav
+from conftest import getAttributeId
+
+def testCachesTheOptionLabelsUntilTheyChange(catalog):
+	colorId = getAttributeId(catalog, 'color')
+	dbCursor = syntheticeav.StandInConnection(catalog).cursor()
+
+	cache = attributecache.AttributeCache('attribute-cache.sqlite', 'test')
+	cache.refreshOptions(dbCursor, colorId)
+
+	assert cache.getOptionLabels(colorId)[1] == {0: 'Red', 1: 'Red (store_1)'}
+	assert len(cache.getOptionLabels(colorId)) == len(syntheticeav.colorLabels)
+	cache.close()
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute("UPDATE eav_attribute_option_value SET value = 'Crimson' WHERE option_id = 1 AND store_id = 0")
+	sqliteConn.close()
+
+	reopened = attributecache.AttributeCache('attribute-cache.sqlite', 'test')
+	reopened.refreshOptions(dbCursor, colorId)
+
+	assert reopened.getOptionLabels(colorId)[1] == {0: 'Crimson', 1: 'Red (store_1)'}
+	reopened.close()
+
+def testSearchesByLabelLikeByOptionId(runSearch):
+	byId = runSearch('color', '=', '', values=['1', '3'])
+	byLabel = runSearch('color', '=', '', values=['red', 'GREEN'], labels=True)
+
+	assert sorted([row[0] for row in byLabel[1]]) == sorted([row[0] for row in byId[1]])
+	# (values set in the first store view are labelled in its own words)
+	assert set([row[1] for row in byLabel[1]]) == set(['Red', 'Green', 'Red (store_1)', 'Green (store_1)'])
+
+def testMatchesLabelsInAnyStoreView(runSearch):
+	byId = runSearch('color', '=', '2')
+	byLabel = runSearch('color', 'LIKE', 'blue (store%', labels=True)
+
+	assert sorted([row[0] for row in byLabel[1]]) == sorted([row[0] for row in byId[1]])
+	assert set([row[1] for row in byLabel[1]]) == set(['Blue', 'Blue (store_1)'])
+
+def testOutputsTheStoreViewsOwnLabel(runSearch):
+	header, rows = runSearch('color', '=', 'Red', store='all', labels=True, useFlat=False)
+
+	assert set([(storeCode, value) for sku, value, storeCode, inherited in rows]) == set([('store_1', 'Red (store_1)'), ('store_2', 'Red'), ('store_3', 'Red')])
+
+def testMatchesNoOptions(runSearch):
+	assert runSearch('color', '=', 'No such colour', labels=True)[1] == []
+	assert len(runSearch('color', '!=', 'No such colour', labels=True)[1]) == len(runSearch('color', 'IS NOT', None)[1])
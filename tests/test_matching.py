@@ -0,0 +1,46 @@
+import re
+import matching
+from conftest import queryCatalog, getAttributeId
+
+def testScoresTheMostSimilarRunOfWords():
+	assert matching.scoreFuzzy('cotton blend', 'a soft cotton blend shirt') == 1.0
+	assert matching.scoreFuzzy('cotton blend', 'a soft coton blend shirt') > 0.9
+	assert matching.scoreFuzzy('cotton blend', 'steel kettle') < 0.5
+	assert matching.scoreFuzzy('lamp', '') == 0.0
+
+def testMatchesAChunk():
+	rows = [('A', 1, 'name', 'Red Lamp', 0, 0), ('B', 1, 'name', 'blue chair', 0, 0), ('C', 1, 'name', None, 0, 0)]
+
+	assert matching.matchChunk(rows, 'REGEX', r'^[Rr]ed\b') == rows[:1]
+	assert matching.matchChunk(rows, 'FUZZY', 'red lamb', 0.8) == rows[:1]
+
+def testMatchesInParallelInOrder():
+	chunks = [[('SKU-%s' % index, 1, 'name', 'value %s' % index, 0, 0) for index in range(start, start + 10)] for start in range(0, 100, 10)]
+
+	matched = list(matching.matchInParallel(iter(chunks), 'REGEX', r'[05]$', processes=2))
+
+	assert [row[0] for row in matched] == ['SKU-%s' % index for index in range(100) if index % 5 == 0]
+
+def listNames(catalog):
+	"""Returns the `(sku, value)` of every (non-empty) `name` value, straight from the catalog."""
+
+	return queryCatalog(catalog,
+		"SELECT ce.sku, cev.value FROM catalog_product_entity_varchar AS cev INNER JOIN catalog_product_entity AS ce ON ce.entity_id = cev.entity_id WHERE cev.attribute_id = ? AND cev.value != ''",
+		(getAttributeId(catalog, 'name'),)
+	)
+
+def testFindsTheSameValuesAsPythonsRegularExpressions(runSearch, catalog):
+	header, rows = runSearch('name', 'REGEX', r'^(red|blue) \w+ lamp', matchProcesses=2, fetchSize=50)
+
+	expected = [[sku, value] for sku, value in listNames(catalog) if re.search(r'^(red|blue) \w+ lamp', value)]
+
+	assert sorted(rows) == sorted(expected)
+	assert rows
+
+def testFindsMisspeltValues(runSearch, catalog):
+	header, rows = runSearch('name', 'FUZZY', 'lamb chiar', fuzzyThreshold=0.8, matchProcesses=2)
+
+	expected = [[sku, value] for sku, value in listNames(catalog) if matching.scoreFuzzy('lamb chiar', value.lower()) >= 0.8]
+
+	assert sorted(rows) == sorted(expected)
+	assert [value for sku, value in rows if 'lamp chair' in value]
@@ -0,0 +1,102 @@
+import os
+import sys
+import shutil
+import sqlite3
+import subprocess
+import pytest
+import pymysql
+from conftest import writeDbConfig, readCsv
+
+scriptPath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Magento-Attribute-Searcher.py')
+
+@pytest.fixture
+def instances(catalog):
+	"""Two instances ("staging" and "production") of the catalog, where production has had one product renamed."""
+
+	for instance in ['staging', 'production']:
+		shutil.copy(catalog, instance + '.sqlite')
+
+	sqliteConn = sqlite3.connect('production.sqlite')
+	with sqliteConn:
+		sqliteConn.execute("UPDATE catalog_product_entity_varchar SET value = 'renamed red thing' WHERE entity_id = 1 AND attribute_id = (SELECT attribute_id FROM eav_attribute WHERE attribute_code = 'name')")
+	sqliteConn.close()
+
+	writeDbConfig(['staging', 'production'])
+
+	return ['staging', 'production']
+
+def testSearchesEveryInstance(searcherModule, runSearch, instances):
+	multiSearch = searcherModule.MagentoAttributeMultiSearch(instances, 'product', 'name', 'LIKE', '%red%', 'csv', 'all.csv', True)
+	multiSearch.search()
+
+	header, rows = readCsv('all.csv')
+	singleHeader, singleRows = runSearch('name', 'LIKE', '%red%', instance='staging')
+
+	assert header == singleHeader + ['Instance']
+	assert sorted([row[:-1] for row in rows if row[-1] == 'staging']) == sorted(singleRows)
+	assert ['SKU-00000001', 'renamed red thing', 'production'] in rows
+
+def testForwardsStoreViewSearches(searcherModule, runSearch, instances):
+	multiSearch = searcherModule.MagentoAttributeMultiSearch(instances, 'product', 'color', '=', '3', 'csv', 'all.csv', True, store='store_1', useFlat=False)
+	multiSearch.search()
+
+	header, rows = readCsv('all.csv')
+	singleHeader, singleRows = runSearch('color', '=', '3', instance='production', store='store_1', useFlat=False)
+
+	assert header == ['SKU', 'Value', 'Store', 'Inherited', 'Instance']
+	assert sorted([row[:-1] for row in rows if row[-1] == 'production']) == sorted(singleRows)
+
+def testReportsAFailingInstanceWithoutLosingTheOthers(searcherModule, instances, capsys):
+	multiSearch = searcherModule.MagentoAttributeMultiSearch(instances, 'product', 'name', 'LIKE', '%red%', 'csv', 'all.csv', True)
+
+	os.remove('production.sqlite')
+	sqlite3.connect('production.sqlite').close()
+
+	with pytest.raises(SystemExit):
+		multiSearch.search()
+
+	assert 'Instance "production" failed' in capsys.readouterr().out
+	assert set([row[-1] for row in readCsv('all.csv')[1]]) == set(['staging'])
+
+def testSearchesTheOthersWhenTheFirstInstanceIsDown(searcherModule, runSearch, instances, monkeypatch, capsys):
+	connect = pymysql.connect
+
+	def connectUnlessStaging(host, port, user, passwd, db):
+		if db == 'staging':
+			raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+		return connect(host, port, user, passwd, db)
+
+	monkeypatch.setattr(pymysql, 'connect', connectUnlessStaging)
+
+	multiSearch = searcherModule.MagentoAttributeMultiSearch(instances, 'product', 'name', 'LIKE', '%red%', 'csv', 'all.csv', True)
+
+	with pytest.raises(SystemExit):
+		multiSearch.search()
+
+	assert 'Instance "staging" failed: ' in capsys.readouterr().out
+	assert sorted([row[:-1] for row in readCsv('all.csv')[1]]) == sorted(runSearch('name', 'LIKE', '%red%', instance='production')[1])
+
+def testGivesUpWhenNoInstanceCanBeReached(searcherModule, instances, monkeypatch, capsys):
+	def connect(host, port, user, passwd, db):
+		raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+	monkeypatch.setattr(pymysql, 'connect', connect)
+
+	with pytest.raises(SystemExit):
+		searcherModule.MagentoAttributeMultiSearch(instances, 'product', 'name', 'LIKE', '%red%', 'csv', 'all.csv', True)
+
+	assert 'None of the 2 instances could be reached' in capsys.readouterr().out
+
+def testDescribesTheSearchLikeASingleOne(searcherModule, instances, capsys):
+	multiSearch = searcherModule.MagentoAttributeMultiSearch(instances, 'product', 'name', 'LIKE', '%red%', 'csv', 'all.csv', True)
+	multiSearch.search()
+
+	assert 'Search for "name LIKE %red%" (within the "product" catalog entity) on 2 instances...' in capsys.readouterr().out
+
+@pytest.mark.parametrize('options', [['--count'], ['--watch', '5'], ['--chunk-size', '100'], ['--profile', 'profile.json'], ['--trigram-index', 'trigrams.sqlite'], ['--no-cache']])
+def testRejectsOptionsItCannotForward(instances, options):
+	result = subprocess.run([sys.executable, scriptPath, '-a', 'name', '-v', '%red%', '-z', '1'] + options, stdout=subprocess.PIPE, universal_newlines=True)
+
+	assert 'Searching several instances at once (pick one with -i) is not supported together with ' + options[0] in result.stdout
+	assert 'Connecting to DB' not in result.stdout
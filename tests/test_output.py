@@ -0,0 +1,67 @@
+import io
+import csv
+import gzip
+import json
+import decimal
+import datetime
+import pytest
+import output
+
+def readLines(outputPath, opener=open):
+	"""Returns the header and rows of the (maybe compressed) CSV file at `outputPath`."""
+
+	with opener(outputPath, 'rt', newline='') as outputFile:
+		lines = [line for line in csv.reader(outputFile) if line]
+
+	return (lines[0], lines[1:])
+
+def testWritesEveryColumnAsJsonLines(runSearch):
+	header, rows = runSearch('price', '<', '50')
+	runSearch('price', '<', '50', outputFormat='jsonl')
+
+	with open('search-1.jsonl') as outputFile:
+		records = [json.loads(line) for line in outputFile if line.strip()]
+
+	assert set(records[0]) == set(output.resultColumns)
+	assert sorted([(record['sku'], record['value']) for record in records]) == sorted([(sku, float(value)) for sku, value in rows])
+
+def testConvertsValuesThatJsonHasNoNotionOf():
+	row = ('SKU-1', 1, 'price', decimal.Decimal('9.50'), 0, datetime.date(2024, 1, 2))
+
+	assert json.loads(output.formatRow(row, 'jsonl')) == dict(sku='SKU-1', attribute_id=1, attribute_code='price', value=9.5, store_id=0, required='2024-01-02')
+
+def testCompressesCsv(runSearch):
+	plain = runSearch('name', 'LIKE', '%red%')
+	runSearch('name', 'LIKE', '%red%', outputFormat='csv.gz', stream=True)
+
+	assert readLines('search-1.csv.gz', gzip.open) == plain
+
+def testCompressesCsvWithZstandard(runSearch):
+	zstandard = pytest.importorskip('zstandard')
+
+	plain = runSearch('name', 'LIKE', '%red%')
+	runSearch('name', 'LIKE', '%red%', outputFormat='csv.zst')
+
+	with open('search-1.csv.zst', 'rb') as compressedFile:
+		text = zstandard.ZstdDecompressor().stream_reader(compressedFile).read().decode('utf-8')
+	lines = [line for line in csv.reader(io.StringIO(text, newline='')) if line]
+
+	assert (lines[0], lines[1:]) == plain
+
+@pytest.mark.parametrize('outputFormat', ['parquet', 'arrow'])
+def testWritesColumnarFiles(runSearch, outputFormat):
+	pyarrow = pytest.importorskip('pyarrow')
+	import pyarrow.ipc
+	import pyarrow.parquet
+
+	header, rows = runSearch('price', '<', '50')
+	runSearch('price', '<', '50', outputFormat=outputFormat)
+
+	if outputFormat == 'parquet':
+		table = pyarrow.parquet.read_table('search-1.parquet')
+	else:
+		table = pyarrow.ipc.open_file(pyarrow.memory_map('search-1.arrow')).read_all()
+
+	assert table.column_names == output.resultColumns
+	assert pyarrow.types.is_decimal(table.schema.field('value').type)
+	assert sorted(zip(table.column('sku').to_pylist(), [float(value) for value in table.column('value').to_pylist()])) == sorted([(sku, float(value)) for sku, value in rows])
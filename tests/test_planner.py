@@ -0,0 +1,38 @@
+import os
+import pytest
+from conftest import queryCatalog, getAttributeId
+
+def createSearch(searcherModule, attribute, comparison, value):
+	"""Set up a search on the catalog (without running it)."""
+
+	return searcherModule.MagentoAttributeSearcher('product', attribute, comparison, value, 'csv', os.devnull, True)
+
+@pytest.mark.parametrize('attribute, backendType', [('price', 'decimal'), ('name', 'varchar'), ('color', 'int'), ('description', 'text'), ('news_from_date', 'datetime')])
+def testPlansAgainstOnlyTheAttributesValueTable(searcherModule, catalog, attribute, backendType):
+	sql, parameters = createSearch(searcherModule, attribute, '=', '1').planSearch()
+
+	assert 'catalog_product_entity_' + backendType in sql
+	assert [otherType for otherType in searcherModule.MagentoAttributeSearcher.valueTableBackendTypes if otherType != backendType and 'catalog_product_entity_' + otherType in sql] == []
+	assert parameters[0] == getAttributeId(catalog, attribute)
+
+def testFindsTheSameRowsAsTheCatchAllQuery(searcherModule, catalog):
+	searcher = createSearch(searcherModule, 'name', 'LIKE', '%red%')
+
+	results = []
+	for sql, parameters in [searcher.planSearch(), searcher.buildCatchAllSearchQuery()]:
+		searcher.dbCursor.execute(sql, parameters)
+		results.append(sorted([tuple(row[:5]) for row in searcher.dbCursor.fetchall()]))
+
+	assert results[0] == results[1]
+	assert len(results[0]) == queryCatalog(catalog, "SELECT COUNT(*) FROM catalog_product_entity_varchar WHERE attribute_id = ? AND value LIKE '%red%'", (getAttributeId(catalog, 'name'),))[0][0] > 0
+
+def testComparesNumbersAsNumbers(runSearch, catalog):
+	header, rows = runSearch('color', '=', '3')
+
+	assert len(rows) == queryCatalog(catalog, 'SELECT COUNT(*) FROM catalog_product_entity_int WHERE attribute_id = ? AND value = 3', (getAttributeId(catalog, 'color'),))[0][0]
+	assert set([row[1] for row in rows]) == set(['3'])
+
+def testFallsBackToTheCatchAllQueryForStaticAttributes(searcherModule, catalog):
+	searcher = createSearch(searcherModule, 'sku', 'LIKE', 'SKU-0000000%')
+
+	assert searcher.planSearch() == searcher.buildCatchAllSearchQuery()
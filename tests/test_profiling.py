@@ -0,0 +1,43 @@
+import json
+import time
+import profiling
+
+def testChargesNestedPhasesExclusively():
+	profiler = profiling.Profiler()
+
+	with profiler.phase('outer'):
+		time.sleep(0.02)
+		with profiler.phase('inner'):
+			time.sleep(0.05)
+
+	report = profiler.report()
+
+	assert 0.02 <= report['phases']['outer']['wall_seconds'] < report['phases']['inner']['wall_seconds']
+	assert report['phases']['inner']['wall_seconds'] >= 0.05
+	assert report['wall_seconds'] == report['phases']['outer']['wall_seconds'] + report['phases']['inner']['wall_seconds']
+
+def testFindsTheFullTableScansOfAPlan():
+	plan = dict(query_block=dict(nested_loop=[dict(table=dict(table_name='ce', access_type='ALL')), dict(table=dict(table_name='cev', access_type='ref'))]))
+
+	assert profiling.Profiler().findFullTableScans(plan) == ['ce']
+
+def testFormatsTheReportForPrometheus():
+	profiler = profiling.Profiler(dict(attribute='na"me'))
+	with profiler.phase('execute'):
+		pass
+
+	lines = profiler.formatPrometheus(profiler.report()).splitlines()
+
+	assert '# TYPE magento_attribute_searcher_rows_fetched gauge' in lines
+	assert 'magento_attribute_searcher_rows_fetched{attribute="na\\"me"} 0' in lines
+	assert any([line.startswith('magento_attribute_searcher_phase_wall_seconds{attribute="na\\"me",phase="execute"} ') for line in lines])
+
+def testReportsOnASearch(runSearch):
+	header, rows = runSearch('name', 'LIKE', '%red%', profileFile='profile.json')
+
+	with open('profile.json') as reportFile:
+		report = json.load(reportFile)
+
+	assert report['labels']['attribute'] == 'name'
+	assert report['rows_fetched'] == len(rows)
+	assert set(['plan', 'execute', 'fetch', 'format']) <= set(report['phases'])
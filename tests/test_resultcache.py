@@ -0,0 +1,64 @@
+import sqlite3
+import resultcache
+
+def renameProduct(catalog, name, touch):
+	"""Rename product 1 in the catalog, also moving its `updated_at` on if `touch` is set."""
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute("UPDATE catalog_product_entity_varchar SET value = ? WHERE entity_id = 1 AND attribute_id = (SELECT attribute_id FROM eav_attribute WHERE attribute_code = 'name')", (name,))
+		if touch:
+			sqliteConn.execute("UPDATE catalog_product_entity SET updated_at = '2030-01-01 00:00:00' WHERE entity_id = 1")
+	sqliteConn.close()
+
+def testServesARepeatedSearchFromTheCache(runSearch, catalog, capsys):
+	first = runSearch('name', 'LIKE', '%red%', useResultCache=True, verbose=True)
+
+	# (without the catalog's validator changing, so only the cache still has the old name)
+	renameProduct(catalog, 'red herring', False)
+	second = runSearch('name', 'LIKE', '%red%', useResultCache=True, verbose=True)
+
+	out = capsys.readouterr().out
+	assert 'Result cache miss' in out and 'Result cache hit' in out
+	assert second == first
+
+def testMissesOnceTheCatalogHasChanged(runSearch, catalog, capsys):
+	runSearch('name', 'LIKE', '%red%', useResultCache=True)
+
+	renameProduct(catalog, 'red herring', True)
+	header, rows = runSearch('name', 'LIKE', '%red%', useResultCache=True, verbose=True)
+
+	assert 'Result cache miss' in capsys.readouterr().out
+	assert ['SKU-00000001', 'red herring'] in rows
+
+def testMissesOnceEntitiesHaveBeenDeleted(runSearch, catalog, capsys):
+	runSearch('name', 'LIKE', '%red%', useResultCache=True)
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute('DELETE FROM catalog_product_entity WHERE entity_id = 500')
+	sqliteConn.close()
+
+	runSearch('name', 'LIKE', '%red%', useResultCache=True, verbose=True)
+
+	assert 'Result cache miss' in capsys.readouterr().out
+
+def testDoesNotCacheStreamedSearches(runSearch, catalog):
+	runSearch('name', 'LIKE', '%red%', stream=True, useResultCache=True)
+
+	cache = resultcache.ResultCache('result-cache.sqlite')
+	assert cache.describe().startswith('0 entries')
+	cache.close()
+
+def testEvictsTheLeastRecentlyUsedEntries(tmp_path):
+	cache = resultcache.ResultCache(str(tmp_path / 'cache.sqlite'))
+
+	# (room for just the one entry)
+	cache.put('old', 'v', [('a',)])
+	cache.maxBytes = cache.cacheConn.execute('SELECT size FROM entries').fetchone()[0]
+	cache.put('new', 'v', [('b',)])
+
+	assert cache.get('old', 'v') is None
+	assert list(cache.get('new', 'v')) == [('b',)]
+	assert cache.get('new', 'other validator') is None
+	cache.close()
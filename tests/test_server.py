@@ -0,0 +1,76 @@
+import io
+import csv
+import sys
+import json
+import socket
+import threading
+import pytest
+import socketapi
+
+@pytest.fixture
+def server(searcherModule, catalog):
+	"""A server on the catalog (answering requests handed to it directly, rather than listening on a socket)."""
+
+	server = searcherModule.MagentoAttributeServer('searcher.sock', poolSize=2, useResultCache=False)
+
+	yield server
+
+	server.closeConnections()
+
+def ask(server, request):
+	"""Send `request` to the `server` over a socket, returning the output it sent back along with the outcome."""
+
+	clientSocket, serverSocket = socket.socketpair()
+	socketapi.sendRequest(clientSocket, request)
+
+	# (as `serve()` does, so that what the search prints goes back to its client)
+	server.output = socketapi.ThreadOutput(sys.stdout)
+	sys.stdout = server.output
+
+	try:
+		handler = threading.Thread(target=server.handle, args=(serverSocket,))
+		handler.start()
+
+		data = b''
+		for kind, payload in socketapi.readFrames(clientSocket.makefile('rb')):
+			if kind == 'data':
+				data += payload
+			else:
+				status = json.loads(payload.decode('utf-8'))
+
+		handler.join()
+	finally:
+		sys.stdout = server.output.stdout
+		clientSocket.close()
+		serverSocket.close()
+
+	return (data.decode('utf-8'), status)
+
+def testAnswersASearchLikeTheCommandLine(server, runSearch):
+	data, status = ask(server, dict(attribute='name', value='%red%', format='csv'))
+
+	lines = [line for line in csv.reader(io.StringIO(data, newline='')) if line]
+
+	assert status['ok']
+	assert (lines[0], lines[1:]) == runSearch('name', 'LIKE', '%red%')
+
+def testKeepsItsConnectionsOpenBetweenSearches(server):
+	for value in ['%red%', '%blue%', '%lamp%']:
+		assert ask(server, dict(attribute='name', value=value, format='csv'))[1]['ok']
+
+	assert server.openCounts[None] == 1
+
+def testReportsAFailedSearchToItsClient(server):
+	data, status = ask(server, dict(attribute='no_such_attribute', value='x', format='csv'))
+
+	assert not status['ok']
+	assert 'no_such_attribute' in status['error']
+
+	# (and goes on answering others)
+	assert ask(server, dict(attribute='name', value='%red%', format='csv'))[1]['ok']
+
+def testOnlyAnswersInLineFormats(server):
+	data, status = ask(server, dict(attribute='name', value='%red%', format='parquet'))
+
+	assert not status['ok']
+	assert 'The server only answers in the ' in status['error']
@@ -0,0 +1,54 @@
+import re
+import sqlite3
+import pytest
+
+def takeSnapshot(searcherModule):
+	"""Take (or refresh) the snapshot of the catalog's products in "snapshot.sqlite"."""
+
+	snapshotter = searcherModule.MagentoAttributeSnapshotter('snapshot.sqlite', 'product')
+	snapshotter.run()
+
+def changeCatalog(catalog, sql):
+	"""Run `sql` against the catalog, then mark product 1 (and only that one) as just updated."""
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute(sql)
+		sqliteConn.execute("UPDATE catalog_product_entity SET updated_at = '2030-01-01 00:00:00' WHERE entity_id = 1")
+	sqliteConn.close()
+
+@pytest.mark.parametrize('attribute, comparison, value', [('name', 'LIKE', '%red%'), ('price', '<', '50'), ('color', '=', '3'), ('description', '!=', 'red')])
+def testSearchesTheSnapshotLikeTheDatabase(searcherModule, runSearch, attribute, comparison, value):
+	takeSnapshot(searcherModule)
+
+	fromSnapshot = runSearch(attribute, comparison, value, snapshotFile='snapshot.sqlite')
+	fromDatabase = runSearch(attribute, comparison, value)
+
+	assert fromSnapshot[0] == fromDatabase[0]
+	assert sorted(fromSnapshot[1]) == sorted(fromDatabase[1])
+
+def testSearchesTheSnapshotForSeveralValues(searcherModule, runSearch):
+	takeSnapshot(searcherModule)
+
+	fromSnapshot = runSearch('color', '=', '', values=['3', '5'], snapshotFile='snapshot.sqlite')
+	fromDatabase = runSearch('color', '=', '', values=['3', '5'])
+
+	assert sorted(fromSnapshot[1]) == sorted(fromDatabase[1])
+
+def testRefreshesOnlyTheChangedEntities(searcherModule, runSearch, catalog, capsys):
+	takeSnapshot(searcherModule)
+	changeCatalog(catalog, "UPDATE catalog_product_entity_varchar SET value = 'freshly renamed' WHERE entity_id = 1 AND attribute_id = (SELECT attribute_id FROM eav_attribute WHERE attribute_code = 'name')")
+
+	takeSnapshot(searcherModule)
+
+	# (plus whichever entity was the latest before, as the previous high-water mark is re-pulled too)
+	assert int(re.search(r'(\d+) entities re-pulled', capsys.readouterr().out).group(1)) <= 2
+	assert runSearch('name', '=', 'freshly renamed', snapshotFile='snapshot.sqlite')[1] == [['SKU-00000001', 'freshly renamed']]
+
+def testRefreshDropsDeletedEntities(searcherModule, runSearch, catalog):
+	takeSnapshot(searcherModule)
+	changeCatalog(catalog, 'DELETE FROM catalog_product_entity WHERE entity_id = 2')
+
+	takeSnapshot(searcherModule)
+
+	assert 'SKU-00000002' not in [row[0] for row in runSearch('price', '>=', '0', snapshotFile='snapshot.sqlite')[1]]
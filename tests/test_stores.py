@@ -0,0 +1,59 @@
+import sqlite3
+from conftest import queryCatalog, getAttributeId
+
+def listEffectiveValues(catalog, attributeCode, backendType):
+	"""Returns `{(sku, store code): (effective value, inherited)}` of the Attribute, for every product in every store view, worked out in Python."""
+
+	values = dict([((entityId, storeId), value) for entityId, storeId, value in queryCatalog(catalog,
+		'SELECT entity_id, store_id, value FROM catalog_product_entity_%s WHERE attribute_id = ?' % (backendType,),
+		(getAttributeId(catalog, attributeCode),)
+	)])
+
+	effectiveValues = {}
+	for storeId, storeCode in queryCatalog(catalog, 'SELECT store_id, code FROM core_store WHERE store_id != 0'):
+		for entityId, sku in queryCatalog(catalog, 'SELECT entity_id, sku FROM catalog_product_entity'):
+			if (entityId, storeId) in values:
+				effectiveValues[(sku, storeCode)] = (values[(entityId, storeId)], 'no')
+			elif (entityId, 0) in values:
+				effectiveValues[(sku, storeCode)] = (values[(entityId, 0)], 'yes')
+
+	return effectiveValues
+
+def testFindsTheEffectiveValueInEveryStoreView(runSearch, catalog):
+	header, rows = runSearch('name', 'LIKE', '%red%', store='all', useFlat=False)
+
+	expected = [[sku, value, storeCode, inherited] for (sku, storeCode), (value, inherited) in listEffectiveValues(catalog, 'name', 'varchar').items() if value and 'red' in value.lower()]
+
+	assert header == ['SKU', 'Value', 'Store', 'Inherited']
+	assert sorted(rows) == sorted(expected)
+	assert set([row[3] for row in rows]) == set(['yes', 'no'])
+
+def testComparesNumbersInAStoreView(runSearch, catalog):
+	header, rows = runSearch('price', '<', '100', store='store_2', useFlat=False)
+
+	expected = [(sku, value) for (sku, storeCode), (value, inherited) in listEffectiveValues(catalog, 'price', 'decimal').items() if storeCode == 'store_2' and value is not None and value < 100]
+
+	assert sorted([(sku, float(value)) for sku, value, storeCode, inherited in rows]) == sorted(expected)
+
+def testPrefersTheStoreViewsOwnValue(runSearch, catalog):
+	sku, storeCode = sorted([key for key, (value, inherited) in listEffectiveValues(catalog, 'name', 'varchar').items() if inherited == 'yes'])[0]
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute(
+			"INSERT INTO catalog_product_entity_varchar (entity_type_id, attribute_id, store_id, entity_id, value) SELECT 4, ?, store_id, entity_id, 'store view special' FROM catalog_product_entity, core_store WHERE sku = ? AND code = ?",
+			(getAttributeId(catalog, 'name'), sku, storeCode)
+		)
+	sqliteConn.close()
+
+	# (while the other store views still fall back to the default value)
+	assert runSearch('name', '=', 'store view special', store=storeCode, useFlat=False)[1] == [[sku, 'store view special', storeCode, 'no']]
+	assert runSearch('name', '=', 'store view special', store='all', useFlat=False)[1] == [[sku, 'store view special', storeCode, 'no']]
+
+def testSearchesDisabledProductsToo(runSearch, catalog):
+	header, rows = runSearch('status', '=', '2', store='store_1', useFlat=False)
+
+	expected = [sku for (sku, storeCode), (value, inherited) in listEffectiveValues(catalog, 'status', 'int').items() if storeCode == 'store_1' and value == 2]
+
+	assert sorted([row[0] for row in rows]) == sorted(expected)
+	assert rows
@@ -0,0 +1,44 @@
+import output
+
+class RecordingCursor(object):
+	"""A cursor over a list of `rows`, recording the size of every `fetchmany()` (and refusing `fetchall()`)."""
+
+	def __init__(self, rows):
+		self.rows = list(rows)
+		self.fetchSizes = []
+
+	def fetchmany(self, size):
+		self.fetchSizes.append(size)
+		rows, self.rows = self.rows[:size], self.rows[size:]
+
+		return rows
+
+	def fetchall(self):
+		raise AssertionError('Streaming should never fetch every row at once.')
+
+def testFetchesInChunksOfTheFetchSize():
+	cursor = RecordingCursor([(index,) for index in range(25)])
+
+	assert list(output.fetchInChunks(cursor, 10)) == [(index,) for index in range(25)]
+	assert cursor.fetchSizes == [10, 10, 10, 10]
+
+def testFetchesLazily():
+	cursor = RecordingCursor([(index,) for index in range(25)])
+	rows = output.fetchInChunks(cursor, 10)
+
+	assert next(rows) == (0,)
+	assert cursor.fetchSizes == [10]
+
+def testStreamedSearchesOutputTheSameRows(runSearch):
+	buffered = runSearch('name', 'LIKE', '%red%')
+	streamed = runSearch('name', 'LIKE', '%red%', stream=True, fetchSize=7)
+
+	assert streamed == buffered
+	assert len(streamed[1]) > 7
+
+def testStreamedTextMatchesBufferedText(runSearch, tmp_path):
+	runSearch('price', '<', '50', outputFormat='text')
+	runSearch('price', '<', '50', outputFormat='text', stream=True, fetchSize=7)
+
+	with open(str(tmp_path / 'search-0.text')) as buffered, open(str(tmp_path / 'search-1.text')) as streamed:
+		assert streamed.read().strip() == buffered.read().strip()
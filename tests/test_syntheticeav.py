@@ -0,0 +1,51 @@
+import sqlite3
+import benchmark
+import syntheticeav
+from conftest import queryCatalog, getAttributeId
+
+def dumpCatalog(catalogPath):
+	"""Returns every statement it would take to rebuild the catalog at `catalogPath`."""
+
+	sqliteConn = sqlite3.connect(catalogPath)
+	try:
+		return list(sqliteConn.iterdump())
+	finally:
+		sqliteConn.close()
+
+def testGeneratesTheSameCatalogForTheSameSeed(tmp_path):
+	for name, seed in [('first', 1), ('second', 1), ('third', 2)]:
+		syntheticeav.generate(str(tmp_path / (name + '.sqlite')), 50, 10, seed=seed)
+
+	assert dumpCatalog(str(tmp_path / 'first.sqlite')) == dumpCatalog(str(tmp_path / 'second.sqlite'))
+	assert dumpCatalog(str(tmp_path / 'first.sqlite')) != dumpCatalog(str(tmp_path / 'third.sqlite'))
+
+def testTranslatesTheMysqlDialect():
+	dbCursor = syntheticeav.StandInConnection(':memory:').cursor()
+
+	assert dbCursor.translate("SELECT * FROM t WHERE a LIKE %s AND b = '%%'") == "SELECT * FROM t WHERE a LIKE ? AND b = '%'"
+	assert dbCursor.translate('SELECT CAST(value AS BINARY)') == 'SELECT CAST(value AS BLOB)'
+
+	dbCursor.execute('SELECT CRC32(%s), CONCAT_WS(%s, %s, NULL, %s), FIELD(%s, %s, %s), FIND_IN_SET(%s, %s)', ['a', ',', 'x', 'y', 'b', 'a', 'b', '2', '1,2,3'])
+	assert dbCursor.fetchone() == (3904355907, 'x,y', 2, 2)
+
+def testFillsTheFlatTablesWithTheEffectiveValues(catalog):
+	nameId = getAttributeId(catalog, 'name')
+	statusId = getAttributeId(catalog, 'status')
+
+	for storeId in [1, 2, 3]:
+		effectiveValue = '(SELECT v.value FROM catalog_product_entity_%s AS v WHERE v.entity_id = ce.entity_id AND v.attribute_id = %s AND v.store_id IN (0, %s) ORDER BY v.store_id DESC LIMIT 1)'
+		expected = queryCatalog(catalog,
+			'SELECT ce.entity_id, ' + effectiveValue % ('varchar', nameId, storeId) + ' FROM catalog_product_entity AS ce INNER JOIN catalog_product_website AS cw ON cw.product_id = ce.entity_id AND cw.website_id = ? WHERE ' + effectiveValue % ('int', statusId, storeId) + ' = 1 ORDER BY ce.entity_id',
+			(syntheticeav.websiteOfStore(storeId),)
+		)
+
+		assert queryCatalog(catalog, 'SELECT entity_id, name FROM catalog_product_flat_%s ORDER BY entity_id' % (storeId,)) == expected
+		assert 0 < len(expected) < 500
+
+def testCountsTheSameRowsWithEitherStrategy(catalog):
+	searchBenchmark = benchmark.SearchBenchmark(catalog, repeat=1)
+
+	typed = searchBenchmark.countRows(searchBenchmark.createSearch('name', 'LIKE', '%red%'))
+	catchAll = searchBenchmark.countRows(searchBenchmark.createSearch('name', 'LIKE', '%red%', strategy='catch-all'))
+
+	assert typed == catchAll > 0
@@ -0,0 +1,78 @@
+import array
+import sqlite3
+import trigrams
+from conftest import queryCatalog, getAttributeId
+
+def buildIndex(searcherModule):
+	"""Build (or update) the trigram index of the `name` Attribute in "trigrams.sqlite"."""
+
+	indexer = searcherModule.MagentoAttributeIndexer('trigrams.sqlite', 'product', 'name')
+	indexer.run()
+
+def testExtractsTheTrigramsOfEveryLiteralRunOfAPattern():
+	assert trigrams.extractTrigrams('Lámpe') == set(['lam', 'amp', 'mpe'])
+	assert trigrams.extractPatternTrigrams('%red_lamp%') == set(['red', 'lam', 'amp'])
+	assert trigrams.extractPatternTrigrams('%ab%') == set()
+
+def testIntersectsSortedArrays():
+	arrays = [array.array('I', values) for values in [[1, 3, 5, 7, 9], [3, 4, 5, 9], [5, 9, 11]]]
+
+	assert trigrams.intersectSorted(arrays[0], arrays[1]).tolist() == [3, 5, 9]
+	assert trigrams.intersectAll(arrays).tolist() == [5, 9]
+	assert trigrams.mergePostings(array.array('I', [1, 5]), array.array('I', [3, 5, 8])).tolist() == [1, 3, 5, 8]
+
+def testFindsTheSameRowsWithTheIndex(searcherModule, runSearch, capsys):
+	buildIndex(searcherModule)
+
+	withIndex = runSearch('name', 'LIKE', '%red%', trigramIndexFile='trigrams.sqlite')
+	withoutIndex = runSearch('name', 'LIKE', '%red%')
+
+	assert 'The trigram index narrowed the search down to ' in capsys.readouterr().out
+	assert withIndex[0] == withoutIndex[0]
+	assert sorted(withIndex[1]) == sorted(withoutIndex[1])
+
+def testOnlyNarrowsTheSearchDownToValuesWithEveryTrigram(searcherModule, catalog):
+	buildIndex(searcherModule)
+
+	index = trigrams.TrigramIndex('trigrams.sqlite')
+	attributeId = getAttributeId(catalog, 'name')
+	candidates = index.findCandidates(attributeId, '%red%')
+	index.close()
+
+	valueIds = [row[0] for row in queryCatalog(catalog, "SELECT value_id FROM catalog_product_entity_varchar WHERE attribute_id = ? AND LOWER(value) LIKE '%red%' ORDER BY value_id", (attributeId,))]
+	assert candidates.tolist() == valueIds
+
+def testPicksUpChangedValuesIncrementally(searcherModule, runSearch, catalog, capsys):
+	buildIndex(searcherModule)
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute("UPDATE catalog_product_entity_varchar SET value = 'zebra print' WHERE entity_id = 1 AND attribute_id = (SELECT attribute_id FROM eav_attribute WHERE attribute_code = 'name')")
+		sqliteConn.execute("UPDATE catalog_product_entity SET updated_at = '2030-01-01 00:00:00' WHERE entity_id = 1")
+	sqliteConn.close()
+
+	buildIndex(searcherModule)
+
+	assert 'Updated ' in capsys.readouterr().out
+	assert runSearch('name', 'LIKE', '%zebra%', trigramIndexFile='trigrams.sqlite')[1] == [['SKU-00000001', 'zebra print']]
+
+def testFindsWhatChangedSinceTheIndexWasLastUpdated(searcherModule, runSearch, catalog, capsys):
+	buildIndex(searcherModule)
+
+	nameId = getAttributeId(catalog, 'name')
+	unnamed = queryCatalog(catalog, 'SELECT MIN(entity_id) FROM catalog_product_entity WHERE entity_id NOT IN (SELECT entity_id FROM catalog_product_entity_varchar WHERE attribute_id = ? AND store_id = 2)', (nameId,))[0][0]
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		sqliteConn.execute("UPDATE catalog_product_entity_varchar SET value = 'zebra print' WHERE entity_id = 1 AND store_id = 0 AND attribute_id = ?", (nameId,))
+		sqliteConn.execute("UPDATE catalog_product_entity SET updated_at = '2030-01-01 00:00:00' WHERE entity_id = 1")
+		sqliteConn.execute("INSERT INTO catalog_product_entity_varchar (entity_type_id, attribute_id, store_id, entity_id, value) VALUES (4, ?, 2, ?, 'zebra lamp')", (nameId, unnamed))
+	sqliteConn.close()
+
+	# (without updating the index first)
+	withIndex = runSearch('name', 'LIKE', '%zebra%', trigramIndexFile='trigrams.sqlite')
+	withoutIndex = runSearch('name', 'LIKE', '%zebra%')
+
+	assert 'changed since it was last updated' in capsys.readouterr().out
+	assert sorted(withIndex[1]) == sorted(withoutIndex[1])
+	assert len(withIndex[1]) == 2
@@ -0,0 +1,37 @@
+import os
+import re
+from conftest import queryCatalog, getAttributeId
+
+def listColors(catalog, colors):
+	"""Returns the `(sku, value)` of every `color` value that is one of `colors`, straight from the catalog."""
+
+	return queryCatalog(catalog,
+		'SELECT ce.sku, cev.value FROM catalog_product_entity_int AS cev INNER JOIN catalog_product_entity AS ce ON ce.entity_id = cev.entity_id WHERE cev.attribute_id = ? AND cev.value IN (' + ', '.join(['?'] * len(colors)) + ')',
+		[getAttributeId(catalog, 'color')] + colors
+	)
+
+def testFindsRowsMatchingAnyOfTheValues(runSearch, catalog):
+	header, rows = runSearch('color', '=', '', values=['3', '5', '7'])
+
+	assert header == ['SKU', 'Value', 'Match']
+	assert sorted([(sku, int(value)) for sku, value, match in rows]) == sorted(listColors(catalog, [3, 5, 7]))
+	assert all([value == match for sku, value, match in rows])
+
+def testJoinsLongListsAsATemporaryTable(runSearch, searcherModule, catalog, monkeypatch):
+	inlined = runSearch('color', '=', '', values=['3', '5', '7'])
+
+	monkeypatch.setattr(searcherModule.MagentoAttributeSearcher, 'inListLimit', 2)
+	joined = runSearch('color', '=', '', values=['3', '5', '7'])
+
+	searcher = searcherModule.MagentoAttributeSearcher('product', 'color', '=', '', 'csv', os.devnull, True, values=['3', '5', '7'])
+	assert 'mas_search_values' in searcher.planSearch()[0]
+
+	assert sorted(joined[1]) == sorted(inlined[1])
+
+def testMatchesEachPatternOfALikeSearch(runSearch, catalog):
+	header, rows = runSearch('name', 'LIKE', '', values=['%red%', '%lamp%'])
+
+	names = queryCatalog(catalog, 'SELECT ce.sku, cev.value FROM catalog_product_entity_varchar AS cev INNER JOIN catalog_product_entity AS ce ON ce.entity_id = cev.entity_id WHERE cev.attribute_id = ?', (getAttributeId(catalog, 'name'),))
+	expected = [(sku, value, pattern) for sku, value in names for pattern in ['%red%', '%lamp%'] if re.search(pattern.strip('%'), value)]
+
+	assert sorted([tuple(row) for row in rows]) == sorted(expected)
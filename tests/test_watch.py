@@ -0,0 +1,98 @@
+import io
+import json
+import sqlite3
+from conftest import getAttributeId
+
+def readEvents(outputPath):
+	"""Returns the events written to `outputPath`, as dicts."""
+
+	with open(outputPath) as outputFile:
+		return [json.loads(line) for line in outputFile]
+
+def applyEvents(events):
+	"""Returns the results that `events` leave behind, as `{(sku, store_id): value}`."""
+
+	results = {}
+	for event in events:
+		if event['event'] == 'removed':
+			del results[(event['sku'], event['store_id'])]
+		else:
+			results[(event['sku'], event['store_id'])] = event['value']
+
+	return results
+
+def watch(searcherModule, monkeypatch, polls):
+	"""
+	Watch `name LIKE %red%` into "watch.jsonl", running each of the `polls` (functions) in place of a wait before a poll.
+
+	Watching is then interrupted, as if by Ctrl+C, in place of the next wait. Returns the events written.
+	"""
+
+	waits = list(polls)
+
+	def wait(seconds):
+		if not waits:
+			raise KeyboardInterrupt()
+
+		waits.pop(0)()
+
+	monkeypatch.setattr(searcherModule.time, 'sleep', wait)
+
+	searcher = searcherModule.MagentoAttributeSearcher('product', 'name', 'LIKE', '%red%', 'text', 'watch.jsonl', True, watchInterval=60)
+	searcher.search()
+
+	return readEvents('watch.jsonl')
+
+def updateCatalog(catalog, statements):
+	"""Run the SQL `statements` against the catalog."""
+
+	sqliteConn = sqlite3.connect(catalog)
+	with sqliteConn:
+		for sql, parameters in statements:
+			sqliteConn.execute(sql, parameters)
+	sqliteConn.close()
+
+def testReportsTheChangesToTheResults(searcherModule, catalog, monkeypatch):
+	nameId = getAttributeId(catalog, 'name')
+	initial = applyEvents(watch(searcherModule, monkeypatch, []))
+	skus = sorted(set([sku for sku, storeId in initial]))
+
+	def rename(sku, value):
+		return ('UPDATE catalog_product_entity_varchar SET value = ? WHERE attribute_id = ? AND store_id = 0 AND entity_id = (SELECT entity_id FROM catalog_product_entity WHERE sku = ?)', (value, nameId, sku))
+
+	def touch(sku):
+		return ("UPDATE catalog_product_entity SET updated_at = '2030-01-01 00:00:00' WHERE sku = ?", (sku,))
+
+	def poll():
+		updateCatalog(catalog, [
+			rename(skus[0], 'no longer matching'), touch(skus[0]),
+			rename(skus[1], 'still red, but renamed'), touch(skus[1]),
+			rename('SKU-00000499', 'newly red'), touch('SKU-00000499'),
+			('DELETE FROM catalog_product_entity WHERE sku = ?', (skus[2],)),
+		])
+
+	events = watch(searcherModule, monkeypatch, [poll])
+
+	assert set([event['event'] for event in events]) == set(['added', 'removed', 'changed'])
+
+	# Replaying every event ends up with the same results as a fresh full search
+	assert applyEvents(events) == applyEvents(watch(searcherModule, monkeypatch, []))
+
+	changed = [event for event in events if event['event'] == 'changed']
+	assert [(event['sku'], event['previous_value'], event['value']) for event in changed if event['store_id'] == 0] == [(skus[1], initial[(skus[1], 0)], 'still red, but renamed')]
+	assert set([event['sku'] for event in events if event['event'] == 'removed']) >= set([skus[0], skus[2]])
+	assert ('SKU-00000499', 0) in applyEvents(events)
+
+def testDiffsResultsIntoEvents(searcherModule, catalog):
+	searcher = searcherModule.MagentoAttributeSearcher('product', 'name', 'LIKE', '%red%', 'text', 'watch.jsonl', True, watchInterval=60)
+	matches = {('A', 0): ('A', 1, 'name', 'red', 0, 0), ('B', 0): ('B', 1, 'name', 'red', 0, 0), ('C', 0): ('C', 1, 'name', 'red', 0, 0)}
+	stream = io.StringIO()
+
+	# (only the entities searched again can have been removed)
+	count = searcher.writeWatchEvents(stream, matches, {('B', 0): ('B', 1, 'name', 'dark red', 0, 0), ('D', 0): ('D', 1, 'name', 'red', 0, 0)}, set(['A', 'B', 'D']))
+
+	events = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+	assert count == 3
+	assert [(event['event'], event['sku'], event['value'], event.get('previous_value')) for event in events] == [('removed', 'A', 'red', None), ('changed', 'B', 'dark red', 'red'), ('added', 'D', 'red', None)]
+	assert sorted(matches) == [('B', 0), ('C', 0), ('D', 0)]
@@ -0,0 +1,321 @@
+#!/usr/bin/python3
+import os.path
+import time
+import array
+import sqlite3
+import unicodedata
+import pymysql
+
+def normalize(text):
+	"""Lower-case `text` and strip its accents, to line up with how MySQL's default (`_ci`) collations compare."""
+
+	decomposed = unicodedata.normalize('NFKD', str(text).lower())
+
+	return ''.join([character for character in decomposed if not unicodedata.combining(character)])
+
+def extractTrigrams(text):
+	"""Returns the set of (normalized) three-character sequences found in `text`."""
+
+	text = normalize(text)
+
+	return set([text[index:index + 3] for index in range(len(text) - 2)])
+
+def extractPatternTrigrams(pattern):
+	"""
+	Returns the set of trigrams that every value matching the `LIKE` `pattern` must contain.
+
+	Only the literal runs between wildcards (`%` and `_`) are used, since a wildcard could stand in for anything.
+	"""
+
+	segments = ['']
+	escaped = False
+
+	for character in pattern:
+		if escaped:
+			segments[-1] += character
+			escaped = False
+		elif character == '\\':
+			escaped = True
+		elif character in '%_':
+			segments.append('')
+		else:
+			segments[-1] += character
+
+	trigrams = set()
+	for segment in segments:
+		trigrams |= extractTrigrams(segment)
+
+	return trigrams
+
+def intersectSorted(left, right):
+	"""Returns the values found in both of the sorted arrays `left` and `right` (as a sorted array)."""
+
+	result = array.array('I')
+	leftIndex = 0
+	rightIndex = 0
+
+	while leftIndex < len(left) and rightIndex < len(right):
+		if left[leftIndex] < right[rightIndex]:
+			leftIndex += 1
+		elif left[leftIndex] > right[rightIndex]:
+			rightIndex += 1
+		else:
+			result.append(left[leftIndex])
+			leftIndex += 1
+			rightIndex += 1
+
+	return result
+
+def intersectAll(arrays):
+	"""Returns the values found in every one of a (non-empty) list of sorted `arrays` (as a sorted array)."""
+
+	# Starting with the shortest one keeps every intersection as small as possible
+	arrays = sorted(arrays, key=len)
+	result = arrays[0]
+	for other in arrays[1:]:
+		result = intersectSorted(result, other)
+
+	return result
+
+def mergePostings(existing, additions):
+	"""Returns the sorted (and de-duplicated) union of two posting lists."""
+
+	# The common case when building: every new `value_id` comes after all of the ones already there
+	if not existing or (additions and additions[0] > existing[-1]):
+		return existing + additions
+
+	return array.array('I', sorted(set(existing) | set(additions)))
+
+class TrigramIndex(object):
+	"""
+	A local inverted index from trigrams to the `value_id`s of `varchar`/`text` Attribute values that contain them.
+
+	A `LIKE '%...%'` search would otherwise have to scan every value of the Attribute. With the index, the posting lists...
+	...of the pattern's trigrams are intersected to find the (few) values that *could* match, and only those are then...
+	...checked by MySQL. Posting lists are kept per `(attribute_id, store_id, trigram)` as packed, sorted arrays.
+
+	Values that have since changed keep their old trigrams as well as gaining their new ones, which can only add false...
+	...candidates (never lose a match), since MySQL verifies every candidate anyway. Rebuilding compacts them again.
+	Rows added or changed since the index was last updated are not in it at all, so a search takes those as candidates...
+	...too (see `findUnindexedValueIds()`), until the next update picks them up.
+	"""
+
+	# How many postings to collect in memory before writing them out
+	flushLimit = 2000000
+
+	def __init__(self, indexPath):
+		"""Open (creating if needed) the index file at `indexPath`."""
+
+		self.indexPath = indexPath
+		self.indexConn = sqlite3.connect(indexPath)
+		self.indexConn.executescript("""
+			CREATE TABLE IF NOT EXISTS indexed_attributes (
+				attribute_id INTEGER PRIMARY KEY,
+				instance TEXT NOT NULL,
+				scope TEXT NOT NULL,
+				backend_type TEXT NOT NULL,
+				max_value_id INTEGER NOT NULL,
+				high_water_mark TEXT,
+				build_seconds REAL
+			);
+			CREATE TABLE IF NOT EXISTS postings (
+				attribute_id INTEGER NOT NULL,
+				store_id INTEGER NOT NULL,
+				trigram TEXT NOT NULL,
+				value_ids BLOB NOT NULL,
+				PRIMARY KEY (attribute_id, store_id, trigram)
+			);
+		""")
+
+	def close(self):
+		"""Close the index file."""
+
+		self.indexConn.close()
+
+	def getIndexedAttribute(self, attributeId, instance):
+		"""Returns the index's bookkeeping for `attributeId` (of the DB `instance`) as a dict, or `None` if it isn't indexed."""
+
+		row = self.indexConn.execute(
+			'SELECT attribute_id, scope, backend_type, max_value_id, high_water_mark, build_seconds FROM indexed_attributes WHERE attribute_id = ? AND instance = ?',
+			(attributeId, instance)
+		).fetchone()
+
+		if row is None:
+			return None
+
+		return dict(zip(['attribute_id', 'scope', 'backend_type', 'max_value_id', 'high_water_mark', 'build_seconds'], row))
+
+	def update(self, dbConn, instance, scope, attributeId, backendType, fetchSize=1000):
+		"""
+		Index `attributeId`, from scratch if it has not been indexed (for this `instance`) before, or else incrementally.
+
+		An incremental update picks up rows added since the last time (by `value_id`), plus the rows of every entity...
+		...whose `updated_at` has moved since then. Returns a dict of statistics about the update and the index.
+		"""
+
+		started = time.time()
+		indexed = self.getIndexedAttribute(attributeId, instance)
+
+		dbCursor = dbConn.cursor()
+		dbCursor.execute('SELECT MAX(updated_at) FROM catalog_%s_entity' % (scope,))
+		highWaterMark = str(dbCursor.fetchone()[0])
+
+		streamCursor = dbConn.cursor(pymysql.cursors.SSCursor)
+
+		with self.indexConn:
+			if indexed is None:
+				self.indexConn.execute('DELETE FROM postings WHERE attribute_id = ?', (attributeId,))
+				streamCursor.execute(
+					'SELECT value_id, store_id, value FROM catalog_%s_entity_%s WHERE attribute_id = %%s ORDER BY value_id' % (scope, backendType),
+					(attributeId,)
+				)
+				rowCount, maxValueId = self.indexRows(streamCursor, attributeId, fetchSize, 0)
+			else:
+				streamCursor.execute(
+					'SELECT value_id, store_id, value FROM catalog_%s_entity_%s WHERE attribute_id = %%s AND value_id > %%s ORDER BY value_id' % (scope, backendType),
+					(attributeId, indexed['max_value_id'])
+				)
+				rowCount, maxValueId = self.indexRows(streamCursor, attributeId, fetchSize, indexed['max_value_id'])
+
+				# (`>=`, for the same reason as in `EavSnapshot.refresh()`)
+				streamCursor.execute(
+					"""SELECT cev.value_id, cev.store_id, cev.value
+					FROM catalog_%s_entity_%s AS cev
+					INNER JOIN catalog_%s_entity AS ce
+						ON cev.entity_id = ce.entity_id
+					WHERE cev.attribute_id = %%s
+						AND cev.value_id <= %%s
+						AND ce.updated_at >= %%s
+					ORDER BY cev.value_id""" % (scope, backendType, scope),
+					(attributeId, indexed['max_value_id'], indexed['high_water_mark'])
+				)
+				changedCount, ignored = self.indexRows(streamCursor, attributeId, fetchSize, 0)
+				rowCount += changedCount
+
+			streamCursor.close()
+
+			self.indexConn.execute(
+				'INSERT OR REPLACE INTO indexed_attributes (attribute_id, instance, scope, backend_type, max_value_id, high_water_mark, build_seconds) VALUES (?, ?, ?, ?, ?, ?, ?)',
+				(attributeId, instance, scope, backendType, maxValueId, highWaterMark, time.time() - started)
+			)
+
+		statistics = self.indexConn.execute('SELECT COUNT(*), SUM(LENGTH(value_ids)) / 4 FROM postings WHERE attribute_id = ?', (attributeId,)).fetchone()
+
+		return dict(
+			rows_indexed=rowCount,
+			trigrams=statistics[0],
+			postings=statistics[1] or 0,
+			seconds=time.time() - started,
+			file_bytes=os.path.getsize(self.indexPath),
+			incremental=indexed is not None
+		)
+
+	def findUnindexedValueIds(self, dbConn, indexed):
+		"""
+		Returns the sorted `value_id`s of the rows of an `indexed` Attribute (see `getIndexedAttribute()`) that its index...
+		...may be missing: those added since it was last updated, and those of every entity whose `updated_at` has moved.
+		"""
+
+		# (the same conditions as an incremental `update()`, `>=` included)
+		dbCursor = dbConn.cursor()
+		dbCursor.execute(
+			"""SELECT cev.value_id
+			FROM catalog_%s_entity_%s AS cev
+			INNER JOIN catalog_%s_entity AS ce
+				ON cev.entity_id = ce.entity_id
+			WHERE cev.attribute_id = %%s
+				AND (cev.value_id > %%s OR ce.updated_at >= %%s)
+			ORDER BY cev.value_id""" % (indexed['scope'], indexed['backend_type'], indexed['scope']),
+			(indexed['attribute_id'], indexed['max_value_id'], indexed['high_water_mark'])
+		)
+		valueIds = array.array('I', [row[0] for row in dbCursor.fetchall()])
+		dbCursor.close()
+
+		return valueIds
+
+	def indexRows(self, dbCursor, attributeId, fetchSize, maxValueId):
+		"""Add the `value_id, store_id, value` rows of an executed `dbCursor` to the index. Returns `(row count, max value_id)`."""
+
+		pending = {}
+		pendingCount = 0
+		rowCount = 0
+
+		while True:
+			rows = dbCursor.fetchmany(fetchSize)
+			if not rows:
+				break
+
+			for valueId, storeId, value in rows:
+				for trigram in extractTrigrams(value or ''):
+					pending.setdefault((storeId, trigram), array.array('I')).append(valueId)
+					pendingCount += 1
+
+				maxValueId = max(maxValueId, valueId)
+
+			rowCount += len(rows)
+
+			if pendingCount >= self.flushLimit:
+				self.flushPostings(attributeId, pending)
+				pending = {}
+				pendingCount = 0
+
+		self.flushPostings(attributeId, pending)
+
+		return (rowCount, maxValueId)
+
+	def flushPostings(self, attributeId, pending):
+		"""Merge the `pending` posting lists (by `(store_id, trigram)`) into the ones already stored."""
+
+		for (storeId, trigram), valueIds in pending.items():
+			row = self.indexConn.execute(
+				'SELECT value_ids FROM postings WHERE attribute_id = ? AND store_id = ? AND trigram = ?',
+				(attributeId, storeId, trigram)
+			).fetchone()
+
+			existing = array.array('I')
+			if row:
+				existing.frombytes(row[0])
+
+			self.indexConn.execute(
+				'INSERT OR REPLACE INTO postings (attribute_id, store_id, trigram, value_ids) VALUES (?, ?, ?, ?)',
+				(attributeId, storeId, trigram, mergePostings(existing, valueIds).tobytes())
+			)
+
+	def findCandidates(self, attributeId, pattern):
+		"""
+		Returns the sorted `value_id`s (across all stores) of the values that could match the `LIKE` `pattern`.
+
+		Returns `None` when the pattern has no trigrams to go on (e.g. `%ab%`), in which case the index is no help.
+		"""
+
+		trigrams = extractPatternTrigrams(pattern)
+		if not trigrams:
+			return None
+
+		candidates = array.array('I')
+
+		storeIds = [row[0] for row in self.indexConn.execute('SELECT DISTINCT store_id FROM postings WHERE attribute_id = ?', (attributeId,))]
+		for storeId in storeIds:
+			postingLists = []
+
+			for trigram in trigrams:
+				row = self.indexConn.execute(
+					'SELECT value_ids FROM postings WHERE attribute_id = ? AND store_id = ? AND trigram = ?',
+					(attributeId, storeId, trigram)
+				).fetchone()
+
+				# A trigram that appears nowhere means that nothing in this store can match
+				if row is None:
+					postingLists = []
+					break
+
+				postingList = array.array('I')
+				postingList.frombytes(row[0])
+				postingLists.append(postingList)
+
+			if not postingLists:
+				continue
+
+			candidates = mergePostings(candidates, intersectAll(postingLists))
+
+		return candidates